@@ -1,23 +1,30 @@
 """PyPSSH - Advanced Parallel SSH Client"""
 
+import importlib
+
 __version__ = "2.0.0"
 __author__ = "PyPSSH Team"
 __email__ = "pypssh@example.com"
 
-from .core.executor import SSHExecutor
-from .core.transfer import FileTransfer
-from .core.connectivity import ConnectivityTester
-from .selector.ip_selector import IPSelector
-from .selector.label_selector import LabelSelector
-from .config.storage import ConfigStorage
-from .core.models import (
-    ConnectionConfig,
-    ConnectivityResult,
-    ExecutionResult,
-    Host,
-    ServerGroup,
-    TransferResult,
-)
+# 公共API按需导入，避免 `import pypssh` 时加载 asyncssh/rich 等重量级依赖
+_LAZY_EXPORTS = {
+    "SSHExecutor": "pypssh.core.executor",
+    "FileTransfer": "pypssh.core.transfer",
+    "ConnectivityTester": "pypssh.core.connectivity",
+    "PlanRunner": "pypssh.core.plan",
+    "ProgressReporter": "pypssh.core.reporter",
+    "DropPolicy": "pypssh.core.reporter",
+    "IPSelector": "pypssh.selector.ip_selector",
+    "LabelSelector": "pypssh.selector.label_selector",
+    "ConfigStorage": "pypssh.config.storage",
+    "ConnectionConfig": "pypssh.core.models",
+    "ConnectivityResult": "pypssh.core.models",
+    "ExecutionResult": "pypssh.core.models",
+    "Host": "pypssh.core.models",
+    "PlanResult": "pypssh.core.models",
+    "ServerGroup": "pypssh.core.models",
+    "TransferResult": "pypssh.core.models",
+}
 
 __all__ = [
     "SSHExecutor",
@@ -27,9 +34,26 @@ __all__ = [
     "TransferResult",
     "ConnectivityTester",
     "ConnectivityResult",
+    "PlanRunner",
+    "PlanResult",
+    "ProgressReporter",
+    "DropPolicy",
     "IPSelector",
     "LabelSelector",
     "ConfigStorage",
     "Host",
     "ServerGroup",
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
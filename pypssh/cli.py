@@ -1,19 +1,77 @@
 """主命令行接口"""
 
+import importlib
 import click
 from pathlib import Path
 
-from pypssh.commands.config import config_command
-from pypssh.commands.execute import execute_command
-from pypssh.commands.file import file_command
-from pypssh.commands.ping import ping_command
-from pypssh.commands.version import version_command
 
-@click.group()
+class LazyGroup(click.Group):
+    """按需导入子命令模块的命令组
+
+    子命令以 ``{name: "module.path:attribute"}`` 注册，只有在实际调用
+    （或展示帮助）时才导入对应模块，保证 `pypssh version --simple` 等
+    轻量命令不会加载 asyncssh/rich 等重量级依赖。
+
+    组选项 --profile 在解析子命令之前开始剖析，子命令模块的导入耗时计入结果。
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def invoke(self, ctx):
+        profile = ctx.params.get("profile")
+        if profile:
+            _setup_profiling(ctx, profile, ctx.params.get("profile_output"))
+        return super().invoke(ctx)
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            return self._load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load_command(self, cmd_name):
+        module_name, attr_name = self.lazy_subcommands[cmd_name].split(":", 1)
+        command = getattr(importlib.import_module(module_name), attr_name)
+        if not isinstance(command, click.Command):
+            raise ValueError(f"Lazy command '{cmd_name}' is not a click command")
+        return command
+
+
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "config": "pypssh.commands.config:config_command",
+        "exec": "pypssh.commands.execute:execute_command",
+        "file": "pypssh.commands.file:file_command",
+        "ping": "pypssh.commands.ping:ping_command",
+        "run-plan": "pypssh.commands.plan:plan_command",
+        "version": "pypssh.commands.version:version_command",
+    },
+)
 @click.version_option(version="2.0.0")
 @click.option("--config-dir", type=click.Path(), help="配置目录路径")
+@click.option(
+    "--trace", type=click.Path(dir_okay=False), help="将会话事件以JSON Lines写入文件"
+)
+@click.option(
+    "--trace-spans",
+    type=click.Path(dir_okay=False),
+    help="将会话以OpenTelemetry span (OTLP/JSON) 写入文件",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(["cpu", "async", "alloc"]),
+    help="剖析本次运行：cpu (cProfile)、async (yappi)、alloc (tracemalloc)",
+)
+@click.option(
+    "--profile-output", type=click.Path(dir_okay=False), help="剖析结果文件路径"
+)
 @click.pass_context
-def cli(ctx, config_dir):
+def cli(ctx, config_dir, trace, trace_spans, profile, profile_output):
     """PyPSSH - Advanced Parallel SSH Client
     
     A powerful tool for executing commands, transferring files, and managing 
@@ -22,13 +80,37 @@ def cli(ctx, config_dir):
     ctx.ensure_object(dict)
     if config_dir:
         ctx.obj['config_dir'] = Path(config_dir)
+    if trace or trace_spans:
+        _setup_tracing(ctx, trace, trace_spans)
+    # --profile 由 LazyGroup.invoke 在导入子命令之前开始
+
+
+def _setup_tracing(ctx, trace, trace_spans):
+    """向默认事件总线注册追踪写出器，命令结束时关闭"""
+    from pypssh.core.events import EVENTS, JsonlTraceWriter, SpanExporter
+
+    for writer_class, path in ((JsonlTraceWriter, trace), (SpanExporter, trace_spans)):
+        if not path:
+            continue
+        writer = EVENTS.subscribe(writer_class(path))
+
+        def close(writer=writer):
+            EVENTS.unsubscribe(writer)
+            writer.close()
+
+        ctx.call_on_close(close)
+
+
+def _setup_profiling(ctx, mode, output):
+    """开始剖析，命令结束时写出结果并输出汇总"""
+    from pypssh.core.profiling import Profiler
 
-# 注册子命令
-cli.add_command(config_command, name="config")
-cli.add_command(execute_command, name="exec")
-cli.add_command(file_command, name="file")
-cli.add_command(ping_command, name="ping")
-cli.add_command(version_command, name="version")
+    profiler = Profiler(mode, output)
+    try:
+        profiler.start()
+    except RuntimeError as e:
+        raise click.UsageError(str(e))
+    ctx.call_on_close(lambda: click.echo(profiler.stop(), err=True))
 
 
 def main():
@@ -1,8 +1,27 @@
 """命令行命令模块"""
 
-from .config import config_command
-from .execute import execute_command
-from .file import file_command
-from .ping import ping_command
+import importlib
 
-__all__ = ["config_command", "execute_command", "file_command", "ping_command"]
+# 子命令模块按需导入，见 pypssh.cli.LazyGroup
+_LAZY_EXPORTS = {
+    "config_command": "pypssh.commands.config",
+    "execute_command": "pypssh.commands.execute",
+    "file_command": "pypssh.commands.file",
+    "ping_command": "pypssh.commands.ping",
+    "plan_command": "pypssh.commands.plan",
+}
+
+__all__ = [
+    "config_command",
+    "execute_command",
+    "file_command",
+    "ping_command",
+    "plan_command",
+]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
@@ -369,11 +369,14 @@ def list_groups(namespace):
         )
         return
 
+    member_counts = storage.get_group_member_counts(namespace)
+
     table = Table(title=f"Server Groups in '{namespace}'")
     table.add_column("Name", style="cyan")
     table.add_column("Description", style="white")
     table.add_column("IP Expression", style="green")
     table.add_column("Label Expression", style="blue")
+    table.add_column("Members", style="magenta")
 
     for group in groups:
         table.add_row(
@@ -381,6 +384,7 @@ def list_groups(namespace):
             group.description or "N/A",
             group.ip_expression or "N/A",
             group.label_expression or "N/A",
+            str(member_counts.get(group.name, 0)),
         )
 
     console.print(table)
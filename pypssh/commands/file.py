@@ -1,11 +1,12 @@
 """文件传输命令"""
 
 import asyncio
+import time
 import click
 from pathlib import Path
-from pypssh.core.transfer import FileTransfer
-from pypssh.ui.formatter import OutputFormatter
-from pypssh.commands.execute import _get_target_configs
+from click.core import ParameterSource
+from pypssh.commands.execute import _get_target_configs, _write_metrics
+from pypssh.core.profiling import section
 
 
 @click.group()
@@ -32,7 +33,81 @@ def file_command():
     default="default",
     help="输出格式",
 )
+@click.option(
+    "--block-size", type=click.IntRange(min=1), help="SFTP 每个读写请求的字节数"
+)
+@click.option("--max-requests", type=click.IntRange(min=1), help="在途SFTP请求数")
+@click.option("--auto-tune", is_flag=True, help="按测得的RTT自动选择传输参数")
+@click.option(
+    "--link-mbps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1000.0,
+    show_default=True,
+    help="自动调优假定的链路带宽(Mbit/s)；--archive 未指定时实测",
+)
+@click.option(
+    "--parallel-parts",
+    type=click.IntRange(min=1, max=16),
+    help="将大文件拆分为N个区间，在独立的SFTP通道上并行写入",
+)
+@click.option(
+    "--strategy",
+    type=click.Choice(["direct", "tree", "p2p"]),
+    default="direct",
+    show_default=True,
+    help="分发策略：direct 由本机上传到每台主机，tree/p2p 由已收到文件的主机"
+    "在其上执行 scp 中继（来源主机需能登录目标主机并已信任其主机密钥）",
+)
+@click.option(
+    "--fanout",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="tree/p2p 策略下每个来源同时服务的主机数",
+)
+@click.option(
+    "--relay-agent-forwarding",
+    is_flag=True,
+    help="tree/p2p 中继时向来源主机转发本机 ssh-agent（来源主机可借此以你的身份"
+    "登录其他主机，仅用于可信主机；默认使用来源主机自身的密钥，"
+    "并严格校验其 known_hosts 中的目标主机密钥）",
+)
+@click.option(
+    "--archive",
+    type=click.Choice(["auto", "none", "gzip", "zstd"]),
+    is_flag=False,
+    flag_value="auto",
+    help="将目录打包为tar流经单个通道上传，可指定压缩（auto 按实测带宽或 --link-mbps 选择）",
+)
+@click.option(
+    "--compress-level", type=click.IntRange(min=1, max=22), help="归档压缩级别"
+)
+@click.option(
+    "--skip-identical",
+    is_flag=True,
+    help="先比较SHA-256，跳过已有相同文件的主机（仅单个文件）",
+)
+@click.option(
+    "--hash-cache",
+    type=click.Path(dir_okay=False),
+    help="本地摘要缓存文件（默认 ~/.pypssh/hash_cache.json）",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="经临时文件传输，中断后重新连接并从断点继续（单个文件，目录按普通方式传输）",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    help="重试次数：连接失败后重试（默认 0）；--resume 时为中断后的续传次数（默认 4）",
+)
 @click.option("--template", "-T", help="自定义输出模板")
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False),
+    help="将运行统计以Prometheus文本格式写入文件（node_exporter textfile）",
+)
 def upload(
     local_path,
     remote_path,
@@ -46,6 +121,21 @@ def upload(
     preserve,
     output,
     template,
+    block_size,
+    max_requests,
+    auto_tune,
+    link_mbps,
+    parallel_parts,
+    strategy,
+    fanout,
+    relay_agent_forwarding,
+    archive,
+    compress_level,
+    skip_identical,
+    hash_cache,
+    resume,
+    retries,
+    metrics_file,
 ):
     """上传文件到远程主机"""
 
@@ -54,6 +144,18 @@ def upload(
     if not local_file.exists():
         click.echo(f"Error: Local file '{local_path}' does not exist")
         return
+    if strategy != "direct" and local_file.is_dir():
+        raise click.UsageError(f"--strategy {strategy} supports a single file only")
+    if relay_agent_forwarding and strategy == "direct":
+        raise click.UsageError("--relay-agent-forwarding requires --strategy tree/p2p")
+    if archive and strategy != "direct":
+        raise click.UsageError("--archive cannot be combined with --strategy")
+    if archive and local_file.is_dir() and not recursive:
+        raise click.UsageError("--archive uploads of a directory require --recursive")
+    if skip_identical and (archive or strategy != "direct" or local_file.is_dir()):
+        raise click.UsageError(
+            "--skip-identical supports single-file direct uploads only"
+        )
 
     # 获取目标服务器配置
     configs = _get_target_configs(namespace, hosts, selector, group, server, 30.0, 10.0)
@@ -77,6 +179,25 @@ def upload(
             preserve,
             output,
             template,
+            metrics_file,
+            _build_tuning(
+                block_size, max_requests, auto_tune, link_mbps, parallel_parts
+            ),
+            strategy,
+            fanout,
+            archive,
+            compress_level,
+            # 未显式指定 --link-mbps 时由归档上传实测带宽
+            (
+                int(link_mbps * 1_000_000 / 8)
+                if click.get_current_context().get_parameter_source("link_mbps")
+                != ParameterSource.DEFAULT
+                else None
+            ),
+            _hash_cache_path(hash_cache) if skip_identical else None,
+            resume,
+            retries,
+            relay_agent_forwarding,
         )
     )
 
@@ -99,7 +220,34 @@ def upload(
     default="default",
     help="输出格式",
 )
+@click.option(
+    "--block-size", type=click.IntRange(min=1), help="SFTP 每个读写请求的字节数"
+)
+@click.option("--max-requests", type=click.IntRange(min=1), help="在途SFTP请求数")
+@click.option("--auto-tune", is_flag=True, help="按测得的RTT自动选择传输参数")
+@click.option(
+    "--link-mbps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1000.0,
+    show_default=True,
+    help="自动调优假定的链路带宽(Mbit/s)",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="经临时文件传输，中断后重新连接并从断点继续（单个文件，目录按普通方式传输）",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    help="重试次数：连接失败后重试（默认 0）；--resume 时为中断后的续传次数（默认 4）",
+)
 @click.option("--template", "-T", help="自定义输出模板")
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False),
+    help="将运行统计以Prometheus文本格式写入文件（node_exporter textfile）",
+)
 def download(
     remote_path,
     local_dir,
@@ -113,6 +261,13 @@ def download(
     preserve,
     output,
     template,
+    block_size,
+    max_requests,
+    auto_tune,
+    link_mbps,
+    resume,
+    retries,
+    metrics_file,
 ):
     """从远程主机下载文件"""
 
@@ -142,10 +297,141 @@ def download(
             preserve,
             output,
             template,
+            metrics_file,
+            _build_tuning(block_size, max_requests, auto_tune, link_mbps),
+            resume,
+            retries,
         )
     )
 
 
+@file_command.command("sync")
+@click.argument("local_dir", type=click.Path(exists=True, file_okay=False))
+@click.argument("remote_dir")
+@click.option("--namespace", "-n", default="default", help="命名空间")
+@click.option("--hosts", "-h", help="主机选择表达式")
+@click.option("--selector", "-s", help="标签选择表达式")
+@click.option("--group", "-g", help="服务器组名称")
+@click.option("--server", multiple=True, help="指定服务器名称")
+@click.option("--max-concurrent", "-c", default=10, help="最大并发传输数")
+@click.option("--checksum", is_flag=True, help="按内容摘要而非修改时间判断文件是否变化")
+@click.option(
+    "--hash-cache",
+    type=click.Path(dir_okay=False),
+    help="本地摘要缓存文件（默认 ~/.pypssh/hash_cache.json）",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Choice(["default", "json", "yaml", "template", "none"]),
+    default="default",
+    help="输出格式",
+)
+@click.option(
+    "--block-size", type=click.IntRange(min=1), help="SFTP 每个读写请求的字节数"
+)
+@click.option("--max-requests", type=click.IntRange(min=1), help="在途SFTP请求数")
+@click.option("--auto-tune", is_flag=True, help="按测得的RTT自动选择传输参数")
+@click.option(
+    "--link-mbps",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1000.0,
+    show_default=True,
+    help="自动调优假定的链路带宽(Mbit/s)",
+)
+@click.option("--template", "-T", help="自定义输出模板")
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False),
+    help="将运行统计以Prometheus文本格式写入文件（node_exporter textfile）",
+)
+def sync(
+    local_dir,
+    remote_dir,
+    namespace,
+    hosts,
+    selector,
+    group,
+    server,
+    max_concurrent,
+    checksum,
+    hash_cache,
+    output,
+    block_size,
+    max_requests,
+    auto_tune,
+    link_mbps,
+    template,
+    metrics_file,
+):
+    """增量同步目录到远程主机（只传输变化的文件）"""
+
+    configs = _get_target_configs(namespace, hosts, selector, group, server, 30.0, 10.0)
+
+    if not configs:
+        click.echo(f"No hosts selected for sync in namespace '{namespace}'")
+        return
+
+    click.echo(
+        f"Syncing '{local_dir}' to {len(configs)} hosts in namespace '{namespace}'..."
+    )
+
+    asyncio.run(
+        _sync_async(
+            configs,
+            local_dir,
+            remote_dir,
+            max_concurrent,
+            checksum,
+            _hash_cache_path(hash_cache),
+            output,
+            template,
+            metrics_file,
+            _build_tuning(block_size, max_requests, auto_tune, link_mbps),
+        )
+    )
+
+
+def _hash_cache_path(path):
+    """摘要缓存文件路径，未指定时放在配置目录下"""
+    return Path(path) if path else Path.home() / ".pypssh" / "hash_cache.json"
+
+
+def _retry_options(retries, resume):
+    """传输器的重试参数
+
+    retries 用于建立连接；--resume 时另用于续传（未指定时使用默认续传次数），
+    续传的每一轮只连接一次。
+    """
+    from dataclasses import replace
+
+    from pypssh.core.session import RetryPolicy
+    from pypssh.core.transfer import RESUME_RETRY
+
+    options = dict(
+        retry=RetryPolicy(attempts=retries + 1) if retries else None, resume=resume
+    )
+    if resume and retries is not None:
+        options["resume_retry"] = replace(RESUME_RETRY, attempts=retries + 1)
+    return options
+
+
+def _build_tuning(block_size, max_requests, auto_tune, link_mbps, parallel_parts=None):
+    """由命令行参数构造传输参数，全部未指定时返回 None（使用 asyncssh 默认值）"""
+    if not (block_size or max_requests or auto_tune or parallel_parts):
+        return None
+
+    from pypssh.core.transfer import TransferTuning
+
+    return TransferTuning(
+        block_size=block_size,
+        max_requests=max_requests,
+        parallel=parallel_parts,
+        auto=auto_tune,
+        bandwidth=int(link_mbps * 1_000_000 / 8),
+    )
+
+
 async def _upload_async(
     configs,
     local_path,
@@ -155,34 +441,76 @@ async def _upload_async(
     preserve,
     output_format,
     template,
+    metrics_file=None,
+    tuning=None,
+    strategy="direct",
+    fanout=4,
+    archive=None,
+    compress_level=None,
+    bandwidth=None,
+    hash_cache=None,
+    resume=False,
+    retries=None,
+    relay_agent_forwarding=False,
 ):
     """异步上传文件"""
+    from pypssh.core.archive import ArchiveTransfer
+    from pypssh.core.relay import RelayTransfer
+    from pypssh.core.transfer import HashCache
+    from pypssh.ui.formatter import OutputFormatter
 
     def progress_callback(completed, total, result):
         status_icon = "✅" if result.status.name == "SUCCESS" else "❌"
+        via = f" via {result.relay_host}" if result.relay_host else ""
+        if result.up_to_date:
+            via += " up-to-date"
         click.echo(
-            f"{status_icon} {result.host} ({result.transfer_time:.2f}s, {result.transferred_bytes} bytes)"
+            f"{status_icon} {result.host}{via} ({result.transfer_time:.2f}s, {result.transferred_bytes} bytes)"
         )
 
     # 创建传输器
-    transfer = FileTransfer(
+    options = dict(
         max_concurrent=max_concurrent,
         progress_callback=progress_callback if output_format == "default" else None,
+        **_retry_options(retries, resume),
     )
+    if archive:
+        transfer = ArchiveTransfer(archive, compress_level, bandwidth, **options)
+    else:
+        transfer = RelayTransfer(strategy, fanout, relay_agent_forwarding, **options)
 
     # 执行上传
-    results = await transfer.upload_parallel(
-        configs, local_path, remote_path, recursive, preserve
-    )
+    start = time.monotonic()
+    with section("run"):
+        results = await transfer.upload_parallel(
+            configs,
+            local_path,
+            remote_path,
+            recursive,
+            preserve,
+            tuning,
+            skip_identical=hash_cache is not None,
+            hash_cache=HashCache(hash_cache) if hash_cache else None,
+        )
+
+    if metrics_file:
+        _write_metrics(
+            metrics_file,
+            "upload",
+            results,
+            time.monotonic() - start,
+            transfer.peak_concurrency,
+        )
 
     # 格式化输出
     if output_format != "none":
-        formatter = OutputFormatter(output_format, template)
-        if output_format in ["json", "yaml", "template"]:
-            output = formatter.format_transfer_results(results)
-            click.echo(output)
-        elif output_format == "default":
-            formatter.print_results(results, "Upload Results")
+        with section("format"):
+            formatter = OutputFormatter(output_format, template)
+            if output_format in ["json", "yaml", "template"]:
+                output = formatter.format_transfer_results(results)
+                click.echo(output)
+            elif output_format == "default":
+                formatter.print_results(results, "Upload Results")
 
 
 async def _download_async(
@@ -194,8 +522,14 @@ async def _download_async(
     preserve,
     output_format,
     template,
+    metrics_file=None,
+    tuning=None,
+    resume=False,
+    retries=None,
 ):
     """异步下载文件"""
+    from pypssh.core.transfer import FileTransfer
+    from pypssh.ui.formatter import OutputFormatter
 
     def progress_callback(completed, total, result):
         status_icon = "✅" if result.status.name == "SUCCESS" else "❌"
@@ -207,18 +541,89 @@ async def _download_async(
     transfer = FileTransfer(
         max_concurrent=max_concurrent,
         progress_callback=progress_callback if output_format == "default" else None,
+        **_retry_options(retries, resume),
     )
 
     # 执行下载
-    results = await transfer.download_parallel(
-        configs, remote_path, local_dir, recursive, preserve
-    )
+    start = time.monotonic()
+    with section("run"):
+        results = await transfer.download_parallel(
+            configs, remote_path, local_dir, recursive, preserve, tuning
+        )
+
+    if metrics_file:
+        _write_metrics(
+            metrics_file,
+            "download",
+            results,
+            time.monotonic() - start,
+            transfer.peak_concurrency,
+        )
 
     # 格式化输出
     if output_format != "none":
-        formatter = OutputFormatter(output_format, template)
-        if output_format in ["json", "yaml", "template"]:
-            output = formatter.format_transfer_results(results)
-            click.echo(output)
-        elif output_format == "default":
-            formatter.print_results(results, "Download Results")
+        with section("format"):
+            formatter = OutputFormatter(output_format, template)
+            if output_format in ["json", "yaml", "template"]:
+                output = formatter.format_transfer_results(results)
+                click.echo(output)
+            elif output_format == "default":
+                formatter.print_results(results, "Download Results")
+
+
+async def _sync_async(
+    configs,
+    local_dir,
+    remote_dir,
+    max_concurrent,
+    checksum,
+    hash_cache,
+    output_format,
+    template,
+    metrics_file=None,
+    tuning=None,
+):
+    """异步同步目录"""
+    from pypssh.core.sync import HashCache, SyncTransfer
+    from pypssh.ui.formatter import OutputFormatter
+
+    def progress_callback(completed, total, result):
+        status_icon = "✅" if result.status.name == "SUCCESS" else "❌"
+        click.echo(
+            f"{status_icon} {result.host} ({result.transfer_time:.2f}s, "
+            f"{result.transferred_bytes} bytes sent, {result.skipped_bytes} bytes skipped)"
+        )
+
+    transfer = SyncTransfer(
+        max_concurrent=max_concurrent,
+        progress_callback=progress_callback if output_format == "default" else None,
+    )
+
+    start = time.monotonic()
+    with section("run"):
+        results = await transfer.sync_parallel(
+            configs,
+            local_dir,
+            remote_dir,
+            checksum,
+            HashCache(hash_cache) if checksum else None,
+            tuning,
+        )
+
+    if metrics_file:
+        _write_metrics(
+            metrics_file,
+            "sync",
+            results,
+            time.monotonic() - start,
+            transfer.peak_concurrency,
+        )
+
+    if output_format != "none":
+        with section("format"):
+            formatter = OutputFormatter(output_format, template)
+            if output_format in ["json", "yaml", "template"]:
+                output = formatter.format_transfer_results(results)
+                click.echo(output)
+            elif output_format == "default":
+                formatter.print_results(results, "Sync Results")
@@ -1,10 +1,10 @@
 """连通性测试命令"""
 
 import asyncio
+import time
 import click
-from pypssh.core.connectivity import ConnectivityTester
-from pypssh.ui.formatter import OutputFormatter
-from pypssh.commands.execute import _get_target_configs
+from pypssh.commands.execute import _get_target_configs, _write_metrics
+from pypssh.core.profiling import section
 
 
 @click.command()
@@ -23,8 +23,22 @@ from pypssh.commands.execute import _get_target_configs
     help="输出格式",
 )
 @click.option("--template", "-T", help="自定义输出模板")
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False),
+    help="将运行统计以Prometheus文本格式写入文件（node_exporter textfile）",
+)
 def ping_command(
-    namespace, hosts, selector, group, server, max_concurrent, timeout, output, template
+    namespace,
+    hosts,
+    selector,
+    group,
+    server,
+    max_concurrent,
+    timeout,
+    output,
+    template,
+    metrics_file,
 ):
     """测试主机连通性"""
 
@@ -42,11 +56,15 @@ def ping_command(
     )
 
     # 执行连通性测试
-    asyncio.run(_ping_async(configs, max_concurrent, output, template))
+    asyncio.run(_ping_async(configs, max_concurrent, output, template, metrics_file))
 
 
-async def _ping_async(configs, max_concurrent, output_format, template):
+async def _ping_async(
+    configs, max_concurrent, output_format, template, metrics_file=None
+):
     """异步连通性测试"""
+    from pypssh.core.connectivity import ConnectivityTester
+    from pypssh.ui.formatter import OutputFormatter
 
     def progress_callback(completed, total, result):
         if result.status.name == "REACHABLE":
@@ -70,16 +88,28 @@ async def _ping_async(configs, max_concurrent, output_format, template):
     )
 
     # 执行测试
-    results = await tester.test_parallel(configs)
+    start = time.monotonic()
+    with section("run"):
+        results = await tester.test_parallel(configs)
+
+    if metrics_file:
+        _write_metrics(
+            metrics_file,
+            "ping",
+            results,
+            time.monotonic() - start,
+            tester.peak_concurrency,
+        )
 
     # 格式化输出
     if output_format != "none":
-        formatter = OutputFormatter(output_format, template)
-        if output_format in ["json", "yaml", "template"]:
-            output = formatter.format_connectivity_results(results)
-            click.echo(output)
-        elif output_format == "default":
-            formatter.print_results(results, "Connectivity Test Results")
+        with section("format"):
+            formatter = OutputFormatter(output_format, template)
+            if output_format in ["json", "yaml", "template"]:
+                output = formatter.format_connectivity_results(results)
+                click.echo(output)
+            elif output_format == "default":
+                formatter.print_results(results, "Connectivity Test Results")
 
     # 显示统计信息
     total = len(results)
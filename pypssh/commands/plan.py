@@ -0,0 +1,126 @@
+"""执行计划命令"""
+
+import asyncio
+import click
+from typing import List, Optional
+from pypssh.commands.execute import _get_target_configs
+from pypssh.core.models import ConnectionConfig
+from pypssh.core.profiling import section
+
+
+@click.command()
+@click.argument("plan_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--namespace", "-n", default="default", help="命名空间")
+@click.option("--hosts", "-h", help="主机选择表达式 (IP表达式)")
+@click.option("--selector", "-s", help="标签选择表达式")
+@click.option("--group", "-g", help="服务器组名称")
+@click.option("--server", multiple=True, help="指定服务器名称")
+@click.option("--max-concurrent", "-c", default=50, help="最大并发数")
+@click.option("--timeout", "-t", default=30.0, help="exec步骤默认超时时间")
+@click.option("--connect-timeout", default=10.0, help="连接超时时间")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Choice(["default", "json", "yaml", "template", "none"]),
+    default="default",
+    help="输出格式",
+)
+@click.option("--output-file", "-f", help="输出文件路径")
+@click.option("--template", "-T", help="自定义输出模板")
+@click.option("--quiet", "-q", is_flag=True, help="静默模式，不显示中间输出")
+def plan_command(
+    plan_file,
+    namespace,
+    hosts,
+    selector,
+    group,
+    server,
+    max_concurrent,
+    timeout,
+    connect_timeout,
+    output,
+    output_file,
+    template,
+    quiet,
+):
+    """在选定的主机上按顺序执行计划文件中的步骤（每个主机复用一个连接）"""
+    from pypssh.core.plan import load_plan
+
+    try:
+        plan = load_plan(plan_file)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        return
+
+    # 获取目标服务器配置
+    configs = _get_target_configs(
+        namespace, hosts, selector, group, server, timeout, connect_timeout
+    )
+
+    if not configs:
+        click.echo(f"No hosts selected for plan in namespace '{namespace}'")
+        return
+
+    # 如果不是默认输出格式，自动启用静默模式
+    if output != "default" and not quiet:
+        quiet = True
+
+    if not quiet:
+        click.echo(
+            f"Running plan '{plan.name or plan_file}' ({len(plan.steps)} steps) "
+            f"on {len(configs)} hosts in namespace '{namespace}'..."
+        )
+
+    asyncio.run(
+        _run_plan_async(
+            configs, plan, max_concurrent, output, template, output_file, quiet
+        )
+    )
+
+
+async def _run_plan_async(
+    configs: List[ConnectionConfig],
+    plan,
+    max_concurrent: int,
+    output_format: str,
+    template: str,
+    output_file: Optional[str],
+    quiet: bool,
+):
+    """异步运行执行计划"""
+    from pathlib import Path
+    from pypssh.core.models import ExecutionStatus
+    from pypssh.core.plan import PlanRunner
+    from pypssh.ui.formatter import OutputFormatter
+
+    def step_callback(config, step_result):
+        status_icon = "✅" if step_result.status == ExecutionStatus.SUCCESS else "❌"
+        click.echo(
+            f"{status_icon} {config.host} [{step_result.action}] "
+            f"{step_result.name} ({step_result.elapsed:.2f}s)"
+        )
+
+    runner = PlanRunner(
+        max_concurrent=max_concurrent,
+        step_callback=step_callback if not quiet else None,
+    )
+    with section("run"):
+        results = await runner.run_parallel(configs, plan)
+
+    # 格式化输出
+    if output_format == "none":
+        return
+
+    with section("format"):
+        formatter = OutputFormatter(output_format, template)
+        if output_format in ["json", "yaml", "template"]:
+            output_content = formatter.format_plan_results(results)
+            if output_file:
+                file_path = Path(output_file)
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(file_path, "w") as f:
+                    f.write(output_content)
+            else:
+                click.echo(output_content)
+        elif not quiet:
+            formatter.print_results(results, "Plan Results")
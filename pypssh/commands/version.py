@@ -2,11 +2,6 @@ import os
 import ssl
 import sys
 import click
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
-from rich import box
 
 def get_resource_path(relative_path: str):
     if getattr(sys, "frozen", False):
@@ -84,6 +79,12 @@ def print_version_by_rich():
     """
     使用 Rich 库输出美观的版本信息
     """
+    from rich import box
+    from rich.console import Console
+    from rich.panel import Panel
+    from rich.table import Table
+    from rich.text import Text
+
     console = Console()
 
     # 获取版本数据
@@ -1,13 +1,16 @@
 """配置存储管理"""
 
 import json
-import yaml
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 from dataclasses import asdict
 import sqlite3
 from contextlib import contextmanager
 from pypssh.core.models import Host, ServerGroup
+from pypssh.selector.label_selector import compile_selector, select_servers
+
+# 数据库结构版本（PRAGMA user_version）
+SCHEMA_VERSION = 2
 
 
 class ConfigStorage:
@@ -30,6 +33,7 @@ class ConfigStorage:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT UNIQUE NOT NULL,
                     description TEXT,
+                    revision INTEGER NOT NULL DEFAULT 0,  -- 服务器/组每次变更递增
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
@@ -83,6 +87,41 @@ class ConfigStorage:
             """
             )
 
+            # 创建选择结果缓存表（按命名空间修订号失效）
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS selection_cache (
+                    namespace_id INTEGER NOT NULL,
+                    revision INTEGER NOT NULL,
+                    expression TEXT NOT NULL,
+                    server_ids TEXT NOT NULL,  -- JSON格式的服务器ID列表
+                    PRIMARY KEY (namespace_id, revision, expression),
+                    FOREIGN KEY (namespace_id) REFERENCES namespaces(id) ON DELETE CASCADE
+                )
+            """
+            )
+
+            # 创建服务器组成员表（物化的组选择结果，随服务器变更增量维护）
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS server_group_members (
+                    group_id INTEGER NOT NULL,
+                    server_id INTEGER NOT NULL,
+                    PRIMARY KEY (group_id, server_id),
+                    FOREIGN KEY (group_id) REFERENCES server_groups(id) ON DELETE CASCADE,
+                    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_server_group_members_server
+                ON server_group_members (server_id)
+            """
+            )
+
+            self._migrate(conn)
+
             # 创建默认命名空间
             conn.execute(
                 """
@@ -93,11 +132,34 @@ class ConfigStorage:
 
             conn.commit()
 
+    def _migrate(self, conn: sqlite3.Connection):
+        """升级旧版本数据库结构"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        if version < 1:
+            columns = {
+                row["name"] for row in conn.execute("PRAGMA table_info(namespaces)")
+            }
+            if "revision" not in columns:
+                conn.execute(
+                    "ALTER TABLE namespaces ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+                )
+
+        if version < 2:
+            # 为已有的服务器组生成成员关系
+            for row in conn.execute("SELECT * FROM server_groups").fetchall():
+                self._rebuild_group_members(conn, row)
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
     @contextmanager
     def _get_connection(self):
         """获取数据库连接"""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
         try:
             yield conn
         finally:
@@ -154,6 +216,29 @@ class ConfigStorage:
 
             return row["id"]
 
+    def get_namespace_revision(self, namespace: str) -> Optional[int]:
+        """获取命名空间修订号"""
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT revision FROM namespaces WHERE name = ?", (namespace,)
+            ).fetchone()
+
+            if not row:
+                return None
+
+            return row["revision"]
+
+    def _bump_revision(self, conn: sqlite3.Connection, namespace_id: int):
+        """递增命名空间修订号，使该命名空间的选择缓存失效"""
+        conn.execute(
+            """
+            UPDATE namespaces
+            SET revision = revision + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """,
+            (namespace_id,),
+        )
+
     # 服务器管理方法
     def add_server(self, config: Host, namespace: str = "default") -> int:
         """添加服务器配置"""
@@ -187,6 +272,8 @@ class ConfigStorage:
                 ),
             )
 
+            self._refresh_server_memberships(conn, cursor.lastrowid)
+            self._bump_revision(conn, namespace_id)
             conn.commit()
             return cursor.lastrowid
 
@@ -205,7 +292,7 @@ class ConfigStorage:
             if not row:
                 return None
 
-            return self._row_to_server_config(row)
+            return self._row_to_server_config(row, namespace)
 
     def list_servers(
         self, namespace: str = "default", name_pattern: str = None
@@ -227,7 +314,7 @@ class ConfigStorage:
                     (namespace_id,),
                 ).fetchall()
 
-            return [self._row_to_server_config(row) for row in rows]
+            return [self._row_to_server_config(row, namespace) for row in rows]
 
     def update_server(
         self, name: str, updates: Dict[str, Any], namespace: str = "default"
@@ -263,6 +350,13 @@ class ConfigStorage:
             """,
                 values,
             )
+            row = conn.execute(
+                "SELECT id FROM servers WHERE namespace_id = ? AND name = ?",
+                (namespace_id, updates.get("name", name)),
+            ).fetchone()
+            if row:
+                self._refresh_server_memberships(conn, row["id"])
+            self._bump_revision(conn, namespace_id)
             conn.commit()
 
         return True
@@ -278,6 +372,8 @@ class ConfigStorage:
                 "DELETE FROM servers WHERE namespace_id = ? AND name = ?",
                 (namespace_id, name),
             )
+            if cursor.rowcount > 0:
+                self._bump_revision(conn, namespace_id)
             conn.commit()
             return cursor.rowcount > 0
 
@@ -288,6 +384,9 @@ class ConfigStorage:
         if not namespace_id:
             raise ValueError(f"Namespace '{namespace}' does not exist")
 
+        # 提前编译选择表达式，无效表达式直接拒绝
+        compile_selector(group.ip_expression, group.label_expression)
+
         with self._get_connection() as conn:
             labels_json = json.dumps(group.default_labels or {})
 
@@ -314,6 +413,11 @@ class ConfigStorage:
                 ),
             )
 
+            row = conn.execute(
+                "SELECT * FROM server_groups WHERE id = ?", (cursor.lastrowid,)
+            ).fetchone()
+            self._rebuild_group_members(conn, row)
+            self._bump_revision(conn, namespace_id)
             conn.commit()
             return cursor.lastrowid
 
@@ -369,15 +473,192 @@ class ConfigStorage:
                 "DELETE FROM server_groups WHERE namespace_id = ? AND name = ?",
                 (namespace_id, name),
             )
+            if cursor.rowcount > 0:
+                self._bump_revision(conn, namespace_id)
             conn.commit()
             return cursor.rowcount > 0
 
+    def list_group_servers(self, name: str, namespace: str = "default") -> List[Host]:
+        """列出服务器组的成员服务器"""
+        namespace_id = self._get_namespace_id(namespace)
+        if not namespace_id:
+            return []
+
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT s.* FROM server_groups AS g
+                JOIN server_group_members AS m ON m.group_id = g.id
+                JOIN servers AS s ON s.id = m.server_id
+                WHERE g.namespace_id = ? AND g.name = ?
+                ORDER BY s.name
+            """,
+                (namespace_id, name),
+            ).fetchall()
+
+            return [self._row_to_server_config(row, namespace) for row in rows]
+
+    def get_group_member_counts(self, namespace: str = "default") -> Dict[str, int]:
+        """获取命名空间中各服务器组的成员数量"""
+        namespace_id = self._get_namespace_id(namespace)
+        if not namespace_id:
+            return {}
+
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT g.name, COUNT(m.server_id) AS members
+                FROM server_groups AS g
+                LEFT JOIN server_group_members AS m ON m.group_id = g.id
+                WHERE g.namespace_id = ?
+                GROUP BY g.id
+            """,
+                (namespace_id,),
+            ).fetchall()
+
+            return {row["name"]: row["members"] for row in rows}
+
+    def _group_matcher(self, group_row):
+        """编译服务器组的选择条件，无效表达式视为不匹配任何服务器"""
+        try:
+            return compile_selector(
+                group_row["ip_expression"], group_row["label_expression"]
+            )
+        except ValueError:
+            return None
+
+    def _refresh_server_memberships(self, conn: sqlite3.Connection, server_id: int):
+        """仅针对单个服务器重新计算其所属的服务器组"""
+        row = conn.execute("SELECT * FROM servers WHERE id = ?", (server_id,)).fetchone()
+        server = self._row_to_server_config(row)
+
+        groups = conn.execute(
+            "SELECT * FROM server_groups WHERE namespace_id = ?",
+            (row["namespace_id"],),
+        ).fetchall()
+
+        conn.execute(
+            "DELETE FROM server_group_members WHERE server_id = ?", (server_id,)
+        )
+        conn.executemany(
+            "INSERT INTO server_group_members (group_id, server_id) VALUES (?, ?)",
+            [
+                (group["id"], server_id)
+                for group in groups
+                if (matches := self._group_matcher(group)) and matches(server)
+            ],
+        )
+
+    def _rebuild_group_members(self, conn: sqlite3.Connection, group_row):
+        """针对整个命名空间重新计算服务器组成员"""
+        conn.execute(
+            "DELETE FROM server_group_members WHERE group_id = ?", (group_row["id"],)
+        )
+
+        matches = self._group_matcher(group_row)
+        if not matches:
+            return
+
+        rows = conn.execute(
+            "SELECT * FROM servers WHERE namespace_id = ?",
+            (group_row["namespace_id"],),
+        ).fetchall()
+        conn.executemany(
+            "INSERT INTO server_group_members (group_id, server_id) VALUES (?, ?)",
+            [
+                (group_row["id"], row["id"])
+                for row in rows
+                if matches(self._row_to_server_config(row))
+            ],
+        )
+
+    # 选择结果缓存
+    def resolve_selection(
+        self,
+        namespace: str = "default",
+        ip_expression: str = None,
+        label_expression: str = None,
+    ) -> List[Host]:
+        """按IP/标签表达式选择服务器
+
+        选择结果（服务器ID）以 (命名空间, 修订号, 表达式) 为键缓存，
+        命名空间内任意服务器或组变更后修订号递增，旧缓存随之失效。
+        """
+        namespace_id = self._get_namespace_id(namespace)
+        if not namespace_id:
+            return []
+
+        expression = json.dumps(
+            [(ip_expression or "").strip(), (label_expression or "").strip()]
+        )
+
+        with self._get_connection() as conn:
+            revision = conn.execute(
+                "SELECT revision FROM namespaces WHERE id = ?", (namespace_id,)
+            ).fetchone()["revision"]
+
+            cached = conn.execute(
+                """
+                SELECT server_ids FROM selection_cache
+                WHERE namespace_id = ? AND revision = ? AND expression = ?
+            """,
+                (namespace_id, revision, expression),
+            ).fetchone()
+
+            if cached:
+                rows = conn.execute(
+                    """
+                    SELECT s.* FROM json_each(?) AS j
+                    JOIN servers AS s ON s.id = j.value
+                    WHERE s.namespace_id = ?
+                    ORDER BY s.name
+                """,
+                    (cached["server_ids"], namespace_id),
+                ).fetchall()
+                return [self._row_to_server_config(row, namespace) for row in rows]
+
+            rows = conn.execute(
+                "SELECT * FROM servers WHERE namespace_id = ? ORDER BY name",
+                (namespace_id,),
+            ).fetchall()
+
+            hosts = [self._row_to_server_config(row, namespace) for row in rows]
+            row_ids = {id(host): row["id"] for host, row in zip(hosts, rows)}
+            selected = select_servers(hosts, ip_expression, label_expression)
+
+            # 写缓存失败（如并发运行时数据库被锁）不影响本次选择结果
+            try:
+                conn.execute(
+                    "DELETE FROM selection_cache "
+                    "WHERE namespace_id = ? AND revision < ?",
+                    (namespace_id, revision),
+                )
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO selection_cache
+                        (namespace_id, revision, expression, server_ids)
+                    VALUES (?, ?, ?, ?)
+                """,
+                    (
+                        namespace_id,
+                        revision,
+                        expression,
+                        json.dumps([row_ids[id(host)] for host in selected]),
+                    ),
+                )
+                conn.commit()
+            except sqlite3.OperationalError:
+                conn.rollback()
+
+            return selected
+
     # 辅助方法
-    def _row_to_server_config(self, row) -> Host:
-        """数据库行转换为服务器配置"""
+    def _row_to_server_config(self, row, namespace: str = None) -> Host:
+        """数据库行转换为服务器配置（namespace 为服务器所属命名空间名）"""
         labels = json.loads(row["labels"] or "{}")
 
         return Host(
+            namespace=namespace,
             name=row["name"],
             host=row["host"],
             port=row["port"],
@@ -443,6 +724,8 @@ class ConfigStorage:
             if format.lower() == "json":
                 json.dump(data, f, indent=2, ensure_ascii=False)
             else:  # yaml
+                import yaml
+
                 yaml.dump(data, f, indent=2, allow_unicode=True)
 
     def import_config(self, input_file: Path, namespace: str = None) -> None:
@@ -451,6 +734,8 @@ class ConfigStorage:
             if input_file.suffix.lower() == ".json":
                 data = json.load(f)
             else:  # yaml
+                import yaml
+
                 data = yaml.safe_load(f)
 
         # 处理命名空间
@@ -0,0 +1,489 @@
+"""归档流式上传模块
+
+通过 SFTP 上传大量小文件时，每个文件都有 open/write/close/setstat 往返，且每台
+主机各自重复一遍。归档模式将目录打包为 tar（可选 gzip/zstd 压缩），经一个 exec
+通道写入远程的 tar -x，逐文件往返变为一条连续的字节流：
+- 归档边生成边发送，不写临时文件：生成线程将数据块写入共享缓冲，同时接收的
+  主机各自按进度读取，所有主机都已读取的数据块立即释放；最慢的主机落后
+  _WINDOW 个数据块时暂停生成，内存占用有上限
+- 主机数超过并发数时，第一批 max_concurrent 台主机读取共享流，生成线程同时将
+  归档写入临时文件；后续主机（未获得并发名额前无法读取共享流）从该文件读取，
+  归档只生成一次
+- auto 按链路带宽选择压缩：千兆及以上不压缩，较慢的链路使用更高的压缩级别；
+  未指定带宽时先向第一台主机写入一段随机数据实测（测量失败按千兆处理）
+- 远程需要 tar（zstd 还需要 zstd 命令），目录解压到 REMOTE_PATH/<目录名>
+
+zstd 压缩需要安装 zstandard（pip install zstandard）。
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import shlex
+import tarfile
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Deque, Dict, List, Optional, Set, Tuple, Union
+
+import asyncssh
+
+from pypssh.core.models import (
+    ConnectionConfig,
+    ExecutionStatus,
+    TransferMode,
+    TransferResult,
+)
+from pypssh.core.session import ErrorPolicy
+from pypssh.core.transfer import (
+    FileTransfer,
+    HashCache,
+    TransferTuning,
+)
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Transfer timeout after {config.connect_timeout}s",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Archive error",
+)
+
+COMPRESSIONS = ("auto", "none", "gzip", "zstd")
+
+# 每次写入通道的字节数，写满后等待对端窗口
+_CHUNK = 1024 * 1024
+
+# 共享缓冲最多保留的数据块数
+_WINDOW = 32
+
+# 带宽测量最多写入的字节数与时长（秒），达到任一即停止
+_PROBE_BYTES = 8 * 1024 * 1024
+_PROBE_TIME = 1.0
+
+# (带宽下限 字节/秒, gzip 级别, zstd 级别)：带宽越低，压缩越值得花 CPU
+_LEVELS = (
+    (125_000_000, 0, 0),
+    (12_500_000, 1, 3),
+    (0, 6, 9),
+)
+
+
+class ArchiveError(Exception):
+    """远程解压失败"""
+
+
+def choose_compression(
+    compression: str, bandwidth: int, level: Optional[int] = None
+) -> Tuple[str, int]:
+    """按链路带宽（字节/秒）确定压缩算法与级别"""
+    for floor, gzip_level, zstd_level in _LEVELS:
+        if bandwidth >= floor:
+            break
+    if compression == "auto":
+        compression = "gzip" if gzip_level else "none"
+    if compression == "none":
+        return "none", 0
+    if level is None:
+        level = max(gzip_level if compression == "gzip" else zstd_level, 1)
+    return compression, level
+
+
+async def measure_bandwidth(
+    conn: asyncssh.SSHClientConnection,
+    max_bytes: int = _PROBE_BYTES,
+    max_time: float = _PROBE_TIME,
+) -> int:
+    """向远程 cat 写入随机数据，按全部到达远程的耗时估计通道带宽（字节/秒）"""
+    block = os.urandom(64 * 1024)
+    sent = 0
+    start = time.perf_counter()
+    async with conn.create_process("cat > /dev/null", encoding=None) as process:
+        while sent < max_bytes and time.perf_counter() - start < max_time:
+            process.stdin.write(block)
+            await process.stdin.drain()
+            sent += len(block)
+        process.stdin.write_eof()
+        await process.wait()
+    return int(sent / max(time.perf_counter() - start, 1e-6))
+
+
+def extract_command(
+    remote_path: str, compression: str = "none", preserve: bool = True
+) -> str:
+    """远程解压命令：从标准输入读取归档并解压到 remote_path"""
+    target = shlex.quote(remote_path)
+    tar = "tar -x --no-same-owner"
+    if not preserve:
+        tar += " -m"
+    if compression == "gzip":
+        tar += " -z"
+    tar += f" -C {target} -f -"
+    if compression == "zstd":
+        tar = f"zstd -dcq | {tar}"
+    return f"mkdir -p -- {target} && {tar}"
+
+
+def write_archive(
+    local_path: str, fileobj: BinaryIO, compression: str = "none", level: int = 0
+):
+    """将目录以 tar 流（可选压缩）顺序写入 fileobj"""
+    root = Path(local_path)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(
+                "zstd compression requires zstandard (pip install zstandard)"
+            ) from None
+        stream = zstandard.ZstdCompressor(level=level).stream_writer(
+            fileobj, closefd=False
+        )
+    elif compression == "gzip":
+        stream = gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=level)
+    else:
+        stream = None
+
+    if stream is None:
+        with tarfile.open(fileobj=fileobj, mode="w|") as tar:
+            tar.add(root, arcname=root.name)
+        return
+    with stream:
+        with tarfile.open(fileobj=stream, mode="w|") as tar:
+            tar.add(root, arcname=root.name)
+
+
+class _Aborted(Exception):
+    """所有主机都已放弃读取，停止生成归档"""
+
+
+class ArchiveStream:
+    """在生成线程与多个主机之间共享的归档缓冲
+
+    生成线程通过 writer() 写入数据，按 _CHUNK 切块放入缓冲；每个读者（主机）按自己
+    的进度读取，所有仍在读取的主机都已读过的数据块立即释放。缓冲满 window 块时
+    生成线程等待最慢的读者。归档在第一个读者开始读取时才开始生成。
+
+    指定 spool 时生成线程同时将归档写入该文件，供后续批次的主机通过
+    SpooledArchive 读取；此时即使所有读者都已放弃，也会生成完整的归档。
+    """
+
+    def __init__(
+        self,
+        local_path: str,
+        readers: int,
+        compression: str = "none",
+        level: int = 0,
+        window: int = _WINDOW,
+        spool: Optional[BinaryIO] = None,
+    ):
+        self.local_path = local_path
+        self.compression = compression
+        self.level = level
+        self.window = window
+        self.spool = spool
+        self._chunks: Deque[bytes] = deque()
+        # 缓冲中第一个数据块的序号
+        self._base = 0
+        self._positions = [0] * readers
+        self._active: Set[int] = set(range(readers))
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._producer: Optional[asyncio.Future] = None
+        self._changed = asyncio.Condition()
+
+    def _start(self):
+        if self._producer is None:
+            self._producer = asyncio.ensure_future(
+                asyncio.to_thread(self._produce, asyncio.get_running_loop())
+            )
+
+    def _produce(self, loop: asyncio.AbstractEventLoop):
+        """生成线程：写入归档并在结束时通知读者"""
+        writer = _ChunkWriter(self, loop)
+        error = None
+        try:
+            write_archive(self.local_path, writer, self.compression, self.level)
+            writer.flush()
+        except _Aborted:
+            pass
+        except Exception as exc:
+            error = exc
+        asyncio.run_coroutine_threadsafe(self._finish(error), loop).result()
+
+    async def _finish(self, error: Optional[BaseException]):
+        async with self._changed:
+            self._done = True
+            self._error = error
+            self._changed.notify_all()
+
+    async def put(self, chunk: bytes):
+        """放入一个数据块，缓冲已满时等待最慢的读者"""
+        async with self._changed:
+            await self._changed.wait_for(
+                lambda: not self._active or len(self._chunks) < self.window
+            )
+            if not self._active:
+                if self.spool is None:
+                    raise _Aborted
+                # 仍需写完临时文件，共享缓冲不再保留
+                return
+            self._chunks.append(chunk)
+            self._changed.notify_all()
+
+    async def read(self, reader: int) -> Optional[bytes]:
+        """读取下一个数据块，归档结束时返回 None"""
+        self._start()
+        async with self._changed:
+            position = self._positions[reader]
+            await self._changed.wait_for(
+                lambda: position < self._base + len(self._chunks) or self._done
+            )
+            if position >= self._base + len(self._chunks):
+                if self._error is not None:
+                    raise ArchiveError(f"Failed to build archive: {self._error}")
+                return None
+            chunk = self._chunks[position - self._base]
+            self._positions[reader] = position + 1
+            self._release()
+            return chunk
+
+    async def close(self, reader: int):
+        """读者结束（完成或失败），不再等待其进度"""
+        async with self._changed:
+            self._active.discard(reader)
+            self._release()
+
+    def _release(self):
+        # 释放所有仍在读取的主机都已读过的数据块
+        oldest = min(
+            (self._positions[reader] for reader in self._active),
+            default=self._base + len(self._chunks),
+        )
+        while self._base < oldest:
+            self._chunks.popleft()
+            self._base += 1
+        self._changed.notify_all()
+
+    async def wait(self):
+        """等待生成线程结束"""
+        if self._producer is not None:
+            await self._producer
+
+
+class SpooledArchive:
+    """从 ArchiveStream 写入的临时文件读取归档，接口与 ArchiveStream 相同"""
+
+    def __init__(self, source: ArchiveStream):
+        self.source = source
+        self._offsets: Dict[int, int] = {}
+        # 各读者共用文件对象，定位与读取需互斥
+        self._lock = threading.Lock()
+
+    def _read_at(self, offset: int) -> bytes:
+        with self._lock:
+            self.source.spool.seek(offset)
+            return self.source.spool.read(_CHUNK)
+
+    async def read(self, reader: int) -> Optional[bytes]:
+        """读取下一个数据块，归档结束时返回 None；归档生成完成前等待"""
+        self.source._start()
+        await self.source.wait()
+        if self.source._error is not None:
+            raise ArchiveError(f"Failed to build archive: {self.source._error}")
+        offset = self._offsets.get(reader, 0)
+        chunk = await asyncio.to_thread(self._read_at, offset)
+        if not chunk:
+            return None
+        self._offsets[reader] = offset + len(chunk)
+        return chunk
+
+    async def close(self, reader: int):
+        """读者结束"""
+        self._offsets.pop(reader, None)
+
+    async def wait(self):
+        await self.source.wait()
+
+
+class _ChunkWriter:
+    """生成线程使用的类文件对象：按 _CHUNK 切块交给事件循环中的 ArchiveStream"""
+
+    def __init__(self, stream: ArchiveStream, loop: asyncio.AbstractEventLoop):
+        self.stream = stream
+        self.loop = loop
+        self.buffer = bytearray()
+
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= _CHUNK:
+            self._put(bytes(self.buffer[:_CHUNK]))
+            del self.buffer[:_CHUNK]
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def _put(self, chunk: bytes):
+        if self.stream.spool is not None:
+            self.stream.spool.write(chunk)
+        asyncio.run_coroutine_threadsafe(self.stream.put(chunk), self.loop).result()
+
+
+class ArchiveTransfer(FileTransfer):
+    """以归档流上传目录的传输器"""
+
+    def __init__(
+        self,
+        compression: str = "auto",
+        level: Optional[int] = None,
+        bandwidth: Optional[int] = None,
+        **kwargs,
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown compression '{compression}': "
+                f"expected one of {', '.join(COMPRESSIONS)}"
+            )
+        super().__init__(**kwargs)
+        self.compression = compression
+        self.level = level
+        # 链路带宽（字节/秒），未指定时实测（仅在需要据此选择压缩时）
+        self.bandwidth = bandwidth
+
+    async def upload_parallel(
+        self,
+        configs: List[ConnectionConfig],
+        local_path: str,
+        remote_path: str,
+        recursive: bool = False,
+        preserve: bool = True,
+        tuning: Optional[TransferTuning] = None,
+        skip_identical: bool = False,
+        hash_cache: Optional[HashCache] = None,
+    ) -> List[TransferResult]:
+        """打包目录并流式上传到多个主机
+
+        单个文件与未指定 recursive 的目录按普通方式上传（后者与 sftp put 相同，报错）。
+        """
+        if not (recursive and Path(local_path).is_dir()):
+            return await super().upload_parallel(
+                configs,
+                local_path,
+                remote_path,
+                recursive,
+                preserve,
+                tuning,
+                skip_identical,
+                hash_cache,
+            )
+
+        if skip_identical:
+            raise ValueError("Archive uploads cannot skip identical files")
+        bandwidth = self.bandwidth
+        if bandwidth is None:
+            if self.compression == "auto" or (
+                self.compression != "none" and self.level is None
+            ):
+                bandwidth = await self._probe_bandwidth(configs[0])
+            else:
+                bandwidth = (tuning or TransferTuning()).bandwidth
+        compression, level = choose_compression(self.compression, bandwidth, self.level)
+        command = extract_command(remote_path, compression, preserve)
+
+        # 第一批主机同时接收共享流，其余主机读取生成时写入的临时文件
+        size = self.max_concurrent
+        spool = tempfile.TemporaryFile() if len(configs) > size else None
+        stream = ArchiveStream(
+            local_path, min(size, len(configs)), compression, level, spool=spool
+        )
+        replay = SpooledArchive(stream) if spool is not None else None
+        try:
+            return await self._gather_with_progress(
+                self._stream_single(
+                    config,
+                    local_path,
+                    remote_path,
+                    command,
+                    stream if index < size else replay,
+                    index,
+                )
+                for index, config in enumerate(configs)
+            )
+        finally:
+            await stream.wait()
+            if spool is not None:
+                spool.close()
+
+    async def _probe_bandwidth(self, config: ConnectionConfig) -> int:
+        """实测到第一台主机的链路带宽，失败时按千兆处理"""
+        try:
+            async with self._session(config) as session:
+                bandwidth = await measure_bandwidth(session.conn)
+        except Exception as exc:
+            bandwidth = TransferTuning().bandwidth
+            logger.warning(
+                "Bandwidth probe to %s failed (%s), assuming %d Mbit/s",
+                config.host,
+                exc,
+                bandwidth * 8 // 1_000_000,
+            )
+        else:
+            logger.debug("Measured %.1f Mbit/s to %s", bandwidth * 8 / 1e6, config.host)
+        return bandwidth
+
+    async def _stream_single(
+        self,
+        config: ConnectionConfig,
+        local_path: str,
+        remote_path: str,
+        command: str,
+        archive: Union[ArchiveStream, SpooledArchive],
+        reader: int,
+    ) -> TransferResult:
+        """将归档流写入单个主机上的解压命令"""
+
+        result = TransferResult(
+            host=config.host,
+            mode=TransferMode.UPLOAD,
+            local_path=local_path,
+            remote_path=remote_path,
+            status=ExecutionStatus.PENDING,
+            start_time=time.time(),
+        )
+
+        async def stream(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            async with conn.create_process(command, encoding=None) as process:
+                try:
+                    while (chunk := await archive.read(reader)) is not None:
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+                        result.transferred_bytes += len(chunk)
+                    process.stdin.write_eof()
+                except (BrokenPipeError, ConnectionError):
+                    # 远程提前退出，错误信息取自退出状态与 stderr
+                    pass
+                finally:
+                    await archive.close(reader)
+                completed = await process.wait()
+            if completed.exit_status != 0:
+                stderr = (completed.stderr or b"").decode("utf-8", errors="replace")
+                raise ArchiveError(
+                    stderr.strip() or f"tar exited with {completed.exit_status}"
+                )
+            result.status = ExecutionStatus.SUCCESS
+
+        try:
+            return await self._run_on_host(
+                config, result, stream, _ARCHIVE_ERRORS, "transfer_time"
+            )
+        finally:
+            # 连接失败时步骤未运行，同样不再等待该主机
+            await archive.close(reader)
@@ -3,46 +3,46 @@
 import asyncio
 import asyncssh
 import time
-from typing import List, Callable
+from typing import List, Callable, Optional
 
+from pypssh.core.events import EventBus
 from pypssh.core.models import (
     ConnectivityResult,
     ConnectivityStatus,
     ConnectionConfig,
 )
+from pypssh.core.session import ConnectionPool, ErrorPolicy, RetryPolicy, SessionEngine
+
+_PING_ERRORS = ErrorPolicy(
+    timeout_status=ConnectivityStatus.TIMEOUT,
+    timeout_message="Connection timeout after {config.connect_timeout}s",
+    error_status=ConnectivityStatus.UNREACHABLE,
+    error_prefix="Connection error",
+    auth_status=ConnectivityStatus.AUTH_FAILED,
+)
 
 
-class ConnectivityTester:
+class ConnectivityTester(SessionEngine):
     """连通性测试器"""
 
-    def __init__(self, max_concurrent: int = 50, progress_callback: Callable = None):
-        self.max_concurrent = max_concurrent
-        self.progress_callback = progress_callback
-        self._semaphore = asyncio.Semaphore(max_concurrent)
+    def __init__(
+        self,
+        max_concurrent: int = 50,
+        progress_callback: Callable = None,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        events: Optional[EventBus] = None,
+    ):
+        super().__init__(max_concurrent, progress_callback, pool, retry, events)
 
     async def test_parallel(
         self, configs: List[ConnectionConfig]
     ) -> List[ConnectivityResult]:
         """并行测试连通性"""
 
-        tasks = []
-        for config in configs:
-            task = asyncio.create_task(self._test_single(config))
-            tasks.append(task)
-
-        results = []
-        completed = 0
-        total = len(tasks)
-
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            results.append(result)
-            completed += 1
-
-            if self.progress_callback:
-                self.progress_callback(completed, total, result)
-
-        return results
+        return await self._gather_with_progress(
+            self._test_single(config) for config in configs
+        )
 
     async def _test_single(self, config: ConnectionConfig) -> ConnectivityResult:
         """测试单个主机连通性"""
@@ -54,61 +54,22 @@ class ConnectivityTester:
             start_time=time.time(),
         )
 
-        async with self._semaphore:
-            try:
-                # 准备连接参数
-                connect_kwargs = {
-                    "host": config.host,
-                    "port": config.port,
-                    "username": config.username,
-                    "connect_timeout": config.connect_timeout,
-                    "known_hosts": config.known_hosts,
-                }
-
-                if config.password:
-                    connect_kwargs["password"] = config.password
-                elif config.private_key:
-                    connect_kwargs["client_keys"] = [config.private_key]
-                elif config.private_key_path:
-                    connect_kwargs["client_keys"] = [config.private_key_path]
-
-                # 尝试建立SSH连接
-                async with asyncssh.connect(**connect_kwargs) as conn:
-                    # 执行简单命令测试
-                    ssh_result = await asyncio.wait_for(
-                        conn.run('echo "connectivity_test"', check=False), timeout=5.0
-                    )
-
-                    if ssh_result.exit_status == 0:
-                        result.status = ConnectivityStatus.REACHABLE
-                        result.ssh_available = True
-                    else:
-                        result.status = ConnectivityStatus.REACHABLE
-                        result.ssh_available = False
-                        result.error_message = (
-                            "SSH connection established but command execution failed"
-                        )
-
-            except asyncio.TimeoutError:
-                result.status = ConnectivityStatus.TIMEOUT
+        async def probe(conn: asyncssh.SSHClientConnection):
+            # 执行简单命令测试
+            ssh_result = await asyncio.wait_for(
+                conn.run('echo "connectivity_test"', check=False), timeout=5.0
+            )
+
+            if ssh_result.exit_status == 0:
+                result.status = ConnectivityStatus.REACHABLE
+                result.ssh_available = True
+            else:
+                result.status = ConnectivityStatus.REACHABLE
+                result.ssh_available = False
                 result.error_message = (
-                    f"Connection timeout after {config.connect_timeout}s"
+                    "SSH connection established but command execution failed"
                 )
 
-            except asyncssh.PermissionDenied:
-                result.status = ConnectivityStatus.AUTH_FAILED
-                result.error_message = "Authentication failed"
-
-            except asyncssh.Error as e:
-                result.status = ConnectivityStatus.UNREACHABLE
-                result.error_message = f"SSH Error: {str(e)}"
-
-            except Exception as e:
-                result.status = ConnectivityStatus.UNREACHABLE
-                result.error_message = f"Connection error: {str(e)}"
-
-            finally:
-                result.end_time = time.time()
-                result.response_time = result.end_time - result.start_time
-
-        return result
+        return await self._run_on_host(
+            config, result, probe, _PING_ERRORS, "response_time"
+        )
@@ -0,0 +1,290 @@
+"""会话事件模块
+
+引擎在主机会话的关键节点发出带单调时间戳的结构化事件，订阅者可据此记录
+追踪、统计耗时分布。没有订阅者时发出事件只有一次判断的开销。
+
+事件按时间顺序（每个会话）为::
+
+    queued -> connecting -> [retry ...] -> authenticated
+           -> exec_started -> [first_byte] -> finished
+
+内置两种订阅者：JsonlTraceWriter 每个事件写一行JSON；SpanExporter 在会话结束时
+将其转换为 OpenTelemetry span，按 OTLP/JSON 格式每个会话写一行。
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+class EventType(Enum):
+    """会话事件类型"""
+
+    QUEUED = "queued"
+    CONNECTING = "connecting"
+    RETRY = "retry"
+    AUTHENTICATED = "authenticated"
+    EXEC_STARTED = "exec_started"
+    FIRST_BYTE = "first_byte"
+    FINISHED = "finished"
+
+
+@dataclass
+class Event:
+    """会话事件
+
+    timestamp 为单调时钟（用于计算耗时），wall_time 为对应的Unix时间。
+    session 在一次进程内唯一，用于关联同一会话的事件。
+    """
+
+    type: EventType
+    host: str
+    port: int
+    session: int
+    timestamp: float
+    wall_time: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "event": self.type.value,
+            "ts": self.timestamp,
+            "time": self.wall_time,
+            "host": self.host,
+            "port": self.port,
+            "session": self.session,
+            **self.attrs,
+        }
+
+
+EventHandler = Callable[[Event], None]
+
+
+class EventBus:
+    """同步事件总线：事件在事件循环线程中依次交给各订阅者"""
+
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+
+    @property
+    def active(self) -> bool:
+        """是否有订阅者"""
+        return bool(self._handlers)
+
+    def subscribe(self, handler: EventHandler) -> EventHandler:
+        self._handlers.append(handler)
+        return handler
+
+    def unsubscribe(self, handler: EventHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def emit(self, type: EventType, host: str, port: int, session: int, **attrs: Any):
+        """发出事件（订阅者异常只记录日志，不影响引擎）"""
+        if not self._handlers:
+            return
+
+        event = Event(
+            type=type,
+            host=host,
+            port=port,
+            session=session,
+            timestamp=time.monotonic(),
+            wall_time=time.time(),
+            attrs=attrs,
+        )
+        for handler in list(self._handlers):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception(f"Event handler failed for {type.value}")
+
+
+# 进程级默认总线，引擎未指定总线时使用
+EVENTS = EventBus()
+
+
+class JsonlTraceWriter:
+    """将事件以 JSON Lines 写入文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = open(path, "w", encoding="utf-8")
+
+    def __call__(self, event: Event):
+        if self._file is not None:
+            self._file.write(json.dumps(event.to_dict(), default=str) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# OTLP span 状态码
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+# 视为成功的结束状态：执行/传输成功（含已是最新的跳过上传）、主机可达
+_OK_STATUSES = ("success", "reachable")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attrs.items()
+        if value is not None
+    ]
+
+
+def _nanos(event: Event) -> str:
+    return str(int(event.wall_time * 1e9))
+
+
+class SpanExporter:
+    """将每个会话导出为 OpenTelemetry span（OTLP/JSON，每个会话一行）
+
+    每个会话生成一个根 span（queued 到 finished），以及子 span：
+    queue（等待并发名额）、connect（含 retry 事件）、exec（含 first_byte 事件）。
+    同一导出器写出的 span 属于同一个 trace。输出可由 OpenTelemetry Collector
+    的 otlpjsonfile 接收器读取。
+    """
+
+    SERVICE_NAME = "pypssh"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.trace_id = os.urandom(16).hex()
+        self._file: Optional[TextIO] = open(path, "w", encoding="utf-8")
+        self._sessions: Dict[int, List[Event]] = {}
+
+    def __call__(self, event: Event):
+        events = self._sessions.setdefault(event.session, [])
+        events.append(event)
+        if event.type == EventType.FINISHED:
+            del self._sessions[event.session]
+            self._write(self.build_spans(events))
+
+    def build_spans(self, events: List[Event]) -> List[Dict[str, Any]]:
+        """将一个会话的事件转换为 span 列表（根 span 在前）"""
+        by_type: Dict[EventType, Event] = {}
+        for event in events:
+            by_type.setdefault(event.type, event)
+
+        first, last = events[0], events[-1]
+        finished = by_type.get(EventType.FINISHED)
+        status = finished.attrs.get("status") if finished else None
+
+        root_id = os.urandom(8).hex()
+        root = self._span(
+            f"pypssh.session {first.host}",
+            root_id,
+            None,
+            first,
+            last,
+            {
+                "server.address": first.host,
+                "server.port": first.port,
+                "pypssh.session": first.session,
+                **{
+                    f"pypssh.{key}": value
+                    for key, value in (finished.attrs if finished else {}).items()
+                },
+            },
+        )
+        root["status"] = (
+            {"code": _STATUS_OK}
+            if status in _OK_STATUSES
+            else {"code": _STATUS_ERROR, "message": str(status)}
+        )
+        spans = [root]
+
+        phases = [
+            ("queue", EventType.QUEUED, EventType.CONNECTING),
+            ("connect", EventType.CONNECTING, EventType.AUTHENTICATED),
+            ("exec", EventType.EXEC_STARTED, EventType.FINISHED),
+        ]
+        for name, start_type, end_type in phases:
+            start = by_type.get(start_type)
+            if start is None:
+                continue
+            end = by_type.get(end_type, last)
+            span = self._span(name, os.urandom(8).hex(), root_id, start, end, {})
+            span["events"] = [
+                {
+                    "timeUnixNano": _nanos(event),
+                    "name": event.type.value,
+                    "attributes": _otlp_attributes(event.attrs),
+                }
+                for event in events
+                if event.type in (EventType.RETRY, EventType.FIRST_BYTE)
+                and start.timestamp <= event.timestamp <= end.timestamp
+            ]
+            spans.append(span)
+
+        return spans
+
+    def _span(
+        self,
+        name: str,
+        span_id: str,
+        parent_id: Optional[str],
+        start: Event,
+        end: Event,
+        attrs: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": span_id,
+            "name": name,
+            # SPAN_KIND_CLIENT
+            "kind": 3,
+            "startTimeUnixNano": _nanos(start),
+            "endTimeUnixNano": _nanos(end),
+            "attributes": _otlp_attributes(attrs),
+        }
+        if parent_id:
+            span["parentSpanId"] = parent_id
+        return span
+
+    def _write(self, spans: List[Dict[str, Any]]):
+        if self._file is None:
+            return
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": self.SERVICE_NAME}
+                        )
+                    },
+                    "scopeSpans": [{"scope": {"name": "pypssh"}, "spans": spans}],
+                }
+            ]
+        }
+        self._file.write(json.dumps(payload) + "\n")
+
+    def close(self):
+        """写出未结束的会话并关闭文件"""
+        for events in self._sessions.values():
+            self._write(self.build_spans(events))
+        self._sessions.clear()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,128 +1,364 @@
 import asyncio
 import asyncssh
+import math
+import signal
 import time
-from typing import List, Callable
+from collections import deque
+from typing import Awaitable, Deque, Dict, List, Callable, Optional
 import logging
 
+from pypssh.core.events import EventBus, EventType
 from pypssh.core.models import ConnectionConfig, ExecutionResult, ExecutionStatus
+from pypssh.core.session import (
+    ConnectionPool,
+    ErrorPolicy,
+    RetryPolicy,
+    SessionEngine,
+    emit_event,
+)
 
+# 流式输出回调：(config, stream, data)，data 为空表示该流结束
+OutputCallback = Callable[[ConnectionConfig, str, bytes], Awaitable[None]]
 
-class SSHExecutor:
+STREAM_CHUNK_SIZE = 65536
+
+# 流式输出时结果中保留的每个流的末尾字节数（其余内容已经回调实时输出）
+STREAM_TAIL_BYTES = 1024 * 1024
+
+_EXEC_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Command timeout after {config.command_timeout}s",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Unexpected error",
+    log=True,
+)
+
+
+def parse_batch_size(value: str, total: int) -> int:
+    """解析滚动批次大小：N（主机数）或 P%（占总主机数的百分比，向上取整）"""
+    value = str(value).strip()
+    try:
+        if value.endswith("%"):
+            percent = float(value[:-1])
+            if not 0 < percent <= 100:
+                raise ValueError
+            return max(1, math.ceil(total * percent / 100))
+
+        size = int(value)
+        if size <= 0:
+            raise ValueError
+        return size
+    except ValueError:
+        raise ValueError(
+            f"Invalid batch size '{value}': expected a positive integer or a percentage"
+        )
+
+
+class _TailBuffer:
+    """输出缓冲，limit 不为空时只保留最后 limit 字节"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.dropped = 0
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+
+    def append(self, data: bytes):
+        self._chunks.append(data)
+        self._size += len(data)
+        if self.limit is None:
+            return
+        while self._size > self.limit:
+            excess = self._size - self.limit
+            first = self._chunks[0]
+            if len(first) <= excess:
+                self._chunks.popleft()
+                removed = len(first)
+            else:
+                self._chunks[0] = first[excess:]
+                removed = excess
+            self._size -= removed
+            self.dropped += removed
+
+    def text(self) -> str:
+        text = b"".join(self._chunks).decode("utf-8", errors="replace")
+        if self.dropped:
+            text = f"[... {self.dropped} bytes omitted ...]\n{text}"
+        return text
+
+
+class SSHExecutor(SessionEngine):
     """优化的SSH并行执行器"""
 
-    def __init__(self, max_concurrent: int = 50, progress_callback: Callable = None):
-        self.max_concurrent = max_concurrent
-        self.progress_callback = progress_callback
+    def __init__(
+        self,
+        max_concurrent: int = 50,
+        progress_callback: Callable = None,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        events: Optional[EventBus] = None,
+    ):
+        super().__init__(max_concurrent, progress_callback, pool, retry, events)
         self.logger = logging.getLogger(__name__)
-        self._semaphore = asyncio.Semaphore(max_concurrent)
 
     async def execute_parallel(
-        self, configs: List[ConnectionConfig], command: str, stop_on_error: bool = False
+        self,
+        configs: List[ConnectionConfig],
+        command: str,
+        stop_on_error: bool = False,
+        pty: bool = False,
+        output_callback: Optional[OutputCallback] = None,
+        batch_size: Optional[int] = None,
+        max_fail: Optional[int] = None,
     ) -> List[ExecutionResult]:
-        """并行执行SSH命令"""
+        """并行执行SSH命令
 
-        tasks = []
-        results = []
+        pty 为真时分配伪终端执行；设置 output_callback 时流式读取输出，
+        通过 ``await output_callback(config, stream, data)`` 实时回调
+        （stream 为 "stdout"/"stderr"，data 为空表示该流结束）。
 
-        for config in configs:
-            task = asyncio.create_task(self._execute_single(config, command))
-            tasks.append((config.host, task))
+        滚动执行：batch_size 为同时在途的主机数，采用滑动窗口，一台主机完成后立即
+        启动下一台，而不是等待整批完成；失败主机数超过 max_fail 后不再启动新主机，
+        在途主机继续执行完毕。stop_on_error 则在首个错误时立即取消在途主机。
+        未启动或被取消的主机以 CANCELLED 状态返回。结果按 configs 的顺序返回，
+        进度按完成顺序回调。
+        """
 
+        window = batch_size or self.max_concurrent
+        pending = iter(enumerate(configs))
+        # 在途任务 -> 主机在 configs 中的序号
+        running: Dict[asyncio.Task, int] = {}
+        results: List[Optional[ExecutionResult]] = [None] * len(configs)
+        failures = 0
+        halted = cancel_running = False
         completed = 0
-        total = len(tasks)
+        total = len(configs)
 
-        # 等待所有任务完成
-        for host, task in tasks:
+        def launch():
+            # 补满窗口
+            while not halted and len(running) < window:
+                index, config = next(pending, (None, None))
+                if config is None:
+                    return
+                if pty or output_callback is not None:
+                    coro = self._execute_single_streaming(
+                        config, command, pty, output_callback
+                    )
+                else:
+                    coro = self._execute_single(config, command)
+                running[asyncio.create_task(coro)] = index
+
+        async with self.reporter:
             try:
-                result = await task
-                results.append(result)
-                completed += 1
-
-                if self.progress_callback:
-                    self.progress_callback(completed, total, result)
-
-                # 如果设置了遇错停止且当前任务失败
-                if stop_on_error and result.status == ExecutionStatus.ERROR:
-                    # 取消剩余任务
-                    for _, remaining_task in tasks[completed:]:
-                        remaining_task.cancel()
-                    break
+                launch()
+                while running:
+                    done, _ = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+
+                    for task in done:
+                        index = running.pop(task)
+                        config = configs[index]
+                        try:
+                            result = task.result()
+                        except Exception as e:
+                            self.logger.error(
+                                f"Unexpected error for {config.host}: {e}"
+                            )
+                            result = ExecutionResult(
+                                host=config.host,
+                                port=config.port,
+                                status=ExecutionStatus.ERROR,
+                                error_message=str(e),
+                            )
+
+                        results[index] = result
+                        completed += 1
+
+                        await self.reporter.publish(completed, total, result)
+
+                        if result.status != ExecutionStatus.SUCCESS:
+                            failures += 1
+
+                        # 失败阈值持续评估
+                        if max_fail is not None and failures > max_fail:
+                            halted = True
+
+                        # 如果设置了遇错停止且当前任务失败
+                        if stop_on_error and result.status == ExecutionStatus.ERROR:
+                            halted = cancel_running = True
+
+                    if cancel_running:
+                        await self._cancel_running(
+                            configs, running, results, "Cancelled on error"
+                        )
+                    launch()
 
             except asyncio.CancelledError:
-                break
-            except Exception as e:
-                self.logger.error(f"Unexpected error for {host}: {e}")
-                results.append(
-                    ExecutionResult(
-                        host=host, status=ExecutionStatus.ERROR, error_message=str(e)
-                    )
+                await self._cancel_running(
+                    configs, running, results, "Execution was cancelled"
                 )
+                raise
+
+        # 未启动的主机
+        for index, config in pending:
+            results[index] = self._cancelled_result(
+                config, "Not started: execution halted"
+            )
 
         return results
 
+    async def _cancel_running(
+        self,
+        configs: List[ConnectionConfig],
+        running: Dict[asyncio.Task, int],
+        results: List[Optional[ExecutionResult]],
+        reason: str,
+    ):
+        """取消在途任务并记录为 CANCELLED"""
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+        for index in running.values():
+            results[index] = self._cancelled_result(configs[index], reason)
+        running.clear()
+
+    @staticmethod
+    def _cancelled_result(config: ConnectionConfig, reason: str) -> ExecutionResult:
+        return ExecutionResult(
+            host=config.host,
+            port=config.port,
+            status=ExecutionStatus.CANCELLED,
+            error_message=reason,
+        )
+
     async def _execute_single(
         self, config: ConnectionConfig, command: str
     ) -> ExecutionResult:
         """在单个主机上执行命令"""
 
         result = ExecutionResult(
-            host=config.host, status=ExecutionStatus.PENDING, start_time=time.time()
+            host=config.host,
+            port=config.port,
+            status=ExecutionStatus.PENDING,
+            start_time=time.time(),
         )
+        first_byte = False
 
-        async with self._semaphore:
-            try:
-                result.status = ExecutionStatus.RUNNING
-
-                # 准备连接参数
-                connect_kwargs = {
-                    "host": config.host,
-                    "port": config.port,
-                    "username": config.username,
-                    "connect_timeout": config.connect_timeout,
-                    "known_hosts": config.known_hosts,
-                }
-
-                if config.password:
-                    connect_kwargs["password"] = config.password
-                elif config.private_key:
-                    connect_kwargs["client_keys"] = [config.private_key]
-                elif config.private_key_path:
-                    connect_kwargs["client_keys"] = [config.private_key_path]
-
-                # 建立连接并执行命令
-                async with asyncssh.connect(**connect_kwargs) as conn:
-                    ssh_result = await asyncio.wait_for(
-                        conn.run(command, check=False), timeout=config.command_timeout
-                    )
-
-                    result.stdout = ssh_result.stdout
-                    result.stderr = ssh_result.stderr
-                    result.exit_code = ssh_result.exit_status
-                    result.status = (
-                        ExecutionStatus.SUCCESS
-                        if ssh_result.exit_status == 0
-                        else ExecutionStatus.ERROR
-                    )
+        async def read_stream(stream, name: str) -> str:
+            # 逐块读取以便记录首字节时间，结果与 conn.run 收集的输出相同
+            nonlocal first_byte
+            chunks: List[str] = []
+            while True:
+                data = await stream.read(STREAM_CHUNK_SIZE)
+                if not data:
+                    return "".join(chunks)
+                if not first_byte:
+                    first_byte = True
+                    emit_event(EventType.FIRST_BYTE, stream=name)
+                chunks.append(data)
 
-            except asyncio.TimeoutError:
-                result.status = ExecutionStatus.TIMEOUT
-                result.error_message = (
-                    f"Command timeout after {config.command_timeout}s"
+        async def collect(conn: asyncssh.SSHClientConnection):
+            async with conn.create_process(command) as process:
+                result.stdout, result.stderr = await asyncio.gather(
+                    read_stream(process.stdout, "stdout"),
+                    read_stream(process.stderr, "stderr"),
                 )
-                self.logger.warning(f"Timeout executing command on {config.host}")
+                return await process.wait()
 
-            except asyncssh.Error as e:
-                result.status = ExecutionStatus.ERROR
-                result.error_message = f"SSH Error: {str(e)}"
-                self.logger.error(f"SSH error for {config.host}: {e}")
+        async def run_command(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            ssh_result = await asyncio.wait_for(
+                collect(conn), timeout=config.command_timeout
+            )
 
-            except Exception as e:
-                result.status = ExecutionStatus.ERROR
-                result.error_message = f"Unexpected error: {str(e)}"
-                self.logger.error(f"Unexpected error for {config.host}: {e}")
+            result.exit_code = ssh_result.exit_status
+            result.status = (
+                ExecutionStatus.SUCCESS
+                if ssh_result.exit_status == 0
+                else ExecutionStatus.ERROR
+            )
+
+        return await self._run_on_host(
+            config, result, run_command, _EXEC_ERRORS, "execution_time"
+        )
+
+    async def _execute_single_streaming(
+        self,
+        config: ConnectionConfig,
+        command: str,
+        pty: bool = False,
+        output_callback: Optional[OutputCallback] = None,
+    ) -> ExecutionResult:
+        """在单个主机上以流式读取输出的方式执行命令（可选PTY）"""
 
-            finally:
-                result.end_time = time.time()
-                result.execution_time = result.end_time - result.start_time
+        result = ExecutionResult(
+            host=config.host,
+            port=config.port,
+            status=ExecutionStatus.PENDING,
+            start_time=time.time(),
+        )
+        # 输出已经回调实时输出时只保留末尾，长时间运行的命令内存占用有上限
+        limit = STREAM_TAIL_BYTES if output_callback else None
+        stdout_data = _TailBuffer(limit)
+        stderr_data = _TailBuffer(limit)
+
+        first_byte = False
+
+        async def read_stream(stream, name: str, buffer: _TailBuffer):
+            nonlocal first_byte
+            while True:
+                data = await stream.read(STREAM_CHUNK_SIZE)
+                if data and not first_byte:
+                    first_byte = True
+                    emit_event(EventType.FIRST_BYTE, stream=name)
+                if output_callback:
+                    await output_callback(config, name, data)
+                if not data:
+                    break
+                buffer.append(data)
+
+        async def drain(process) -> asyncssh.SSHCompletedProcess:
+            # 读完输出后等待进程退出
+            await asyncio.gather(
+                read_stream(process.stdout, "stdout", stdout_data),
+                read_stream(process.stderr, "stderr", stderr_data),
+            )
+            return await process.wait()
+
+        async def run_process(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            process = await conn.create_process(
+                command, term_type="xterm-256color" if pty else None, encoding=None
+            )
+            try:
+                completed = await asyncio.wait_for(
+                    drain(process),
+                    # PTY通常用于交互式命令，不设命令超时
+                    timeout=None if pty else config.command_timeout,
+                )
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                # 任务被取消或超时，尝试终止远端进程
+                try:
+                    process.send_signal(signal.SIGTERM)
+                except Exception:
+                    pass
+                raise
+
+            result.exit_code = completed.exit_status
+            if completed.exit_status == 0:
+                result.status = ExecutionStatus.SUCCESS
+            else:
+                result.status = ExecutionStatus.ERROR
+                result.error_message = (
+                    f"Command exited with code {completed.exit_status}"
+                )
 
-        return result
+        try:
+            return await self._run_on_host(
+                config, result, run_process, _EXEC_ERRORS, "execution_time"
+            )
+        finally:
+            result.stdout = stdout_data.text()
+            result.stderr = stderr_data.text()
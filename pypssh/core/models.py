@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class ExecutionStatus(Enum):
     PENDING = "pending"
@@ -44,6 +44,8 @@ class BaseResult:
     error_message: str = ""
     start_time: Optional[float] = None
     end_time: Optional[float] = None
+    connect_time: float = 0.0  # 建立SSH连接（含认证）耗时
+    connect_attempts: int = 0  # 建立连接的尝试次数（含重试）
 
 
 @dataclass
@@ -91,6 +93,11 @@ class TransferResult(BaseResult):
     remote_path: str = ""
     transferred_bytes: int = 0
     transfer_time: float = 0.0
+    relay_host: Optional[str] = None  # 中继分发时文件的来源主机
+    skipped_files: int = 0  # 增量同步时未变化而跳过的文件
+    skipped_bytes: int = 0
+    up_to_date: bool = False  # 预检查发现远程已有相同文件，未上传
+    resumed_from: int = 0  # 续传时的起始偏移
 
 @dataclass
 class ConnectionConfig(BaseEndpoint):
@@ -100,6 +107,7 @@ class ConnectionConfig(BaseEndpoint):
     known_hosts: Optional[str] = None
     connect_timeout: float = 10.0
     command_timeout: float = 30.0
+    agent_forwarding: bool = False
 
 
 @dataclass
@@ -115,3 +123,24 @@ class ConnectivityResult(BaseResult):
     port: int = 22
     response_time: float = 0.0
     ssh_available: bool = False
+
+@dataclass
+class StepResult(BaseResult):
+    """执行计划中单个步骤的结果"""
+
+    name: str = ""
+    action: str = ""
+    exit_code: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    transferred_bytes: int = 0
+    elapsed: float = 0.0
+
+@dataclass
+class PlanResult(BaseResult):
+    """执行计划在单个主机上的结果"""
+
+    port: int = 22
+    steps: List[StepResult] = field(default_factory=list)
+    total_steps: int = 0
+    execution_time: float = 0.0
@@ -0,0 +1,314 @@
+"""执行计划模块
+
+执行计划是一组有序步骤（exec/upload/download），每个主机在同一个SSH连接上
+依次执行全部步骤。主机之间没有步骤级的同步屏障：快的主机不会等待慢的主机。
+
+计划文件格式（YAML）::
+
+    name: deploy
+    steps:
+      - name: stop service
+        exec: systemctl stop app
+      - upload:
+          local: dist/app.tar.gz
+          remote: /tmp/app.tar.gz
+      - exec: tar xzf /tmp/app.tar.gz -C /opt/app
+        timeout: 120
+      - exec: systemctl start app
+      - download:
+          remote: /var/log/app.log
+          local: logs/
+        ignore_errors: true
+"""
+
+import asyncio
+import signal
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import asyncssh
+
+from pypssh.core.events import EventBus
+from pypssh.core.models import (
+    ConnectionConfig,
+    ExecutionStatus,
+    PlanResult,
+    StepResult,
+)
+from pypssh.core.reporter import ProgressReporter
+from pypssh.core.session import ConnectionPool, ErrorPolicy, RetryPolicy, SessionEngine
+from pypssh.core.transfer import sftp_download, sftp_upload
+
+STEP_ACTIONS = ("exec", "upload", "download")
+
+_PLAN_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Connection timeout after {config.connect_timeout}s",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Plan error",
+)
+
+_STEP_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Step timeout{limit}",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Step error",
+)
+
+
+@dataclass
+class PlanStep:
+    """计划步骤"""
+
+    action: str
+    name: str = ""
+    command: str = ""
+    local_path: str = ""
+    remote_path: str = ""
+    recursive: bool = False
+    preserve: bool = True
+    timeout: Optional[float] = None
+    ignore_errors: bool = False
+
+    def __post_init__(self):
+        if not self.name:
+            if self.action == "exec":
+                self.name = self.command
+            else:
+                self.name = f"{self.action} {self.local_path or self.remote_path}"
+
+
+@dataclass
+class Plan:
+    """执行计划"""
+
+    name: str = ""
+    steps: List[PlanStep] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Plan":
+        """从字典构建计划，格式错误时抛出 ValueError"""
+        if not isinstance(data, dict):
+            raise ValueError("Plan must be a mapping with a 'steps' list")
+
+        raw_steps = data.get("steps")
+        if not isinstance(raw_steps, list) or not raw_steps:
+            raise ValueError("Plan must define a non-empty 'steps' list")
+
+        steps = [_parse_step(index, raw) for index, raw in enumerate(raw_steps, 1)]
+        return cls(name=str(data.get("name", "")), steps=steps)
+
+
+def _parse_step(index: int, raw: Any) -> PlanStep:
+    """解析单个步骤定义"""
+    if not isinstance(raw, dict):
+        raise ValueError(f"Step {index}: must be a mapping")
+
+    actions = [action for action in STEP_ACTIONS if action in raw]
+    if len(actions) != 1:
+        raise ValueError(
+            f"Step {index}: must define exactly one of {', '.join(STEP_ACTIONS)}"
+        )
+    action = actions[0]
+    spec = raw[action]
+
+    step = {
+        "action": action,
+        "name": str(raw.get("name", "")),
+        "timeout": _parse_timeout(index, raw.get("timeout")),
+        "ignore_errors": bool(raw.get("ignore_errors", False)),
+    }
+
+    if action == "exec":
+        if not isinstance(spec, str) or not spec.strip():
+            raise ValueError(f"Step {index}: exec requires a command string")
+        step["command"] = spec
+    else:
+        if not isinstance(spec, dict) or not spec.get("local") or not spec.get("remote"):
+            raise ValueError(f"Step {index}: {action} requires 'local' and 'remote'")
+        step["local_path"] = str(spec["local"])
+        step["remote_path"] = str(spec["remote"])
+        step["recursive"] = bool(spec.get("recursive", False))
+        step["preserve"] = bool(spec.get("preserve", True))
+
+    return PlanStep(**step)
+
+
+def _parse_timeout(index: int, value: Any) -> Optional[float]:
+    """解析步骤超时（秒）"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Step {index}: timeout must be a number")
+
+
+def load_plan(path: str) -> Plan:
+    """从YAML文件加载计划"""
+    import yaml
+
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid plan file: {e}")
+
+    return Plan.from_dict(data)
+
+
+async def _run_command(
+    conn: asyncssh.SSHClientConnection, command: str, timeout: Optional[float]
+) -> asyncssh.SSHCompletedProcess:
+    """执行命令并收集输出；超时或取消时终止远端进程并关闭通道"""
+    process = await conn.create_process(command)
+    try:
+        return await asyncio.wait_for(process.wait(), timeout=timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        # 同一连接上还要执行后续步骤，不能让超时的命令继续运行
+        try:
+            process.send_signal(signal.SIGTERM)
+        except Exception:
+            pass
+        process.close()
+        raise
+
+
+class PlanRunner(SessionEngine):
+    """执行计划运行器：每个主机一个会话，按顺序执行全部步骤"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 50,
+        progress_callback: Callable = None,
+        step_callback: Optional[Callable[[ConnectionConfig, StepResult], None]] = None,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        events: Optional[EventBus] = None,
+    ):
+        super().__init__(max_concurrent, progress_callback, pool, retry, events)
+        self.step_callback = step_callback
+        # 步骤回调与进度回调一样经上报器在工作线程中执行
+        self.step_reporter = ProgressReporter.wrap(step_callback)
+
+    async def run_parallel(
+        self, configs: List[ConnectionConfig], plan: Plan
+    ) -> List[PlanResult]:
+        """在多个主机上并行运行计划"""
+
+        async with self.step_reporter:
+            return await self._gather_with_progress(
+                self._run_single(config, plan) for config in configs
+            )
+
+    async def _run_single(self, config: ConnectionConfig, plan: Plan) -> PlanResult:
+        """在单个主机上运行计划"""
+
+        result = PlanResult(
+            host=config.host,
+            port=config.port,
+            status=ExecutionStatus.PENDING,
+            start_time=time.time(),
+            total_steps=len(plan.steps),
+        )
+
+        async def run_steps(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+
+            for step in plan.steps:
+                step_result = await self._run_step(conn, config, step)
+                result.steps.append(step_result)
+
+                await self.step_reporter.publish(config, step_result)
+
+                if (
+                    step_result.status != ExecutionStatus.SUCCESS
+                    and not step.ignore_errors
+                ):
+                    result.status = step_result.status
+                    result.error_message = (
+                        f"Step '{step.name}' failed: {step_result.error_message}"
+                    )
+                    return
+
+            result.status = ExecutionStatus.SUCCESS
+
+        return await self._run_on_host(
+            config, result, run_steps, _PLAN_ERRORS, "execution_time"
+        )
+
+    async def _run_step(
+        self,
+        conn: asyncssh.SSHClientConnection,
+        config: ConnectionConfig,
+        step: PlanStep,
+    ) -> StepResult:
+        """在已建立的连接上执行单个步骤"""
+
+        step_result = StepResult(
+            host=config.host,
+            name=step.name,
+            action=step.action,
+            status=ExecutionStatus.RUNNING,
+            start_time=time.time(),
+        )
+        timeout = step.timeout
+        if timeout is None and step.action == "exec":
+            timeout = config.command_timeout
+
+        try:
+            if step.action == "exec":
+                ssh_result = await _run_command(conn, step.command, timeout)
+                step_result.stdout = ssh_result.stdout
+                step_result.stderr = ssh_result.stderr
+                step_result.exit_code = ssh_result.exit_status
+                if ssh_result.exit_status == 0:
+                    step_result.status = ExecutionStatus.SUCCESS
+                else:
+                    step_result.status = ExecutionStatus.ERROR
+                    step_result.error_message = (
+                        f"Command exited with code {ssh_result.exit_status}"
+                    )
+
+            elif step.action == "upload":
+                step_result.transferred_bytes = await asyncio.wait_for(
+                    sftp_upload(
+                        conn,
+                        step.local_path,
+                        step.remote_path,
+                        step.recursive,
+                        step.preserve,
+                    ),
+                    timeout=timeout,
+                )
+                step_result.status = ExecutionStatus.SUCCESS
+
+            else:
+                # 下载到按主机区分的本地目录
+                host_local_dir = Path(step.local_path) / config.host
+                host_local_dir.mkdir(parents=True, exist_ok=True)
+                step_result.transferred_bytes = await asyncio.wait_for(
+                    sftp_download(
+                        conn,
+                        step.remote_path,
+                        str(host_local_dir / Path(step.remote_path).name),
+                        step.recursive,
+                        step.preserve,
+                    ),
+                    timeout=timeout,
+                )
+                step_result.status = ExecutionStatus.SUCCESS
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            limit = f" after {timeout:g}s" if timeout is not None else ""
+            _STEP_ERRORS.apply(step_result, exc, config, limit=limit)
+
+        finally:
+            step_result.end_time = time.time()
+            step_result.elapsed = step_result.end_time - step_result.start_time
+
+        return step_result
@@ -0,0 +1,166 @@
+"""运行剖析模块
+
+全局 ``--profile`` 使用的剖析器：
+- cpu: cProfile，输出 pstats 文件（可用 snakeviz 等工具查看）
+- async: yappi 墙钟模式（协程感知，需要另行安装 yappi），输出 pstats 文件
+- alloc: tracemalloc，输出快照文件（tracemalloc.Snapshot.load 读取）
+
+命令中的关键阶段用 ``section(name)`` 标记（主机选择、引擎运行、格式化输出），
+剖析结束时与耗时最多的函数（或分配最多的代码行）一起汇总。未启用剖析时
+section 不做任何事情。
+"""
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+
+PROFILE_MODES = ("cpu", "async", "alloc")
+
+_EXTENSIONS = {"cpu": "pstats", "async": "pstats", "alloc": "tracemalloc"}
+
+# tracemalloc 保存的调用栈深度
+_ALLOC_FRAMES = 25
+
+_current: Optional["Profiler"] = None
+
+
+@dataclass
+class SectionTiming:
+    """命名阶段的耗时（alloc 模式下附带内存增量）"""
+
+    name: str
+    elapsed: float
+    memory_delta: Optional[int] = None
+
+
+@contextmanager
+def section(name: str):
+    """标记命名阶段，可用作上下文管理器或装饰器"""
+    profiler = _current
+    if profiler is None:
+        yield
+        return
+
+    memory = profiler._traced_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        delta = None
+        if memory is not None:
+            delta = profiler._traced_memory() - memory
+        profiler.sections.append(SectionTiming(name, elapsed, delta))
+
+
+class Profiler:
+    """单次命令运行的剖析器"""
+
+    def __init__(self, mode: str, output: Optional[str] = None, top: int = 20):
+        if mode not in PROFILE_MODES:
+            raise ValueError(
+                f"Unknown profile mode '{mode}': expected one of {', '.join(PROFILE_MODES)}"
+            )
+        self.mode = mode
+        self.output = output or (
+            f"pypssh-{mode}-{time.strftime('%Y%m%d-%H%M%S')}.{_EXTENSIONS[mode]}"
+        )
+        self.top = top
+        self.sections: List[SectionTiming] = []
+        self._profile: Optional[cProfile.Profile] = None
+        self._yappi = None
+        self._started = 0.0
+
+    def start(self):
+        """开始剖析并设为当前剖析器"""
+        global _current
+
+        if self.mode == "cpu":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "async":
+            try:
+                import yappi
+            except ImportError:
+                raise RuntimeError(
+                    "--profile async requires yappi (pip install yappi)"
+                ) from None
+            self._yappi = yappi
+            yappi.set_clock_type("wall")
+            yappi.start()
+        else:
+            tracemalloc.start(_ALLOC_FRAMES)
+
+        self._started = time.perf_counter()
+        _current = self
+
+    def stop(self) -> str:
+        """停止剖析，写出结果文件并返回汇总文本"""
+        global _current
+        _current = None
+        total = time.perf_counter() - self._started
+
+        if self.mode == "cpu":
+            self._profile.disable()
+            self._profile.dump_stats(self.output)
+            details = self._pstats_summary()
+        elif self.mode == "async":
+            self._yappi.stop()
+            self._yappi.get_func_stats().save(self.output, type="pstat")
+            self._yappi.clear_stats()
+            details = self._pstats_summary()
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(self.output)
+            details = self._alloc_summary(snapshot, peak)
+
+        lines = [f"Profile ({self.mode}) written to {self.output}", ""]
+        lines.append(f"Sections (total {total:.3f}s):")
+        for timing in self.sections:
+            line = f"  {timing.name:<12} {timing.elapsed:9.3f}s"
+            if timing.memory_delta is not None:
+                line += f"  {_format_size(timing.memory_delta):>10}"
+            lines.append(line)
+        lines.append("")
+        lines.append(details)
+        return "\n".join(lines)
+
+    def _traced_memory(self) -> Optional[int]:
+        if self.mode != "alloc":
+            return None
+        return tracemalloc.get_traced_memory()[0]
+
+    def _pstats_summary(self) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self.output, stream=stream)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(self.top)
+        return f"Top {self.top} functions by cumulative time:\n{stream.getvalue()}"
+
+    def _alloc_summary(self, snapshot: tracemalloc.Snapshot, peak: int) -> str:
+        lines = [
+            f"Peak traced memory: {_format_size(peak)}",
+            f"Top {self.top} allocation sites:",
+        ]
+        for stat in snapshot.statistics("lineno")[: self.top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"  {_format_size(stat.size):>10} {stat.count:>8} blocks  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+        return "\n".join(lines)
+
+
+def _format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024:
+            return f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GiB"
@@ -0,0 +1,270 @@
+"""中继分发模块
+
+向大量主机上传大文件时，本机上行带宽是瓶颈，提高并发也无济于事。tree/p2p
+策略先由本机上传到 fanout 台种子主机，再由已收到文件的主机通过 scp 中继给
+后续主机，分发时间随主机数按对数增长：
+- tree: 按主机顺序构成 fanout 叉树，每台主机从父节点接收
+- p2p:  本机与任何已完成的主机都可作为来源（每个最多同时服务 fanout 台），空闲来源
+        立即服务下一台等待中的主机
+
+中继由 pypssh 编排：连接来源主机并在其上执行 scp。来源主机需能直接访问目标
+主机，并以严格模式校验目标主机密钥（须已在来源主机的 known_hosts 中）。默认
+使用来源主机自身的密钥认证；agent_forwarding 为真时向来源主机转发本机
+ssh-agent，任何来源主机都可借此以你的身份登录其他主机，只应在可信主机间开启。
+每次中继限时为来源主机的 command_timeout 加上按 RELAY_MIN_RATE 传完文件所需的
+时间，超时按 TIMEOUT 处理。中继失败或超时时回退为由本机直接上传，本机同时上传的
+主机数（含回退）不超过 fanout。
+每台主机的结果仍以 TransferResult 报告，relay_host 记录文件的来源主机。
+"""
+
+import asyncio
+import logging
+import shlex
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Optional
+
+import asyncssh
+
+from pypssh.core.models import (
+    ConnectionConfig,
+    ExecutionStatus,
+    TransferMode,
+    TransferResult,
+)
+from pypssh.core.session import ErrorPolicy
+from pypssh.core.transfer import (
+    FileTransfer,
+    HashCache,
+    SharedSource,
+    TransferTuning,
+)
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("direct", "tree", "p2p")
+
+# 中继限时假定的最低传输速率（字节/秒）
+RELAY_MIN_RATE = 1_000_000
+
+_RELAY_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Relay timeout after {config.command_timeout:g}s",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Relay error",
+)
+
+
+class RelayError(Exception):
+    """中继命令执行失败"""
+
+
+def relay_command(
+    remote_path: str,
+    name: str,
+    target: ConnectionConfig,
+    preserve: bool = True,
+) -> str:
+    """在来源主机上执行的 scp 命令
+
+    remote_path 为已存在的目录时文件位于其中（与上传时相同），目标主机上同理。
+    """
+    host = f"[{target.host}]" if ":" in target.host else target.host
+    if target.username:
+        host = f"{target.username}@{host}"
+    options = [
+        "-q",
+        "-P",
+        str(target.port),
+        "-o",
+        "BatchMode=yes",
+        "-o",
+        "StrictHostKeyChecking=yes",
+        "-o",
+        f"ConnectTimeout={int(target.connect_timeout)}",
+    ]
+    if preserve:
+        options.insert(0, "-p")
+    return (
+        f"src={shlex.quote(remote_path)}; "
+        f'[ -d "$src" ] && src="$src"/{shlex.quote(name)}; '
+        f'exec scp {" ".join(options)} "$src" '
+        f"{shlex.quote(f'{host}:{remote_path}')}"
+    )
+
+
+def tree_parent(index: int, fanout: int) -> Optional[int]:
+    """fanout 叉树中主机的父节点（None 表示由本机直接上传）"""
+    if index < fanout:
+        return None
+    return index // fanout - 1
+
+
+class RelayTransfer(FileTransfer):
+    """通过主机间中继分发文件的上传器"""
+
+    def __init__(
+        self,
+        strategy: str = "tree",
+        fanout: int = 4,
+        agent_forwarding: bool = False,
+        **kwargs,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown strategy '{strategy}': expected one of {', '.join(STRATEGIES)}"
+            )
+        if fanout < 1:
+            raise ValueError("fanout must be at least 1")
+        super().__init__(**kwargs)
+        self.strategy = strategy
+        self.fanout = fanout
+        # 向来源主机转发本机 ssh-agent，需显式开启
+        self.agent_forwarding = agent_forwarding
+
+    async def upload_parallel(
+        self,
+        configs: List[ConnectionConfig],
+        local_path: str,
+        remote_path: str,
+        recursive: bool = False,
+        preserve: bool = True,
+        tuning: Optional[TransferTuning] = None,
+        skip_identical: bool = False,
+        hash_cache: Optional[HashCache] = None,
+    ) -> List[TransferResult]:
+        """分发单个文件到多个主机"""
+        if self.strategy == "direct":
+            return await super().upload_parallel(
+                configs,
+                local_path,
+                remote_path,
+                recursive,
+                preserve,
+                tuning,
+                skip_identical,
+                hash_cache,
+            )
+        if Path(local_path).is_dir():
+            raise ValueError(f"{self.strategy} distribution supports a single file")
+        if skip_identical:
+            raise ValueError(
+                f"{self.strategy} distribution cannot skip identical files"
+            )
+
+        source = SharedSource(local_path)
+        relay_configs = configs
+        if self.agent_forwarding:
+            # 中继连接开启 agent 转发，供来源主机上的 scp 认证
+            relay_configs = [
+                replace(config, agent_forwarding=True) for config in configs
+            ]
+        received = [asyncio.Event() for _ in configs]
+        succeeded = [False] * len(configs)
+        # p2p: 空闲来源队列，None 表示本机
+        slots: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.fanout):
+            slots.put_nowait(None)
+        # 本机上传（含中继失败后的回退）最多同时进行 fanout 个
+        local = asyncio.Semaphore(self.fanout)
+
+        async def direct(index: int) -> TransferResult:
+            async with local:
+                return await self._upload_single(
+                    configs[index],
+                    local_path,
+                    remote_path,
+                    False,
+                    preserve,
+                    tuning,
+                    source,
+                )
+
+        async def deliver(index: int) -> TransferResult:
+            if self.strategy == "tree":
+                parent = tree_parent(index, self.fanout)
+                if parent is not None:
+                    await received[parent].wait()
+                    if not succeeded[parent]:
+                        parent = None
+            else:
+                parent = await slots.get()
+
+            try:
+                if parent is None:
+                    result = await direct(index)
+                else:
+                    result = await self._relay_single(
+                        relay_configs[parent],
+                        configs[index],
+                        remote_path,
+                        source,
+                        preserve,
+                    )
+            finally:
+                if self.strategy == "p2p":
+                    slots.put_nowait(parent)
+
+            if parent is not None and result.status != ExecutionStatus.SUCCESS:
+                logger.warning(
+                    "Relay %s -> %s failed (%s), uploading directly",
+                    configs[parent].host,
+                    configs[index].host,
+                    result.error_message,
+                )
+                result = await direct(index)
+
+            succeeded[index] = result.status == ExecutionStatus.SUCCESS
+            if succeeded[index] and self.strategy == "p2p":
+                for _ in range(self.fanout):
+                    slots.put_nowait(index)
+            received[index].set()
+            return result
+
+        with source.view(""):
+            return await self._gather_with_progress(
+                deliver(index) for index in range(len(configs))
+            )
+
+    async def _relay_single(
+        self,
+        parent: ConnectionConfig,
+        target: ConnectionConfig,
+        remote_path: str,
+        source: SharedSource,
+        preserve: bool,
+    ) -> TransferResult:
+        """在来源主机上执行 scp，将文件中继到目标主机"""
+
+        result = TransferResult(
+            host=target.host,
+            mode=TransferMode.UPLOAD,
+            local_path=f"{parent.host}:{remote_path}",
+            remote_path=remote_path,
+            status=ExecutionStatus.PENDING,
+            start_time=time.time(),
+            relay_host=parent.host,
+        )
+        command = relay_command(remote_path, source.root.name, target, preserve)
+        # 卡住的对端不会无限占用来源主机，超时后关闭连接并回退为直接上传
+        parent = replace(
+            parent,
+            command_timeout=parent.command_timeout
+            + source.total_bytes // RELAY_MIN_RATE,
+        )
+
+        async def relay(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            completed = await asyncio.wait_for(
+                conn.run(command, check=False), parent.command_timeout
+            )
+            if completed.exit_status != 0:
+                stderr = str(completed.stderr or "").strip()
+                raise RelayError(stderr or f"scp exited with {completed.exit_status}")
+            result.transferred_bytes = source.total_bytes
+            result.status = ExecutionStatus.SUCCESS
+
+        return await self._run_on_host(
+            parent, result, relay, _RELAY_ERRORS, "transfer_time"
+        )
@@ -0,0 +1,132 @@
+"""进度上报模块
+
+引擎完成一个主机后只把进度事件放入有界队列，由独立的消费任务在工作线程中批量
+调用进度回调。终端输出慢、回调写文件/网络等都不会阻塞事件循环上的SSH I/O。
+
+队列满时的处理策略：
+- block: 等待队列空出（反压，保证不丢事件）
+- drop_newest: 丢弃新事件
+- drop_oldest: 丢弃最旧的事件（适合只关心最新进度的界面）
+"""
+
+import asyncio
+import logging
+from enum import Enum
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DropPolicy(Enum):
+    """队列满时的处理策略"""
+
+    BLOCK = "block"
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+
+
+class ProgressReporter:
+    """异步进度上报器
+
+    回调以 publish 的参数调用，引擎进度为 callback(completed, total, result)。
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable],
+        max_queue: int = 1000,
+        policy: DropPolicy = DropPolicy.BLOCK,
+        batch_size: int = 256,
+    ):
+        self.callback = callback
+        self.max_queue = max_queue
+        self.policy = DropPolicy(policy)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def wrap(cls, callback) -> "ProgressReporter":
+        """将普通回调包装为上报器（已是上报器时原样返回）"""
+        if isinstance(callback, ProgressReporter):
+            return callback
+        return cls(callback)
+
+    def start(self):
+        """启动消费任务"""
+        if self.callback is None or self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._consume())
+
+    async def publish(self, *event: Any):
+        """发布进度事件（除 block 策略外从不等待）"""
+        if self._queue is None:
+            return
+
+        if self.policy == DropPolicy.BLOCK:
+            await self._queue.put(event)
+        elif not self._queue.full():
+            self._queue.put_nowait(event)
+        elif self.policy == DropPolicy.DROP_OLDEST:
+            self._queue.get_nowait()
+            self._queue.put_nowait(event)
+            self.dropped += 1
+        else:
+            self.dropped += 1
+
+    async def close(self):
+        """处理完剩余事件后停止消费任务"""
+        if self._task is None:
+            return
+
+        await self._queue.put(_STOP)
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self._queue = None
+
+        if self.dropped:
+            logger.debug(f"Progress reporter dropped {self.dropped} events")
+
+    async def __aenter__(self) -> "ProgressReporter":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is asyncio.CancelledError and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._queue = None
+            return
+        await self.close()
+
+    async def _consume(self):
+        """批量取出事件并在工作线程中调用回调"""
+        while True:
+            events: List[Tuple] = [await self._queue.get()]
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            stop = events[-1] is _STOP
+            if stop:
+                events.pop()
+
+            if events:
+                await asyncio.to_thread(self._dispatch, events)
+            if stop:
+                return
+
+    def _dispatch(self, events: List[Tuple]):
+        for event in events:
+            try:
+                self.callback(*event)
+            except Exception:
+                logger.exception("Progress callback failed")
@@ -0,0 +1,398 @@
+"""主机会话模块
+
+所有引擎（命令执行、连通性测试、文件传输）共用的单主机会话：负责建立连接
+（可选连接池复用）、认证方式选择、连接重试、耗时统计与错误分类。具体操作以
+step（接收 SSHClientConnection 的协程函数）的形式运行在会话之上。
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import asyncssh
+
+from pypssh.core.events import EVENTS, EventBus, EventType
+from pypssh.core.models import BaseResult, ConnectionConfig
+from pypssh.core.reporter import ProgressReporter
+
+T = TypeVar("T")
+Step = Callable[[asyncssh.SSHClientConnection], Awaitable[T]]
+
+logger = logging.getLogger(__name__)
+
+_SESSION_IDS = itertools.count(1)
+# 当前任务所在的会话，供步骤内部发出事件
+_current_session: ContextVar[Optional["HostSession"]] = ContextVar(
+    "pypssh_current_session", default=None
+)
+
+
+class FailureKind(Enum):
+    """会话失败分类"""
+
+    TIMEOUT = "timeout"
+    AUTH_FAILED = "auth_failed"
+    SSH_ERROR = "ssh_error"
+    ERROR = "error"
+
+
+def build_connect_kwargs(config: ConnectionConfig) -> Dict[str, Any]:
+    """根据连接配置生成 asyncssh.connect 参数"""
+    connect_kwargs = {
+        "host": config.host,
+        "port": config.port,
+        "username": config.username,
+        "connect_timeout": config.connect_timeout,
+        "known_hosts": config.known_hosts,
+    }
+    if config.agent_forwarding:
+        connect_kwargs["agent_forwarding"] = True
+
+    if config.password:
+        connect_kwargs["password"] = config.password
+    elif config.private_key:
+        connect_kwargs["client_keys"] = [
+            asyncssh.import_private_key(config.private_key)
+        ]
+    elif config.private_key_path:
+        connect_kwargs["client_keys"] = [config.private_key_path]
+
+    return connect_kwargs
+
+
+def classify_error(exc: BaseException) -> FailureKind:
+    """将异常归类为会话失败类型"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return FailureKind.TIMEOUT
+    if isinstance(exc, asyncssh.PermissionDenied):
+        return FailureKind.AUTH_FAILED
+    if isinstance(exc, asyncssh.Error):
+        return FailureKind.SSH_ERROR
+    return FailureKind.ERROR
+
+
+@dataclass(frozen=True)
+class ErrorPolicy:
+    """将会话失败映射为结果状态与错误信息
+
+    timeout_message 可引用 {config} 及 apply 传入的额外上下文，
+    如 "Command timeout after {config.command_timeout}s"；
+    auth_status 为空时认证失败按普通 SSH 错误处理。
+    """
+
+    timeout_status: Enum
+    timeout_message: str
+    error_status: Enum
+    error_prefix: str
+    auth_status: Optional[Enum] = None
+    log: bool = False
+
+    def apply(
+        self,
+        result: BaseResult,
+        exc: BaseException,
+        config: ConnectionConfig,
+        **context: Any,
+    ) -> FailureKind:
+        """根据异常填充结果状态与错误信息"""
+        kind = classify_error(exc)
+
+        if kind == FailureKind.TIMEOUT:
+            result.status = self.timeout_status
+            result.error_message = self.timeout_message.format(config=config, **context)
+        elif kind == FailureKind.AUTH_FAILED and self.auth_status is not None:
+            result.status = self.auth_status
+            result.error_message = "Authentication failed"
+        elif kind in (FailureKind.AUTH_FAILED, FailureKind.SSH_ERROR):
+            result.status = self.error_status
+            result.error_message = f"SSH Error: {str(exc)}"
+        else:
+            result.status = self.error_status
+            result.error_message = f"{self.error_prefix}: {str(exc)}"
+
+        if self.log:
+            if kind == FailureKind.TIMEOUT:
+                logger.warning(f"Timeout on {config.host}: {result.error_message}")
+            else:
+                logger.error(f"{kind.value} for {config.host}: {exc}")
+
+        return kind
+
+
+@dataclass
+class RetryPolicy:
+    """连接重试策略（仅重试建立连接阶段，认证失败不重试）"""
+
+    attempts: int = 1
+    backoff: float = 0.5
+    max_backoff: float = 5.0
+    retry_on: Tuple[FailureKind, ...] = (
+        FailureKind.TIMEOUT,
+        FailureKind.SSH_ERROR,
+        FailureKind.ERROR,
+    )
+
+    def should_retry(self, attempt: int, exc: BaseException) -> bool:
+        return attempt < self.attempts and classify_error(exc) in self.retry_on
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（指数退避）"""
+        return min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+
+
+class ConnectionPool:
+    """按 (host, port, username) 复用SSH连接
+
+    SSH连接支持多路复用通道，同一主机上的多个操作可并发共享一个连接。
+    """
+
+    def __init__(self):
+        self._connections: Dict[Tuple, asyncssh.SSHClientConnection] = {}
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+
+    @staticmethod
+    def _key(config: ConnectionConfig) -> Tuple:
+        # agent 转发在连接建立时协商，开启与否的连接不能互相复用
+        return (config.host, config.port, config.username, config.agent_forwarding)
+
+    async def acquire(
+        self,
+        config: ConnectionConfig,
+        connect: Callable[[], Awaitable[asyncssh.SSHClientConnection]],
+    ) -> asyncssh.SSHClientConnection:
+        """获取可用连接，不存在或已关闭时新建"""
+        key = self._key(config)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            conn = self._connections.get(key)
+            if conn is None or conn.is_closed():
+                conn = await connect()
+                self._connections[key] = conn
+            return conn
+
+    def discard(self, config: ConnectionConfig):
+        """丢弃（并关闭）某主机的连接"""
+        conn = self._connections.pop(self._key(config), None)
+        if conn is not None:
+            conn.close()
+
+    async def close(self):
+        """关闭所有连接"""
+        connections: List[asyncssh.SSHClientConnection] = list(
+            self._connections.values()
+        )
+        self._connections.clear()
+        for conn in connections:
+            conn.close()
+        await asyncio.gather(
+            *(conn.wait_closed() for conn in connections), return_exceptions=True
+        )
+
+
+class HostSession:
+    """单主机SSH会话"""
+
+    def __init__(
+        self,
+        config: ConnectionConfig,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        events: Optional[EventBus] = None,
+    ):
+        self.config = config
+        self.pool = pool
+        self.retry = retry or RetryPolicy()
+        self.events = events if events is not None else EVENTS
+        self.session_id = next(_SESSION_IDS)
+        self.conn: Optional[asyncssh.SSHClientConnection] = None
+        self.connect_time = 0.0
+        self.attempts = 0
+
+    def emit(self, type: EventType, **attrs: Any):
+        """发出本会话的事件"""
+        self.events.emit(
+            type, self.config.host, self.config.port, self.session_id, **attrs
+        )
+
+    async def _connect_with_retry(self) -> asyncssh.SSHClientConnection:
+        """建立连接，按重试策略重试"""
+        connect_kwargs = build_connect_kwargs(self.config)
+        while True:
+            self.attempts += 1
+            try:
+                return await asyncssh.connect(**connect_kwargs)
+            except Exception as exc:
+                if not self.retry.should_retry(self.attempts, exc):
+                    raise
+                delay = self.retry.delay(self.attempts)
+                self.emit(
+                    EventType.RETRY,
+                    attempt=self.attempts,
+                    error=classify_error(exc).value,
+                    delay=delay,
+                )
+                await asyncio.sleep(delay)
+
+    async def connect(self) -> asyncssh.SSHClientConnection:
+        """建立（或从连接池获取）连接"""
+        if self.conn is not None:
+            return self.conn
+
+        self.emit(EventType.CONNECTING, pooled=self.pool is not None)
+        start = time.monotonic()
+        if self.pool is not None:
+            self.conn = await self.pool.acquire(self.config, self._connect_with_retry)
+        else:
+            self.conn = await self._connect_with_retry()
+        self.connect_time = time.monotonic() - start
+        self.emit(
+            EventType.AUTHENTICATED,
+            connect_time=self.connect_time,
+            attempts=self.attempts,
+        )
+        return self.conn
+
+    async def close(self):
+        """关闭连接（连接池中的连接保持打开以便复用）"""
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+
+        if self.pool is not None:
+            if conn.is_closed():
+                self.pool.discard(self.config)
+            return
+
+        conn.close()
+        await conn.wait_closed()
+
+    async def __aenter__(self) -> "HostSession":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def run(self, step: Step[T]) -> T:
+        """在会话连接上运行一个步骤"""
+        conn = await self.connect()
+        self.emit(EventType.EXEC_STARTED)
+        token = _current_session.set(self)
+        try:
+            return await step(conn)
+        finally:
+            _current_session.reset(token)
+
+    async def execute(
+        self,
+        result: BaseResult,
+        step: Step[Any],
+        errors: ErrorPolicy,
+        elapsed_field: str,
+    ) -> BaseResult:
+        """运行步骤，并统一填充结果的错误状态与耗时
+
+        步骤本身负责填充成功时的状态与数据。
+        """
+        cancelled = False
+        try:
+            await self.run(step)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as exc:
+            errors.apply(result, exc, self.config)
+        finally:
+            await self.close()
+            result.connect_time = self.connect_time
+            result.connect_attempts = self.attempts
+            result.end_time = time.time()
+            setattr(result, elapsed_field, result.end_time - result.start_time)
+            self.emit(
+                EventType.FINISHED,
+                status="cancelled" if cancelled else result.status.value,
+                elapsed=getattr(result, elapsed_field),
+                attempts=self.attempts,
+                error=result.error_message,
+            )
+
+        return result
+
+
+def emit_event(type: EventType, **attrs: Any):
+    """在当前会话（步骤内部）上发出事件，不在会话中时忽略"""
+    session = _current_session.get()
+    if session is not None:
+        session.emit(type, **attrs)
+
+
+class SessionEngine:
+    """基于 HostSession 的并行引擎基类"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 50,
+        progress_callback: Callable = None,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        events: Optional[EventBus] = None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.progress_callback = progress_callback
+        # 进度回调经上报器异步执行，不阻塞事件循环
+        self.reporter = ProgressReporter.wrap(progress_callback)
+        self.pool = pool
+        self.retry = retry
+        self.events = events if events is not None else EVENTS
+        # 实际达到的最大在途主机数
+        self.peak_concurrency = 0
+        self._active = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _session(self, config: ConnectionConfig) -> HostSession:
+        """为主机创建会话"""
+        return HostSession(config, pool=self.pool, retry=self.retry, events=self.events)
+
+    async def _run_on_host(
+        self,
+        config: ConnectionConfig,
+        result: BaseResult,
+        step: Step[Any],
+        errors: ErrorPolicy,
+        elapsed_field: str,
+        retry: Optional[RetryPolicy] = None,
+    ) -> BaseResult:
+        """在并发限制下于单个主机上运行步骤（retry 覆盖本次的连接重试策略）"""
+        session = self._session(config)
+        if retry is not None:
+            session.retry = retry
+        session.emit(EventType.QUEUED)
+        async with self._semaphore:
+            self._active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._active)
+            try:
+                return await session.execute(result, step, errors, elapsed_field)
+            finally:
+                self._active -= 1
+
+    async def _gather_with_progress(self, coros) -> List[Any]:
+        """按完成顺序收集结果并回调进度"""
+        tasks = [asyncio.create_task(coro) for coro in coros]
+
+        results = []
+        completed = 0
+        total = len(tasks)
+
+        async with self.reporter:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                results.append(result)
+                completed += 1
+                await self.reporter.publish(completed, total, result)
+
+        return results
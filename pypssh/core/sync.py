@@ -0,0 +1,219 @@
+"""增量目录同步模块
+
+将本地目录同步到远程目录，只传输发生变化的文件：
+- 本地清单: 每个文件的大小与修改时间，--checksum 时附加 SHA-256（按路径、大小与
+  mtime 缓存在磁盘上，未变化的文件不重复计算）
+- 远程清单: 每台主机执行一条 find 命令取回全部文件的大小、mtime（及摘要）；
+  两侧的符号链接都按其指向的文件处理
+- 对比: 远程缺失、大小不同、摘要不同（或未使用摘要时 mtime 不同）的文件重新上传
+
+上传后总是保留 mtime，下次同步据此判断未变化。远程多余的文件保持不变。
+"""
+
+import posixpath
+import shlex
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import asyncssh
+
+from pypssh.core.models import (
+    ConnectionConfig,
+    ExecutionStatus,
+    TransferMode,
+    TransferResult,
+)
+from pypssh.core.session import ErrorPolicy
+from pypssh.core.transfer import (
+    FileTransfer,
+    HashCache,
+    SharedSource,
+    TransferTuning,
+    _preserve,
+    _resolve_tuning,
+    _write_file,
+)
+
+_SYNC_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Sync timeout after {config.connect_timeout}s",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Sync error",
+)
+
+
+class SyncError(Exception):
+    """远程清单获取失败"""
+
+
+@dataclass
+class ManifestEntry:
+    """清单中的单个文件"""
+
+    size: int
+    mtime: int
+    digest: Optional[str] = None
+
+
+def local_manifest(
+    source: SharedSource, checksum: bool = False, cache: Optional[HashCache] = None
+) -> Dict[str, ManifestEntry]:
+    """本地目录的清单"""
+    cache = cache or HashCache()
+    return {
+        relative: ManifestEntry(
+            stat.st_size,
+            int(stat.st_mtime),
+            cache.digest(source, relative, stat) if checksum else None,
+        )
+        for relative, stat in source.files
+    }
+
+
+def remote_manifest_command(remote_dir: str, checksum: bool = False) -> str:
+    """取回远程清单的命令
+
+    输出为 NUL 分隔的记录：目录为 d、路径；文件为 f、路径、大小、mtime。
+    checksum 时在一个空字段之后输出 sha256sum -z 的结果。目录不存在时输出为空。
+    与本地清单相同，符号链接按其指向的文件或目录处理（find -L）。
+    """
+    command = (
+        f"cd {shlex.quote(remote_dir)} 2>/dev/null || exit 0; "
+        "find -L . -mindepth 1 \\( -type d -printf 'd\\0%P\\0' \\) "
+        "-o \\( -type f -printf 'f\\0%P\\0%s\\0%T@\\0' \\)"
+    )
+    if checksum:
+        command += " && printf '\\0' && find -L . -type f -exec sha256sum -z -- {} +"
+    return command
+
+
+def parse_remote_manifest(output: str) -> Tuple[Set[str], Dict[str, ManifestEntry]]:
+    """解析远程清单，返回 (目录集合, 文件清单)"""
+    fields = output.split("\0")
+    dirs: Set[str] = set()
+    files: Dict[str, ManifestEntry] = {}
+    index = 0
+    while index < len(fields) and fields[index]:
+        if fields[index] == "d":
+            dirs.add(fields[index + 1])
+            index += 2
+        else:
+            path, size, mtime = fields[index + 1 : index + 4]
+            files[path] = ManifestEntry(int(size), int(float(mtime)))
+            index += 4
+    for line in fields[index + 1 :]:
+        if line:
+            digest, path = line.split("  ", 1)
+            entry = files.get(posixpath.normpath(path))
+            if entry is not None:
+                entry.digest = digest
+    return dirs, files
+
+
+def changed_files(
+    local: Dict[str, ManifestEntry], remote: Dict[str, ManifestEntry]
+) -> List[str]:
+    """需要上传的文件（按本地清单顺序）"""
+    changed = []
+    for relative, entry in local.items():
+        theirs = remote.get(relative)
+        if theirs is None or theirs.size != entry.size:
+            changed.append(relative)
+        elif entry.digest is not None:
+            if theirs.digest != entry.digest:
+                changed.append(relative)
+        elif theirs.mtime != entry.mtime:
+            changed.append(relative)
+    return changed
+
+
+class SyncTransfer(FileTransfer):
+    """增量目录同步"""
+
+    async def sync_parallel(
+        self,
+        configs: List[ConnectionConfig],
+        local_dir: str,
+        remote_dir: str,
+        checksum: bool = False,
+        cache: Optional[HashCache] = None,
+        tuning: Optional[TransferTuning] = None,
+    ) -> List[TransferResult]:
+        """将本地目录同步到多个主机"""
+        source = SharedSource(local_dir)
+        if not source.is_dir:
+            raise ValueError(f"'{local_dir}' is not a directory")
+        # 本地清单只计算一次，所有主机共用
+        manifest = local_manifest(source, checksum, cache)
+        if cache is not None:
+            cache.save()
+
+        return await self._gather_with_progress(
+            self._sync_single(config, source, manifest, remote_dir, checksum, tuning)
+            for config in configs
+        )
+
+    async def _sync_single(
+        self,
+        config: ConnectionConfig,
+        source: SharedSource,
+        manifest: Dict[str, ManifestEntry],
+        remote_dir: str,
+        checksum: bool,
+        tuning: Optional[TransferTuning],
+    ) -> TransferResult:
+        """同步到单个主机"""
+
+        result = TransferResult(
+            host=config.host,
+            mode=TransferMode.UPLOAD,
+            local_path=str(source.root),
+            remote_path=remote_dir,
+            status=ExecutionStatus.PENDING,
+            start_time=time.time(),
+        )
+
+        async def sync(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            completed = await conn.run(
+                remote_manifest_command(remote_dir, checksum),
+                check=False,
+                encoding=None,
+            )
+            if completed.exit_status != 0:
+                stderr = (completed.stderr or b"").decode("utf-8", errors="replace")
+                raise SyncError(
+                    stderr.strip()
+                    or f"manifest command exited with {completed.exit_status}"
+                )
+            # 远程文件名按本地路径的方式解码（无法解码的字节保留为代理字符）
+            remote_dirs, remote_files = parse_remote_manifest(
+                (completed.stdout or b"").decode("utf-8", errors="surrogateescape")
+            )
+            changed = changed_files(manifest, remote_files)
+            stats = dict(source.files)
+
+            async with conn.start_sftp_client(path_errors="surrogateescape") as sftp:
+                resolved = await _resolve_tuning(sftp, tuning)
+                await sftp.makedirs(remote_dir, exist_ok=True)
+                created = []
+                for relative, stat in source.dirs:
+                    if relative not in remote_dirs:
+                        await sftp.mkdir(posixpath.join(remote_dir, relative))
+                        created.append((relative, stat))
+                for relative in changed:
+                    target = posixpath.join(remote_dir, relative)
+                    await _write_file(conn, sftp, source, relative, target, resolved)
+                    await _preserve(sftp, target, stats[relative])
+                for relative, stat in reversed(created):
+                    await _preserve(sftp, posixpath.join(remote_dir, relative), stat)
+
+            result.transferred_bytes = sum(manifest[path].size for path in changed)
+            result.skipped_files = len(manifest) - len(changed)
+            result.skipped_bytes = source.total_bytes - result.transferred_bytes
+            result.status = ExecutionStatus.SUCCESS
+
+        return await self._run_on_host(
+            config, result, sync, _SYNC_ERRORS, "transfer_time"
+        )
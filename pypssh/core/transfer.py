@@ -1,25 +1,566 @@
 """文件传输模块"""
 
 import asyncio
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import posixpath
+import shlex
+import tempfile
 import asyncssh
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import List, Callable
+from typing import Dict, List, Callable, Optional, Tuple
 import time
 
+from pypssh.core.events import EventBus
 from pypssh.core.models import (
     ConnectionConfig,
     TransferMode,
     TransferResult,
     ExecutionStatus,
 )
+from pypssh.core.session import ConnectionPool, ErrorPolicy, RetryPolicy, SessionEngine
 
-class FileTransfer:
+logger = logging.getLogger(__name__)
+
+_TRANSFER_ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="Transfer timeout after {config.connect_timeout}s",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="Transfer error",
+)
+
+# 常见 sshd 的通道接收窗口，单个 SFTP 通道在途数据不会超过该值
+CHANNEL_WINDOW = 2 * 1024 * 1024
+# 自动调优时的块大小上限（OpenSSH 通过 limits 扩展声明的写入上限约为 255 KiB）
+MAX_AUTO_BLOCK_SIZE = 256 * 1024
+# 服务器未声明限制时可安全使用的块大小
+SAFE_BLOCK_SIZE = 16 * 1024
+MAX_PARALLEL_PARTS = 16
+
+
+@dataclass(frozen=True)
+class TransferTuning:
+    """SFTP 传输参数
+
+    block_size/max_requests 为空时使用 asyncssh 默认值（服务器声明的读写上限，
+    最多 128 个在途请求）。parallel 大于 1 时，不小于 2 * min_part_size 的单个
+    文件上传会拆分为多个区间，分别在独立的 SFTP 通道上并行写入，突破单个
+    通道窗口对高延迟链路吞吐的限制。auto 时按测得的 RTT 与 bandwidth
+    （链路带宽，字节/秒）补全未指定的参数。
+    """
+
+    block_size: Optional[int] = None
+    max_requests: Optional[int] = None
+    parallel: Optional[int] = None
+    min_part_size: int = 64 * 1024 * 1024
+    auto: bool = False
+    bandwidth: int = 125_000_000
+
+    def sftp_kwargs(self) -> dict:
+        """asyncssh put/get/open 的 block_size 与 max_requests 参数"""
+        return {
+            "block_size": self.block_size or -1,
+            "max_requests": self.max_requests or -1,
+        }
+
+    def parts(self, size: int) -> int:
+        """文件拆分的区间数"""
+        parallel = min(self.parallel or 1, MAX_PARALLEL_PARTS)
+        return max(1, min(parallel, size // max(self.min_part_size, 1)))
+
+
+def tune_for_link(
+    tuning: TransferTuning, rtt: float, max_write_len: int = 0
+) -> TransferTuning:
+    """按带宽时延积（BDP）补全未指定的传输参数
+
+    块大小取服务器写入上限与 MAX_AUTO_BLOCK_SIZE 中较小者；在途请求数覆盖
+    单个通道窗口内的 BDP；BDP 超过通道窗口时拆分为多个通道并行传输。
+    """
+    bdp = max(tuning.bandwidth * rtt, 1.0)
+    block_size = tuning.block_size or min(
+        max_write_len or SAFE_BLOCK_SIZE, MAX_AUTO_BLOCK_SIZE
+    )
+    max_requests = tuning.max_requests or min(
+        max(math.ceil(min(bdp, CHANNEL_WINDOW) / block_size), 16), 1024
+    )
+    parallel = tuning.parallel or min(
+        max(math.ceil(bdp / CHANNEL_WINDOW), 1), MAX_PARALLEL_PARTS
+    )
+    return replace(
+        tuning, block_size=block_size, max_requests=max_requests, parallel=parallel
+    )
+
+
+async def measure_rtt(sftp: asyncssh.SFTPClient, samples: int = 3) -> float:
+    """以最小的 SFTP 请求往返时间估计链路 RTT"""
+    best = math.inf
+    for _ in range(samples):
+        start = time.perf_counter()
+        await sftp.realpath(".")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def _resolve_tuning(
+    sftp: asyncssh.SFTPClient, tuning: Optional[TransferTuning]
+) -> TransferTuning:
+    tuning = tuning or TransferTuning()
+    if not tuning.auto:
+        return tuning
+    rtt = await measure_rtt(sftp)
+    tuned = tune_for_link(tuning, rtt, sftp.limits.max_write_len)
+    logger.debug(
+        "SFTP tuning for rtt %.1fms: block_size=%d max_requests=%d parallel=%d",
+        rtt * 1000,
+        tuned.block_size,
+        tuned.max_requests,
+        tuned.parallel,
+    )
+    return tuned
+
+
+class SharedSource:
+    """上传源的共享只读视图
+
+    源目录只遍历一次（文件列表与总字节数所有主机共用）；每个文件以一份 mmap
+    映射供所有主机写入，本地文件经页缓存读取一次，而不是每台主机各自
+    open/read 一遍。映射按引用计数管理，没有主机正在写入时即释放，打开的
+    映射数不超过同时传输的文件数。
+    """
+
+    def __init__(self, local_path: str):
+        self.root = Path(local_path)
+        self.stat = self.root.stat()
+        self.is_dir = self.root.is_dir()
+        # (相对路径, stat)，按路径排序，父目录先于子项
+        self.dirs: List[Tuple[str, os.stat_result]] = []
+        self.files: List[Tuple[str, os.stat_result]] = []
+        if self.is_dir:
+            for path in sorted(self.root.rglob("*")):
+                relative = path.relative_to(self.root).as_posix()
+                if path.is_dir():
+                    self.dirs.append((relative, path.stat()))
+                elif path.is_file():
+                    self.files.append((relative, path.stat()))
+        else:
+            self.files.append(("", self.stat))
+        self.total_bytes = sum(stat.st_size for _, stat in self.files)
+        self._maps: Dict[str, List] = {}
+
+    def local_path(self, relative: str) -> Path:
+        return self.root / relative if relative else self.root
+
+    @contextmanager
+    def view(self, relative: str):
+        """获取文件内容的只读 memoryview（多台主机共用同一映射）"""
+        entry = self._maps.get(relative)
+        if entry is None:
+            with open(self.local_path(relative), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                mapped = (
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+                )
+            entry = self._maps[relative] = [mapped, memoryview(mapped or b""), 0]
+        entry[2] += 1
+        try:
+            yield entry[1]
+        finally:
+            entry[2] -= 1
+            if entry[2] == 0:
+                del self._maps[relative]
+                _release(entry)
+
+
+def _release(entry: List):
+    mapped, view, _ = entry
+    view.release()
+    if mapped is not None:
+        try:
+            mapped.close()
+        except BufferError:
+            # 仍有切片被引用（如异常回溯中），交给垃圾回收释放
+            pass
+
+
+class HashCache:
+    """本地文件摘要的磁盘缓存：绝对路径 -> (大小, mtime_ns, sha256)"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._entries: Dict[str, list] = {}
+        self._dirty = False
+        if path is not None and path.exists():
+            try:
+                self._entries = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # 缓存损坏时重新计算
+                self._entries = {}
+
+    def digest(self, source: SharedSource, relative: str, stat: os.stat_result) -> str:
+        key = str(source.local_path(relative).resolve())
+        cached = self._entries.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        with source.view(relative) as data:
+            value = hashlib.sha256(data).hexdigest()
+        self._entries[key] = [stat.st_size, stat.st_mtime_ns, value]
+        self._dirty = True
+        return value
+
+    def save(self):
+        """写回缓存文件（原子替换）"""
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=".pypssh-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._dirty = False
+
+
+async def _write_file(
+    conn: asyncssh.SSHClientConnection,
+    sftp: asyncssh.SFTPClient,
+    source: SharedSource,
+    relative: str,
+    remote_path: str,
+    tuning: TransferTuning,
+):
+    """将源文件写入远程路径；parts 大于 1 时拆分为区间在独立通道上并行写入"""
+    with source.view(relative) as data:
+        size = len(data)
+        parts = tuning.parts(size)
+        async with sftp.open(remote_path, "wb", **tuning.sftp_kwargs()) as remote:
+            if parts == 1:
+                # 整段写入，由 asyncssh 按 block_size/max_requests 流水线发送
+                await remote.write(data, 0)
+                return
+
+        async def write_part(start: int, end: int):
+            async with conn.start_sftp_client() as part_sftp:
+                async with part_sftp.open(
+                    remote_path, "r+b", **tuning.sftp_kwargs()
+                ) as remote:
+                    await remote.write(data[start:end], start)
+
+        part_size = math.ceil(size / parts)
+        await asyncio.gather(
+            *(
+                write_part(start, min(start + part_size, size))
+                for start in range(0, size, part_size)
+            )
+        )
+
+
+async def _preserve(sftp: asyncssh.SFTPClient, remote_path: str, stat: os.stat_result):
+    """一次 SETSTAT 请求设置权限与访问/修改时间"""
+    await sftp.setstat(
+        remote_path,
+        asyncssh.SFTPAttrs(
+            permissions=stat.st_mode & 0o7777,
+            atime=int(stat.st_atime),
+            mtime=int(stat.st_mtime),
+        ),
+    )
+
+
+def remote_digest_command(remote_path: str, name: str, size: int) -> str:
+    """远程副本的 SHA-256：不存在或大小不同时输出为空，不读取文件内容"""
+    return (
+        f"p={shlex.quote(remote_path)}; "
+        f'[ -d "$p" ] && p="$p"/{shlex.quote(name)}; '
+        f'[ "$(stat -c %s -- "$p" 2>/dev/null)" = {size} ] && sha256sum -- "$p"; '
+        "exit 0"
+    )
+
+
+async def remote_matches(
+    conn: asyncssh.SSHClientConnection,
+    remote_path: str,
+    source: SharedSource,
+    digest: str,
+) -> bool:
+    """远程路径上是否已有与本地内容相同的文件（目标为目录时检查其中的同名文件）"""
+    completed = await conn.run(
+        remote_digest_command(remote_path, source.root.name, source.total_bytes),
+        check=False,
+    )
+    output = str(completed.stdout or "").split()
+    return bool(output) and output[0] == digest
+
+
+async def sftp_upload(
+    conn: asyncssh.SSHClientConnection,
+    local_path: str,
+    remote_path: str,
+    recursive: bool = False,
+    preserve: bool = True,
+    tuning: Optional[TransferTuning] = None,
+    source: Optional[SharedSource] = None,
+) -> int:
+    """通过已建立的连接上传文件，返回传输的字节数
+
+    多台主机上传同一源时传入共享的 source，源文件只读取一次。
+    目标为已存在的目录时上传到其中（与 sftp put 相同）。
+    """
+    if Path(local_path).is_dir() and not recursive:
+        # 保持 sftp put 对未指定递归的目录的报错
+        async with conn.start_sftp_client() as sftp:
+            await sftp.put(local_path, remote_path)
+        return 0
+
+    source = source or SharedSource(local_path)
+
+    async with conn.start_sftp_client() as sftp:
+        tuning = await _resolve_tuning(sftp, tuning)
+        if await sftp.isdir(remote_path):
+            remote_path = posixpath.join(remote_path, source.root.name)
+
+        if not source.is_dir:
+            await _write_file(conn, sftp, source, "", remote_path, tuning)
+            if preserve:
+                await _preserve(sftp, remote_path, source.stat)
+            return source.total_bytes
+
+        if not await sftp.isdir(remote_path):
+            await sftp.mkdir(remote_path)
+        for relative, _ in source.dirs:
+            target = posixpath.join(remote_path, relative)
+            if not await sftp.isdir(target):
+                await sftp.mkdir(target)
+        for relative, stat in source.files:
+            target = posixpath.join(remote_path, relative)
+            await _write_file(conn, sftp, source, relative, target, tuning)
+            if preserve:
+                await _preserve(sftp, target, stat)
+        if preserve:
+            # 目录属性最后设置，避免写入子项改变 mtime；子目录先于父目录
+            for relative, stat in reversed(source.dirs):
+                await _preserve(sftp, posixpath.join(remote_path, relative), stat)
+            await _preserve(sftp, remote_path, source.stat)
+
+    return source.total_bytes
+
+
+async def sftp_download(
+    conn: asyncssh.SSHClientConnection,
+    remote_path: str,
+    local_path: str,
+    recursive: bool = False,
+    preserve: bool = True,
+    tuning: Optional[TransferTuning] = None,
+) -> int:
+    """通过已建立的连接下载文件，返回传输的字节数"""
+    local_path_obj = Path(local_path)
+
+    async with conn.start_sftp_client() as sftp:
+        tuning = await _resolve_tuning(sftp, tuning)
+        await sftp.get(
+            remote_path,
+            local_path,
+            recurse=recursive,
+            preserve=preserve,
+            **tuning.sftp_kwargs(),
+        )
+
+    # 计算传输的字节数
+    if local_path_obj.is_file():
+        return local_path_obj.stat().st_size
+    if local_path_obj.is_dir():
+        return sum(f.stat().st_size for f in local_path_obj.rglob("*") if f.is_file())
+    return 0
+
+
+# 续传临时文件后缀：传输完成后原子重命名为目标文件
+PARTIAL_SUFFIX = ".pypssh-part"
+
+# 下载时每次读取的字节数（asyncssh 在其中按 block_size 流水线读取）
+_READ_CHUNK = 4 * 1024 * 1024
+
+# 续传的默认重试策略：中断（或重连失败）后最多再续传 4 次
+RESUME_RETRY = RetryPolicy(attempts=5, backoff=1.0, max_backoff=30.0)
+
+
+def partial_path(path: str) -> str:
+    """续传使用的临时文件：同目录下的隐藏文件"""
+    directory, name = posixpath.split(path)
+    return posixpath.join(directory, f".{name}{PARTIAL_SUFFIX}")
+
+
+def resume_offset(partial_size: int, size: int) -> int:
+    """可续传的偏移
+
+    中断时在途的写请求可能未按顺序落盘，末尾一个通道窗口内的数据不可信，
+    从其之前开始续传。
+    """
+    return max(min(partial_size, size) - CHANNEL_WINDOW, 0)
+
+
+async def remote_prefix_digest(
+    conn: asyncssh.SSHClientConnection, path: str, length: int
+) -> Optional[str]:
+    """远程文件前 length 字节的 SHA-256（远程读取，只传回摘要），失败时为 None"""
+    completed = await conn.run(
+        f"head -c {length} -- {shlex.quote(path)} | sha256sum", check=False
+    )
+    output = str(completed.stdout or "").split()
+    return output[0] if completed.exit_status == 0 and output else None
+
+
+async def _replace(sftp: asyncssh.SFTPClient, source: str, target: str):
+    """原子替换目标文件（服务器不支持 posix-rename 时先删除再重命名）"""
+    try:
+        await sftp.posix_rename(source, target)
+    except asyncssh.SFTPOpUnsupported:
+        if await sftp.exists(target):
+            await sftp.remove(target)
+        await sftp.rename(source, target)
+
+
+async def sftp_upload_resumable(
+    conn: asyncssh.SSHClientConnection,
+    remote_path: str,
+    source: SharedSource,
+    preserve: bool = True,
+    tuning: Optional[TransferTuning] = None,
+) -> Tuple[int, int]:
+    """可续传地上传单个文件，返回 (传输的字节数, 续传起始偏移)
+
+    数据先写入同目录的临时文件，已有临时文件的前缀与本地内容一致时从中断处继续，
+    完成后重命名为目标文件。
+    """
+    size = source.total_bytes
+    async with conn.start_sftp_client() as sftp:
+        tuning = await _resolve_tuning(sftp, tuning)
+        if await sftp.isdir(remote_path):
+            remote_path = posixpath.join(remote_path, source.root.name)
+        partial = partial_path(remote_path)
+
+        partial_size = 0
+        if await sftp.exists(partial):
+            partial_size = (await sftp.stat(partial)).size or 0
+        offset = resume_offset(partial_size, size)
+
+        with source.view("") as data:
+            if offset:
+                expected = hashlib.sha256(data[:offset]).hexdigest()
+                if await remote_prefix_digest(conn, partial, offset) != expected:
+                    offset = 0
+            async with sftp.open(
+                partial, "r+b" if offset else "wb", **tuning.sftp_kwargs()
+            ) as remote:
+                # 写请求并行在途，中断后只有回退一个通道窗口之前的部分可视为已写入，
+                # 续传前已校验该前缀的摘要（见 resume_offset）
+                await remote.write(data[offset:], offset)
+                if offset and partial_size > size:
+                    await remote.truncate(size)
+
+        if preserve:
+            await _preserve(sftp, partial, source.stat)
+        await _replace(sftp, partial, remote_path)
+
+    return size - offset, offset
+
+
+async def sftp_download_resumable(
+    conn: asyncssh.SSHClientConnection,
+    remote_path: str,
+    local_path: str,
+    preserve: bool = True,
+    tuning: Optional[TransferTuning] = None,
+) -> Tuple[int, int]:
+    """可续传地下载单个文件，返回 (传输的字节数, 续传起始偏移)
+
+    目录不支持续传，需按普通方式递归下载。
+    """
+    async with conn.start_sftp_client() as sftp:
+        tuning = await _resolve_tuning(sftp, tuning)
+        attrs = await sftp.stat(remote_path)
+        if attrs.type == asyncssh.FILEXFER_TYPE_DIRECTORY:
+            raise asyncssh.SFTPFailure(
+                f"{remote_path} is a directory: resume supports single files only"
+            )
+
+        size = attrs.size or 0
+        partial = Path(partial_path(local_path))
+        offset = resume_offset(partial.stat().st_size if partial.exists() else 0, size)
+        if offset:
+            with (
+                open(partial, "rb") as f,
+                mmap.mmap(f.fileno(), offset, access=mmap.ACCESS_READ) as mapped,
+            ):
+                expected = hashlib.sha256(mapped).hexdigest()
+            if await remote_prefix_digest(conn, remote_path, offset) != expected:
+                offset = 0
+
+        with open(partial, "r+b" if offset else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            async with sftp.open(remote_path, "rb", **tuning.sftp_kwargs()) as remote:
+                position = offset
+                while position < size:
+                    chunk = await remote.read(
+                        min(_READ_CHUNK, size - position), position
+                    )
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    position += len(chunk)
+
+        # 服务器可能不返回权限或时间属性
+        if preserve and attrs.permissions is not None:
+            os.chmod(partial, attrs.permissions & 0o7777)
+        if preserve and attrs.mtime is not None:
+            atime = attrs.atime if attrs.atime is not None else attrs.mtime
+            os.utime(partial, (atime, attrs.mtime))
+        os.replace(partial, local_path)
+
+    return position - offset, offset
+
+
+class _FailureRecorder:
+    """按 ErrorPolicy 填充结果，并记录导致失败的异常（连接或步骤阶段）"""
+
+    def __init__(self, errors: ErrorPolicy):
+        self.errors = errors
+        self.exc: Optional[BaseException] = None
+
+    def apply(self, result, exc: BaseException, config: ConnectionConfig, **context):
+        self.exc = exc
+        return self.errors.apply(result, exc, config, **context)
+
+
+class FileTransfer(SessionEngine):
     """文件传输管理器"""
 
-    def __init__(self, max_concurrent: int = 10, progress_callback: Callable = None):
-        self.max_concurrent = max_concurrent
-        self.progress_callback = progress_callback
-        self._semaphore = asyncio.Semaphore(max_concurrent)
+    def __init__(
+        self,
+        max_concurrent: int = 10,
+        progress_callback: Callable = None,
+        pool: Optional[ConnectionPool] = None,
+        retry: Optional[RetryPolicy] = None,
+        events: Optional[EventBus] = None,
+        resume: bool = False,
+        resume_retry: Optional[RetryPolicy] = None,
+    ):
+        super().__init__(max_concurrent, progress_callback, pool, retry, events)
+        # 单个文件经临时文件传输，中断后按 resume_retry 重新连接并从断点继续
+        self.resume = resume
+        self.resume_retry = resume_retry or RESUME_RETRY
 
     async def upload_parallel(
         self,
@@ -28,31 +569,48 @@ class FileTransfer:
         remote_path: str,
         recursive: bool = False,
         preserve: bool = True,
+        tuning: Optional[TransferTuning] = None,
+        skip_identical: bool = False,
+        hash_cache: Optional[HashCache] = None,
     ) -> List[TransferResult]:
-        """并行上传文件到多个主机"""
-
-        tasks = []
-        for config in configs:
-            task = asyncio.create_task(
-                self._upload_single(
-                    config, local_path, remote_path, recursive, preserve
-                )
-            )
-            tasks.append(task)
-
-        results = []
-        completed = 0
-        total = len(tasks)
+        """并行上传文件到多个主机（源文件只遍历、读取一次，所有主机共用）
 
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            results.append(result)
-            completed += 1
+        skip_identical 时先比较单个文件的 SHA-256（本地只计算一次，可用 hash_cache
+        缓存），远程已有相同副本的主机不再上传，结果标记为 up_to_date。
+        """
 
-            if self.progress_callback:
-                self.progress_callback(completed, total, result)
-
-        return results
+        source = None
+        if recursive or not Path(local_path).is_dir():
+            try:
+                source = SharedSource(local_path)
+            except OSError:
+                # 源不可读时由每台主机各自报告错误
+                source = None
+
+        digest = None
+        if skip_identical and source is not None and not source.is_dir:
+            cache = hash_cache or HashCache()
+            digest = cache.digest(source, "", source.stat)
+            cache.save()
+
+        coros = [
+            self._upload_single(
+                config,
+                local_path,
+                remote_path,
+                recursive,
+                preserve,
+                tuning,
+                source,
+                digest,
+            )
+            for config in configs
+        ]
+        if source is None or source.is_dir:
+            return await self._gather_with_progress(coros)
+        # 单个文件在整个上传期间保持映射，分批开始的主机不会重新读取
+        with source.view(""):
+            return await self._gather_with_progress(coros)
 
     async def download_parallel(
         self,
@@ -61,35 +619,28 @@ class FileTransfer:
         local_dir: str,
         recursive: bool = False,
         preserve: bool = True,
+        tuning: Optional[TransferTuning] = None,
     ) -> List[TransferResult]:
         """并行从多个主机下载文件"""
 
-        tasks = []
+        coros = []
         for config in configs:
             # 为每个主机创建单独的本地目录
             host_local_dir = Path(local_dir) / config.host
             host_local_dir.mkdir(parents=True, exist_ok=True)
 
-            task = asyncio.create_task(
+            coros.append(
                 self._download_single(
-                    config, remote_path, str(host_local_dir), recursive, preserve
+                    config,
+                    remote_path,
+                    str(host_local_dir),
+                    recursive,
+                    preserve,
+                    tuning,
                 )
             )
-            tasks.append(task)
-
-        results = []
-        completed = 0
-        total = len(tasks)
 
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            results.append(result)
-            completed += 1
-
-            if self.progress_callback:
-                self.progress_callback(completed, total, result)
-
-        return results
+        return await self._gather_with_progress(coros)
 
     async def _upload_single(
         self,
@@ -98,6 +649,9 @@ class FileTransfer:
         remote_path: str,
         recursive: bool,
         preserve: bool,
+        tuning: Optional[TransferTuning] = None,
+        source: Optional[SharedSource] = None,
+        digest: Optional[str] = None,
     ) -> TransferResult:
         """上传文件到单个主机"""
 
@@ -110,68 +664,34 @@ class FileTransfer:
             start_time=time.time(),
         )
 
-        async with self._semaphore:
-            try:
-                result.status = ExecutionStatus.RUNNING
-
-                # 准备连接参数
-                connect_kwargs = {
-                    "host": config.host,
-                    "port": config.port,
-                    "username": config.username,
-                    "connect_timeout": config.connect_timeout,
-                    "known_hosts": config.known_hosts,
-                }
-
-                if config.password:
-                    connect_kwargs["password"] = config.password
-                elif config.private_key:
-                    connect_kwargs["client_keys"] = [config.private_key]
-                elif config.private_key_path:
-                    connect_kwargs["client_keys"] = [config.private_key_path]
-
-                # 建立连接并传输文件
-                async with asyncssh.connect(**connect_kwargs) as conn:
-                    async with conn.start_sftp_client() as sftp:
-                        if Path(local_path).is_dir() and recursive:
-                            await sftp.put(
-                                local_path, remote_path, recurse=True, preserve=preserve
-                            )
-                        else:
-                            await sftp.put(local_path, remote_path, preserve=preserve)
-
-                # 计算传输的字节数
-                local_path_obj = Path(local_path)
-                if local_path_obj.is_file():
-                    result.transferred_bytes = local_path_obj.stat().st_size
-                elif local_path_obj.is_dir() and recursive:
-                    result.transferred_bytes = sum(
-                        f.stat().st_size
-                        for f in local_path_obj.rglob("*")
-                        if f.is_file()
-                    )
-
+        async def upload(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            if digest is not None and await remote_matches(
+                conn, remote_path, source, digest
+            ):
+                result.up_to_date = True
+                result.skipped_files = 1
+                result.skipped_bytes = source.total_bytes
                 result.status = ExecutionStatus.SUCCESS
-
-            except asyncio.TimeoutError:
-                result.status = ExecutionStatus.TIMEOUT
-                result.error_message = (
-                    f"Transfer timeout after {config.connect_timeout}s"
+                return
+            if resumable:
+                result.transferred_bytes, result.resumed_from = (
+                    await sftp_upload_resumable(
+                        conn, remote_path, source, preserve, tuning
+                    )
                 )
+            else:
+                result.transferred_bytes = await sftp_upload(
+                    conn, local_path, remote_path, recursive, preserve, tuning, source
+                )
+            result.status = ExecutionStatus.SUCCESS
 
-            except asyncssh.Error as e:
-                result.status = ExecutionStatus.ERROR
-                result.error_message = f"SSH Error: {str(e)}"
-
-            except Exception as e:
-                result.status = ExecutionStatus.ERROR
-                result.error_message = f"Transfer error: {str(e)}"
-
-            finally:
-                result.end_time = time.time()
-                result.transfer_time = result.end_time - result.start_time
-
-        return result
+        resumable = self.resume and source is not None and not source.is_dir
+        if resumable:
+            return await self._run_resumable(config, result, upload)
+        return await self._run_on_host(
+            config, result, upload, _TRANSFER_ERRORS, "transfer_time"
+        )
 
     async def _download_single(
         self,
@@ -180,6 +700,7 @@ class FileTransfer:
         local_dir: str,
         recursive: bool,
         preserve: bool,
+        tuning: Optional[TransferTuning] = None,
     ) -> TransferResult:
         """从单个主机下载文件"""
 
@@ -194,62 +715,58 @@ class FileTransfer:
             start_time=time.time(),
         )
 
-        async with self._semaphore:
-            try:
-                result.status = ExecutionStatus.RUNNING
-
-                # 准备连接参数
-                connect_kwargs = {
-                    "host": config.host,
-                    "port": config.port,
-                    "username": config.username,
-                    "connect_timeout": config.connect_timeout,
-                    "known_hosts": config.known_hosts,
-                }
-
-                if config.password:
-                    connect_kwargs["password"] = config.password
-                elif config.private_key:
-                    connect_kwargs["client_keys"] = [config.private_key]
-                elif config.private_key_path:
-                    connect_kwargs["client_keys"] = [config.private_key_path]
-
-                # 建立连接并传输文件
-                async with asyncssh.connect(**connect_kwargs) as conn:
-                    async with conn.start_sftp_client() as sftp:
-                        await sftp.get(
-                            remote_path,
-                            str(local_path),
-                            recurse=recursive,
-                            preserve=preserve,
-                        )
-
-                # 计算传输的字节数
-                if local_path.is_file():
-                    result.transferred_bytes = local_path.stat().st_size
-                elif local_path.is_dir():
-                    result.transferred_bytes = sum(
-                        f.stat().st_size for f in local_path.rglob("*") if f.is_file()
+        async def download(conn: asyncssh.SSHClientConnection):
+            result.status = ExecutionStatus.RUNNING
+            if resumable:
+                result.transferred_bytes, result.resumed_from = (
+                    await sftp_download_resumable(
+                        conn, remote_path, str(local_path), preserve, tuning
                     )
-
-                result.status = ExecutionStatus.SUCCESS
-
-            except asyncio.TimeoutError:
-                result.status = ExecutionStatus.TIMEOUT
-                result.error_message = (
-                    f"Transfer timeout after {config.connect_timeout}s"
                 )
+            else:
+                result.transferred_bytes = await sftp_download(
+                    conn, remote_path, str(local_path), recursive, preserve, tuning
+                )
+            result.status = ExecutionStatus.SUCCESS
+
+        # 递归下载目录不续传
+        resumable = self.resume and not recursive
+        if resumable:
+            return await self._run_resumable(config, result, download)
+        return await self._run_on_host(
+            config, result, download, _TRANSFER_ERRORS, "transfer_time"
+        )
 
-            except asyncssh.Error as e:
-                result.status = ExecutionStatus.ERROR
-                result.error_message = f"SSH Error: {str(e)}"
-
-            except Exception as e:
-                result.status = ExecutionStatus.ERROR
-                result.error_message = f"Transfer error: {str(e)}"
-
-            finally:
-                result.end_time = time.time()
-                result.transfer_time = result.end_time - result.start_time
-
-        return result
+    async def _run_resumable(
+        self, config: ConnectionConfig, result: TransferResult, step
+    ) -> TransferResult:
+        """运行可续传的传输：连接中断等可重试的失败后按 resume_retry 重新运行，
+        每次从临时文件的断点继续（SFTP 协议错误如权限不足不重试）
+
+        每轮只尝试连接一次，重连失败同样计入续传次数，不与连接重试策略相乘。
+        """
+        retry = self.resume_retry
+        connect_once = RetryPolicy(attempts=1)
+        number = 0
+        while True:
+            number += 1
+            errors = _FailureRecorder(_TRANSFER_ERRORS)
+            await self._run_on_host(
+                config, result, step, errors, "transfer_time", connect_once
+            )
+            if (
+                errors.exc is None
+                or isinstance(errors.exc, asyncssh.SFTPError)
+                or not retry.should_retry(number, errors.exc)
+            ):
+                return result
+            delay = retry.delay(number)
+            logger.warning(
+                "Transfer to %s interrupted (%s), resuming in %.1fs",
+                config.host,
+                result.error_message,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            result.status = ExecutionStatus.PENDING
+            result.error_message = ""
@@ -1,6 +1,6 @@
 import ipaddress
 import re
-from typing import List, Set, Union, Iterator
+from typing import Dict, Iterable, List, Set, Tuple, Union, Iterator
 from dataclasses import dataclass
 
 
@@ -340,3 +340,62 @@ class FieldRangeIPRange:
                         ip_int = (a << 24) | (b << 16) | (c << 8) | d
                         yield ipaddress.IPv4Address(ip_int)
                         count += 1
+
+
+def _compress_numbers(values: List[int]) -> str:
+    """将有序整数列表压缩为字段范围写法，如 [1, 2, 3, 5] -> "1:3,5" """
+    parts = []
+    start = prev = values[0]
+    for value in values[1:] + [None]:
+        if value is not None and value == prev + 1:
+            prev = value
+            continue
+        if prev - start >= 2:
+            parts.append(f"{start}:{prev}")
+        else:
+            parts.extend(str(v) for v in range(start, prev + 1))
+        if value is not None:
+            start = prev = value
+    return ",".join(parts)
+
+
+def compress_hosts(hosts: Iterable[str]) -> str:
+    """将主机列表压缩为IP选择表达式
+
+    使用字段范围写法，如 192.168.1.[1:10,12]、10.0.[1:3].[0:255]（第三段
+    合并最后一段取值相同的网段）；结果可直接作为 IPSelector 或分组/筛选的
+    IP 表达式（compile_selector）使用。非IP主机名按原样排在最后。
+    """
+    networks: Dict[Tuple[int, int, int], Set[int]] = {}
+    names: Set[str] = set()
+
+    for host in hosts:
+        try:
+            a, b, c, d = ipaddress.IPv4Address(host).packed
+        except ipaddress.AddressValueError:
+            names.add(host)
+            continue
+        networks.setdefault((a, b, c), set()).add(d)
+
+    # 按前两段分组，合并最后一段取值相同的第三段
+    merged: Dict[Tuple[int, int], Dict[Tuple[int, ...], List[int]]] = {}
+    for (a, b, c), last in networks.items():
+        merged.setdefault((a, b), {}).setdefault(tuple(sorted(last)), []).append(c)
+
+    parts = []
+    for a, b in sorted(merged):
+        specs = sorted(merged[(a, b)].items(), key=lambda item: min(item[1]))
+        for last, thirds in specs:
+            thirds.sort()
+            third = (
+                str(thirds[0])
+                if len(thirds) == 1
+                else f"[{_compress_numbers(thirds)}]"
+            )
+            fourth = (
+                str(last[0]) if len(last) == 1 else f"[{_compress_numbers(list(last))}]"
+            )
+            parts.append(f"{a}.{b}.{third}.{fourth}")
+
+    parts.extend(sorted(names))
+    return ",".join(parts)
@@ -1,7 +1,9 @@
 import re
 import ipaddress
+import itertools
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Union
 
 from pypssh.core.models import *
 
@@ -219,9 +221,38 @@ class LabelSelector:
 # -------------------------
 # IP 扩展工具
 # -------------------------
-def _expand_ip_expr(ip_expr: str) -> List[str]:
-    ip_expr = ip_expr.strip()
+def _split_ip_expr(ip_expr: str) -> List[str]:
+    """按方括号外的逗号拆分 IP 表达式"""
+    parts, buf, depth = [], [], 0
+    for c in ip_expr:
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+        if c == "," and depth == 0:
+            parts.append("".join(buf).strip())
+            buf = []
+        else:
+            buf.append(c)
+    parts.append("".join(buf).strip())
+    return [part for part in parts if part]
+
 
+def _expand_ip_field(field: str) -> List[int]:
+    """展开字段范围写法中的一段，如 [1:3,5] -> [1, 2, 3, 5]"""
+    if field.startswith("[") and field.endswith("]"):
+        values = []
+        for item in field[1:-1].split(","):
+            start, _, end = item.partition(":")
+            values.extend(range(int(start), int(end or start) + 1))
+    else:
+        values = [int(field)]
+    if not values or any(v < 0 or v > 255 for v in values):
+        raise ValueError(f"Invalid IP field: {field}")
+    return values
+
+
+def _expand_ip_part(ip_expr: str) -> List[str]:
     # 192.168.1.1-192.168.1.10
     if "-" in ip_expr:
         start, end = ip_expr.split("-", 1)
@@ -235,11 +266,13 @@ def _expand_ip_expr(ip_expr: str) -> List[str]:
             cur += 1
         return ips
 
-    # 192.168.1.[1:20]
-    m = re.match(r"(\d+\.\d+\.\d+)\.\[(\d+):(\d+)\]", ip_expr)
-    if m:
-        prefix, s, e = m.groups()
-        return [f"{prefix}.{i}" for i in range(int(s), int(e) + 1)]
+    # 192.168.1.[1:20]、10.0.[1:3].[0:255]、192.168.1.[1,2,5]
+    if "[" in ip_expr:
+        fields = ip_expr.split(".")
+        if len(fields) != 4:
+            raise ValueError(f"Invalid IP expression: {ip_expr}")
+        values = [_expand_ip_field(field.strip()) for field in fields]
+        return [".".join(map(str, ip)) for ip in itertools.product(*values)]
 
     # 单 IP
     try:
@@ -249,17 +282,40 @@ def _expand_ip_expr(ip_expr: str) -> List[str]:
         raise ValueError(f"Invalid IP expression: {ip_expr}")
 
 
-def select_servers(
-    hosts: List[Host], ip_expr: str = "", label_expr: str = ""
-) -> List[Host]:
-    """根据 IP 和标签表达式过滤服务器"""
-    filtered = hosts
+def _expand_ip_expr(ip_expr: str) -> List[str]:
+    """展开 IP 表达式：逗号分隔的单 IP、起止范围与字段范围（如 compress_hosts 的输出）"""
+    ips = []
+    for part in _split_ip_expr(ip_expr.strip()):
+        ips.extend(_expand_ip_part(part))
+    if not ips:
+        raise ValueError(f"Invalid IP expression: {ip_expr}")
+    return ips
+
+
+@lru_cache(maxsize=256)
+def compile_selector(ip_expr: str = "", label_expr: str = "") -> Callable[[Host], bool]:
+    """将 IP 和标签表达式编译为单主机匹配函数"""
+    ips = None
     if ip_expr is not None and ip_expr.strip():
-        ips = _expand_ip_expr(ip_expr)
-        filtered = [s for s in filtered if s.host in ips]
+        ips = frozenset(_expand_ip_expr(ip_expr))
 
+    selector = None
     if label_expr is not None and label_expr.strip():
         selector = LabelSelector(label_expr)
-        filtered = [host for host in filtered if selector.matches(host.labels)]
 
-    return filtered
+    def matches(host: Host) -> bool:
+        if ips is not None and host.host not in ips:
+            return False
+        if selector is not None and not selector.matches(host.labels):
+            return False
+        return True
+
+    return matches
+
+
+def select_servers(
+    hosts: List[Host], ip_expr: str = "", label_expr: str = ""
+) -> List[Host]:
+    """根据 IP 和标签表达式过滤服务器"""
+    matches = compile_selector(ip_expr, label_expr)
+    return [host for host in hosts if matches(host)]
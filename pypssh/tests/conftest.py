@@ -0,0 +1,119 @@
+"""测试公用夹具：在本机启动可执行命令与SFTP的SSH服务器"""
+
+import asyncio
+import os
+import signal
+import threading
+from typing import List
+
+import asyncssh
+import pytest
+
+from pypssh.core.models import ConnectionConfig
+
+
+class _Server(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        # 无需认证
+        return False
+
+
+def _shell(stdin: bool):
+    """在本机 shell 中执行命令的进程工厂，stdin 为真时转发通道的标准输入"""
+
+    async def shell(process):
+        proc = await asyncio.create_subprocess_shell(
+            process.command,
+            stdin=asyncio.subprocess.PIPE if stdin else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+        async def pump():
+            try:
+                async for chunk in process.stdin:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+                proc.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        reads = [proc.stdout.read(), proc.stderr.read()]
+        if stdin:
+            reads.append(pump())
+        try:
+            stdout, stderr, *_ = await asyncio.gather(*reads)
+            await proc.wait()
+        except asyncio.CancelledError:
+            # 结束整个进程组（shell 及其子进程）
+            os.killpg(proc.pid, signal.SIGKILL)
+            await proc.wait()
+            raise
+        process.stdout.write(stdout)
+        process.stderr.write(stderr)
+        process.exit(proc.returncode)
+
+    return shell
+
+
+class LocalFleet:
+    """在后台线程的事件循环中运行SSH服务器，测试可在任意事件循环中连接
+
+    每次调用启动一个服务器并返回 hosts 个连接配置（用户名依次为 u0、u1 ...）。
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._servers: List[asyncssh.SSHAcceptor] = []
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout=30)
+
+    def __call__(self, hosts: int = 1, stdin: bool = False) -> List[ConnectionConfig]:
+        async def start():
+            return await asyncssh.create_server(
+                _Server,
+                "127.0.0.1",
+                0,
+                server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")],
+                process_factory=_shell(stdin),
+                sftp_factory=asyncssh.SFTPServer,
+                encoding=None,
+            )
+
+        server = self._call(start())
+        self._servers.append(server)
+        port = server.sockets[0].getsockname()[1]
+        return [
+            ConnectionConfig(host="127.0.0.1", port=port, username=f"u{index}")
+            for index in range(hosts)
+        ]
+
+    def close(self):
+        async def close():
+            # 先结束仍在运行的命令（如客户端超时后放弃的命令）
+            tasks = asyncio.all_tasks() - {asyncio.current_task()}
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for server in self._servers:
+                server.close()
+                await server.wait_closed()
+
+        try:
+            self._call(close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+
+@pytest.fixture
+def ssh_fleet():
+    """本地SSH服务器：configs = ssh_fleet(hosts=3, stdin=True)"""
+    fleet = LocalFleet()
+    yield fleet
+    fleet.close()
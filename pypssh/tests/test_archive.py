@@ -0,0 +1,179 @@
+import asyncio
+import io
+import os
+
+from pypssh.core import archive as archive_module
+from pypssh.core.archive import (
+    ArchiveStream,
+    ArchiveTransfer,
+    choose_compression,
+    extract_command,
+    measure_bandwidth,
+    write_archive,
+)
+from pypssh.core.models import ExecutionStatus
+
+
+def test_choose_compression():
+    assert choose_compression("auto", 125_000_000) == ("none", 0)
+    assert choose_compression("auto", 12_500_000) == ("gzip", 1)
+    assert choose_compression("auto", 1_000_000) == ("gzip", 6)
+    assert choose_compression("zstd", 125_000_000) == ("zstd", 1)
+    assert choose_compression("gzip", 1_000_000, level=9) == ("gzip", 9)
+    assert choose_compression("none", 1_000) == ("none", 0)
+
+
+def test_extract_command():
+    assert extract_command("/srv/my app") == (
+        "mkdir -p -- '/srv/my app' && tar -x --no-same-owner -C '/srv/my app' -f -"
+    )
+    assert " -m -z " in extract_command("/srv", "gzip", preserve=False)
+    assert extract_command("/srv", "zstd").startswith(
+        "mkdir -p -- /srv && zstd -dcq | tar"
+    )
+
+
+def test_archive_upload(tmp_path, ssh_fleet):
+    local = tmp_path / "site"
+    (local / "assets").mkdir(parents=True)
+    for index in range(50):
+        (local / "assets" / f"{index}.txt").write_text(f"file {index}\n" * 20)
+    (local / "run.sh").write_text("#!/bin/sh\n")
+    os.chmod(local / "run.sh", 0o750)
+
+    configs = ssh_fleet(2, stdin=True)
+    results = asyncio.run(
+        ArchiveTransfer("auto", bandwidth=1_000_000).upload_parallel(
+            configs, str(local), str(tmp_path / "dest"), recursive=True
+        )
+    )
+
+    assert [result.status for result in results] == [ExecutionStatus.SUCCESS] * 2
+    archived = tmp_path / "dest" / "site"
+    assert (archived / "assets" / "49.txt").read_text() == "file 49\n" * 20
+    assert (archived / "run.sh").stat().st_mode & 0o777 == 0o750
+    # gzip 压缩后传输的字节数小于原始数据
+    assert 0 < results[0].transferred_bytes < 50 * 160
+
+    failed = asyncio.run(
+        ArchiveTransfer("none").upload_parallel(
+            configs[:1], str(local), "/proc/denied", recursive=True
+        )
+    )
+    assert failed[0].status == ExecutionStatus.ERROR
+    assert failed[0].error_message
+
+    # 与普通上传相同，目录需指定 recursive
+    [plain] = asyncio.run(
+        ArchiveTransfer("none").upload_parallel(
+            configs[:1], str(local), str(tmp_path / "plain")
+        )
+    )
+    assert plain.status == ExecutionStatus.ERROR
+    assert not (tmp_path / "plain" / "site").exists()
+
+
+def test_archive_stream_bounded_buffer(tmp_path, monkeypatch):
+    local = tmp_path / "site"
+    local.mkdir()
+    for index in range(20):
+        (local / f"{index}.bin").write_bytes(os.urandom(10_000))
+    expected = io.BytesIO()
+    write_archive(str(local), expected)
+    monkeypatch.setattr(archive_module, "_CHUNK", 4096)
+
+    async def consume():
+        stream = ArchiveStream(str(local), 2, window=4)
+        received = [[], []]
+        peak = 0
+
+        async def read(reader, delay):
+            nonlocal peak
+            while (chunk := await stream.read(reader)) is not None:
+                received[reader].append(chunk)
+                peak = max(peak, len(stream._chunks))
+                await asyncio.sleep(delay)
+            await stream.close(reader)
+
+        await asyncio.gather(read(0, 0), read(1, 0.001))
+        await stream.wait()
+        return received, peak
+
+    received, peak = asyncio.run(consume())
+
+    # 两台主机收到相同的完整归档，缓冲不超过窗口
+    assert b"".join(received[0]) == b"".join(received[1]) == expected.getvalue()
+    assert len(received[0]) > 4 * 4
+    assert peak <= 4
+
+
+def test_archive_upload_in_batches(tmp_path, monkeypatch, ssh_fleet):
+    local = tmp_path / "site"
+    local.mkdir()
+    (local / "index.html").write_text("<html></html>")
+    configs = ssh_fleet(5, stdin=True)
+    builds = []
+    write = archive_module.write_archive
+
+    def counted(*args):
+        builds.append(args[0])
+        write(*args)
+
+    monkeypatch.setattr(archive_module, "write_archive", counted)
+    results = asyncio.run(
+        ArchiveTransfer("none", max_concurrent=2).upload_parallel(
+            configs, str(local), str(tmp_path / "dest"), recursive=True
+        )
+    )
+
+    assert [result.status for result in results] == [ExecutionStatus.SUCCESS] * 5
+    # 后续批次读取临时文件，归档只生成一次
+    assert len(builds) == 1
+    assert len({result.transferred_bytes for result in results}) == 1
+    assert (tmp_path / "dest" / "site" / "index.html").read_text() == "<html></html>"
+
+
+def test_auto_compression_measures_link(tmp_path, monkeypatch, ssh_fleet):
+    local = tmp_path / "site"
+    local.mkdir()
+    (local / "index.html").write_text("<html></html>" * 100)
+    configs = ssh_fleet(2, stdin=True)
+
+    async def probe(config):
+        async with ArchiveTransfer()._session(config) as session:
+            return await measure_bandwidth(session.conn, max_bytes=256 * 1024)
+
+    assert asyncio.run(probe(configs[0])) > 0
+
+    probes, commands = [], []
+    extract = archive_module.extract_command
+
+    async def slow_link(conn):
+        probes.append(conn)
+        return 1_000_000
+
+    def record(remote_path, compression="none", preserve=True):
+        commands.append(compression)
+        return extract(remote_path, compression, preserve)
+
+    monkeypatch.setattr(archive_module, "measure_bandwidth", slow_link)
+    monkeypatch.setattr(archive_module, "extract_command", record)
+    results = asyncio.run(
+        ArchiveTransfer("auto").upload_parallel(
+            configs, str(local), str(tmp_path / "dest"), recursive=True
+        )
+    )
+
+    # 只测量一次，慢链路选择 gzip
+    assert [result.status for result in results] == [ExecutionStatus.SUCCESS] * 2
+    assert len(probes) == 1
+    assert commands == ["gzip"]
+
+    # 显式指定带宽时不测量
+    asyncio.run(
+        ArchiveTransfer("auto", bandwidth=125_000_000).upload_parallel(
+            configs, str(local), str(tmp_path / "dest"), recursive=True
+        )
+    )
+    assert len(probes) == 1
+    assert commands[-1] == "none"
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+RUNNER = (
+    "import sys\n"
+    "sys.argv = ['pypssh'] + sys.argv[1:]\n"
+    "from pypssh.cli import main\n"
+    "try:\n"
+    "    main()\n"
+    "except SystemExit:\n"
+    "    pass\n"
+    "heavy = ('asyncssh', 'rich', 'yaml', 'cryptography')\n"
+    "print(','.join(m for m in heavy if m in sys.modules), file=sys.stderr)\n"
+)
+
+
+def _loaded_heavy_modules(args, home):
+    proc = subprocess.run(
+        [sys.executable, "-c", RUNNER, *args],
+        env=dict(os.environ, HOME=str(home)),
+        capture_output=True,
+        text=True,
+    )
+    last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else ""
+    return set(filter(None, last_line.split(",")))
+
+
+@pytest.mark.parametrize(
+    "args, allowed",
+    [
+        (["version", "--simple"], set()),
+        (["config", "list-namespaces"], {"rich"}),
+        (["exec", "--help"], set()),
+        (["ping", "--help"], set()),
+        (["file", "upload", "--help"], set()),
+        (["run-plan", "--help"], set()),
+    ],
+)
+def test_cli_defers_heavy_imports(args, allowed, tmp_path):
+    """轻量命令不应加载 asyncssh/rich/yaml 等重量级依赖"""
+    assert _loaded_heavy_modules(args, tmp_path) <= allowed
+
+
+def test_package_exports_are_lazy():
+    import pypssh
+
+    assert "SSHExecutor" in dir(pypssh)
+    assert pypssh.Host.__name__ == "Host"
+    with pytest.raises(AttributeError):
+        pypssh.DoesNotExist
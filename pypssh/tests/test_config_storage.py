@@ -0,0 +1,214 @@
+import functools
+import json
+import sqlite3
+
+import pytest
+
+from pypssh.config.storage import ConfigStorage
+from pypssh.core import models
+
+
+class TestSelectionCache:
+    """测试选择结果缓存"""
+
+    @pytest.fixture
+    def storage(self, tmp_path) -> ConfigStorage:
+        storage = ConfigStorage(tmp_path)
+        storage.add_server(
+            models.Host(name="web-1", host="192.168.1.1", labels={"tier": "web"})
+        )
+        storage.add_server(
+            models.Host(name="web-2", host="192.168.1.2", labels={"tier": "web"})
+        )
+        storage.add_server(
+            models.Host(name="db-1", host="192.168.1.3", labels={"tier": "db"})
+        )
+        return storage
+
+    def _cache_rows(self, storage: ConfigStorage):
+        with storage._get_connection() as conn:
+            return conn.execute("SELECT * FROM selection_cache").fetchall()
+
+    def test_revision_bumped_on_changes(self, storage):
+        revision = storage.get_namespace_revision("default")
+        assert revision == 3
+
+        storage.update_server("web-1", {"labels": {"tier": "api"}})
+        assert storage.get_namespace_revision("default") == 4
+
+        assert not storage.delete_server("missing")
+        assert storage.get_namespace_revision("default") == 4
+
+        assert storage.delete_server("db-1")
+        assert storage.get_namespace_revision("default") == 5
+
+    def test_resolve_selection(self, storage):
+        selected = storage.resolve_selection("default", label_expression="tier=web")
+        assert [s.name for s in selected] == ["web-1", "web-2"]
+
+        selected = storage.resolve_selection(
+            "default", ip_expression="192.168.1.2-192.168.1.3"
+        )
+        assert [s.name for s in selected] == ["db-1", "web-2"]
+
+        selected = storage.resolve_selection("default")
+        assert len(selected) == 3
+
+    def test_cache_hit_returns_full_config(self, storage):
+        storage.update_server("web-1", {"password": "secret"})
+        storage.resolve_selection("default", label_expression="tier=web")
+        rows = self._cache_rows(storage)
+        assert len(rows) == 1
+
+        selected = storage.resolve_selection("default", label_expression="tier=web")
+        assert [s.name for s in selected] == ["web-1", "web-2"]
+        assert selected[0].password == "secret"
+        assert len(self._cache_rows(storage)) == 1
+
+    def test_cache_invalidated_by_revision(self, storage):
+        storage.resolve_selection("default", label_expression="tier=web")
+        storage.update_server("db-1", {"labels": {"tier": "web"}})
+
+        selected = storage.resolve_selection("default", label_expression="tier=web")
+        assert [s.name for s in selected] == ["db-1", "web-1", "web-2"]
+
+        rows = self._cache_rows(storage)
+        assert len(rows) == 1
+        assert rows[0]["revision"] == storage.get_namespace_revision("default")
+        assert len(json.loads(rows[0]["server_ids"])) == 3
+
+    def test_cache_is_per_namespace(self, storage):
+        storage.create_namespace("prod")
+        storage.add_server(
+            models.Host(name="web-9", host="10.0.0.9", labels={"tier": "web"}),
+            "prod",
+        )
+
+        selected = storage.resolve_selection("prod", label_expression="tier=web")
+        assert [s.name for s in selected] == ["web-9"]
+        selected = storage.resolve_selection("default", label_expression="tier=web")
+        assert [s.name for s in selected] == ["web-1", "web-2"]
+
+        # 缓存命中时同样带上命名空间
+        selected = storage.resolve_selection("prod", label_expression="tier=web")
+        assert selected[0].namespace == "prod"
+        assert storage.get_server("web-9", "prod").namespace == "prod"
+        assert storage.list_servers()[0].namespace == "default"
+
+    def test_cache_write_failure_falls_back(self, storage, monkeypatch):
+        connect = sqlite3.connect
+        locker = connect(storage.db_path)
+        locker.execute("BEGIN IMMEDIATE")
+        # 不等待锁释放，直接触发 database is locked
+        monkeypatch.setattr(sqlite3, "connect", functools.partial(connect, timeout=0))
+        try:
+            selected = storage.resolve_selection("default", label_expression="tier=web")
+        finally:
+            locker.rollback()
+            locker.close()
+
+        assert [s.name for s in selected] == ["web-1", "web-2"]
+        assert self._cache_rows(storage) == []
+
+    def test_unknown_namespace(self, storage):
+        assert storage.resolve_selection("missing") == []
+        assert storage.get_namespace_revision("missing") is None
+
+    def test_migrates_legacy_database(self, tmp_path):
+        import sqlite3
+
+        conn = sqlite3.connect(tmp_path / "pypssh.db")
+        conn.execute(
+            """
+            CREATE TABLE namespaces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+        conn.commit()
+        conn.close()
+
+        storage = ConfigStorage(tmp_path)
+        assert storage.get_namespace_revision("default") == 0
+        storage.add_server(models.Host(name="web-1", host="192.168.1.1"))
+        assert storage.get_namespace_revision("default") == 1
+
+
+class TestGroupMembership:
+    """测试服务器组成员物化"""
+
+    @pytest.fixture
+    def storage(self, tmp_path) -> ConfigStorage:
+        storage = ConfigStorage(tmp_path)
+        storage.add_server(
+            models.Host(name="web-1", host="192.168.1.1", labels={"tier": "web"})
+        )
+        storage.add_server(
+            models.Host(name="db-1", host="192.168.1.3", labels={"tier": "db"})
+        )
+        storage.add_server_group(
+            models.ServerGroup(
+                name="web",
+                ip_expression="192.168.1.[1:10]",
+                label_expression="tier=web",
+            )
+        )
+        return storage
+
+    def _members(self, storage, group="web"):
+        return [s.name for s in storage.list_group_servers(group)]
+
+    def test_group_populated_on_add(self, storage):
+        assert self._members(storage) == ["web-1"]
+        assert storage.get_group_member_counts() == {"web": 1}
+
+    def test_server_add_updates_membership(self, storage):
+        storage.add_server(
+            models.Host(name="web-2", host="192.168.1.2", labels={"tier": "web"})
+        )
+        storage.add_server(
+            models.Host(name="web-3", host="10.0.0.1", labels={"tier": "web"})
+        )
+        assert self._members(storage) == ["web-1", "web-2"]
+
+    def test_server_update_updates_membership(self, storage):
+        storage.update_server("db-1", {"labels": {"tier": "web"}})
+        assert self._members(storage) == ["db-1", "web-1"]
+
+        storage.update_server("web-1", {"host": "10.0.0.1"})
+        assert self._members(storage) == ["db-1"]
+
+    def test_delete_cleans_membership(self, storage):
+        storage.delete_server("web-1")
+        assert self._members(storage) == []
+        assert storage.get_group_member_counts() == {"web": 0}
+
+        storage.delete_server_group("web")
+        with storage._get_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM server_group_members").fetchone()
+        assert count[0] == 0
+
+    def test_invalid_group_expression_rejected(self, storage):
+        with pytest.raises(ValueError):
+            storage.add_server_group(
+                models.ServerGroup(name="bad", ip_expression="invalid_ip")
+            )
+        assert storage.get_server_group("bad") is None
+
+    def test_migrates_existing_groups(self, tmp_path):
+        storage = ConfigStorage(tmp_path)
+        storage.add_server(
+            models.Host(name="web-1", host="192.168.1.1", labels={"tier": "web"})
+        )
+        storage.add_server_group(models.ServerGroup(name="web", label_expression="tier=web"))
+        with storage._get_connection() as conn:
+            conn.execute("DELETE FROM server_group_members")
+            conn.execute("PRAGMA user_version = 1")
+            conn.commit()
+
+        storage = ConfigStorage(tmp_path)
+        assert self._members(storage) == ["web-1"]
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+
+from pypssh.core.events import (
+    EventBus,
+    EventType,
+    JsonlTraceWriter,
+    SpanExporter,
+)
+from pypssh.core.executor import SSHExecutor
+from pypssh.core.models import (
+    ConnectionConfig,
+    ConnectivityResult,
+    ConnectivityStatus,
+    ExecutionResult,
+    ExecutionStatus,
+)
+from pypssh.core.session import (
+    ErrorPolicy,
+    HostSession,
+    SessionEngine,
+    emit_event,
+)
+
+ERRORS = ErrorPolicy(
+    timeout_status=ExecutionStatus.TIMEOUT,
+    timeout_message="timeout",
+    error_status=ExecutionStatus.ERROR,
+    error_prefix="error",
+)
+
+
+class FakeConnection:
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class FakeSession(HostSession):
+    async def _connect_with_retry(self):
+        self.attempts += 1
+        return FakeConnection()
+
+
+class FakeEngine(SessionEngine):
+    def _session(self, config):
+        return FakeSession(config, events=self.events)
+
+
+def _run_session(bus, fail=False, ping=False):
+    async def step(conn):
+        emit_event(EventType.FIRST_BYTE, stream="stdout")
+        if fail:
+            raise RuntimeError("boom")
+        result.status = (
+            ConnectivityStatus.REACHABLE if ping else ExecutionStatus.SUCCESS
+        )
+
+    config = ConnectionConfig(host="10.0.0.1")
+    result = (ConnectivityResult if ping else ExecutionResult)(
+        host=config.host, status=ExecutionStatus.PENDING, start_time=time.time()
+    )
+    elapsed_field = "response_time" if ping else "execution_time"
+    engine = FakeEngine(events=bus)
+    asyncio.run(engine._run_on_host(config, result, step, ERRORS, elapsed_field))
+    return result
+
+
+def test_session_lifecycle_events():
+    bus = EventBus()
+    events = []
+    bus.subscribe(events.append)
+
+    _run_session(bus)
+
+    assert [e.type for e in events] == [
+        EventType.QUEUED,
+        EventType.CONNECTING,
+        EventType.AUTHENTICATED,
+        EventType.EXEC_STARTED,
+        EventType.FIRST_BYTE,
+        EventType.FINISHED,
+    ]
+    assert len({e.session for e in events}) == 1
+    timestamps = [e.timestamp for e in events]
+    assert timestamps == sorted(timestamps)
+    assert events[-1].attrs["status"] == "success"
+    assert events[4].attrs == {"stream": "stdout"}
+
+
+def test_bus_without_subscribers_and_failing_handler():
+    bus = EventBus()
+    assert not bus.active
+    bus.emit(EventType.QUEUED, "h", 22, 1)
+
+    def broken(event):
+        raise ValueError("handler bug")
+
+    bus.subscribe(broken)
+    assert bus.active
+    result = _run_session(bus)
+    assert result.status == ExecutionStatus.SUCCESS
+
+    bus.unsubscribe(broken)
+    assert not bus.active
+
+    # 不在会话中时忽略
+    emit_event(EventType.FIRST_BYTE)
+
+
+def test_jsonl_trace_writer(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    bus = EventBus()
+    writer = bus.subscribe(JsonlTraceWriter(str(path)))
+    _run_session(bus, fail=True)
+    writer.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["event"] for line in lines][-1] == "finished"
+    assert lines[-1]["status"] == "error"
+    assert lines[-1]["error"] == "error: boom"
+    assert all(line["host"] == "10.0.0.1" for line in lines)
+
+
+def test_span_exporter(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    bus = EventBus()
+    exporter = bus.subscribe(SpanExporter(str(path)))
+    _run_session(bus)
+    _run_session(bus, fail=True)
+    _run_session(bus, ping=True)
+    exporter.close()
+
+    payloads = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(payloads) == 3
+
+    spans = payloads[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root, *children = spans
+    assert root["name"] == "pypssh.session 10.0.0.1"
+    assert root["status"]["code"] == 1
+    assert "parentSpanId" not in root
+    assert [span["name"] for span in children] == ["queue", "connect", "exec"]
+    assert all(span["parentSpanId"] == root["spanId"] for span in children)
+    assert all(span["traceId"] == exporter.trace_id for span in spans)
+    assert [event["name"] for event in children[2]["events"]] == ["first_byte"]
+    for span in spans:
+        assert int(span["startTimeUnixNano"]) <= int(span["endTimeUnixNano"])
+
+    failed_root = payloads[1]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert failed_root["status"]["code"] == 2
+
+    ping_root = payloads[2]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert ping_root["status"] == {"code": 1}
+
+
+def test_tracing_does_not_change_results(ssh_fleet):
+    configs = ssh_fleet()
+    commands = ["echo out; echo err >&2", "printf partial; exit 3", "true"]
+
+    async def run(bus):
+        executor = SSHExecutor(events=bus)
+        return [
+            (await executor.execute_parallel(configs, command))[0]
+            for command in commands
+        ]
+
+    plain = asyncio.run(run(EventBus()))
+    traced_bus = EventBus()
+    events = []
+    traced_bus.subscribe(events.append)
+    traced = asyncio.run(run(traced_bus))
+
+    fields = ("status", "exit_code", "stdout", "stderr", "error_message")
+    for a, b in zip(plain, traced):
+        assert [getattr(a, f) for f in fields] == [getattr(b, f) for f in fields]
+    assert plain[1].stdout == "partial" and plain[1].exit_code == 3
+    assert [e.attrs["stream"] for e in events if e.type == EventType.FIRST_BYTE] == [
+        "stdout",
+        "stdout",
+    ]
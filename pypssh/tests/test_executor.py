@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from pypssh.core.executor import SSHExecutor, _TailBuffer, parse_batch_size
+from pypssh.core.models import ConnectionConfig, ExecutionResult, ExecutionStatus
+
+
+class FakeExecutor(SSHExecutor):
+    """以本地协程代替SSH执行，记录并发窗口"""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+        self.running = 0
+        self.peak = 0
+        self.started = []
+
+    async def _execute_single(self, config, command):
+        self.started.append(config.host)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01 if config.host not in self.failing else 0)
+        self.running -= 1
+        status = (
+            ExecutionStatus.ERROR
+            if config.host in self.failing
+            else ExecutionStatus.SUCCESS
+        )
+        return ExecutionResult(host=config.host, status=status)
+
+
+def _configs(count):
+    return [ConnectionConfig(host=f"10.0.0.{i}") for i in range(count)]
+
+
+def _statuses(results):
+    return {r.host: r.status for r in results}
+
+
+@pytest.mark.parametrize(
+    "value, total, expected",
+    [("5", 100, 5), ("10%", 100, 10), ("1%", 10, 1), ("25%", 10, 3), ("100%", 7, 7)],
+)
+def test_parse_batch_size(value, total, expected):
+    assert parse_batch_size(value, total) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "0%", "101%", "abc", "%"])
+def test_parse_batch_size_invalid(value):
+    with pytest.raises(ValueError):
+        parse_batch_size(value, 10)
+
+
+def test_sliding_window_limits_in_flight_hosts():
+    executor = FakeExecutor()
+    results = asyncio.run(executor.execute_parallel(_configs(20), "true", batch_size=3))
+
+    assert len(results) == 20
+    assert executor.peak == 3
+    assert all(r.status == ExecutionStatus.SUCCESS for r in results)
+
+
+def test_max_fail_stops_launching_new_hosts():
+    executor = FakeExecutor(failing={"10.0.0.0", "10.0.0.1"})
+    results = asyncio.run(
+        executor.execute_parallel(_configs(10), "true", batch_size=2, max_fail=1)
+    )
+
+    statuses = _statuses(results)
+    assert len(results) == 10
+    assert statuses["10.0.0.0"] == ExecutionStatus.ERROR
+    assert statuses["10.0.0.1"] == ExecutionStatus.ERROR
+    assert len(executor.started) == 2
+    assert list(statuses.values()).count(ExecutionStatus.CANCELLED) == 8
+
+
+def test_max_fail_tolerates_failures_below_threshold():
+    executor = FakeExecutor(failing={"10.0.0.3"})
+    results = asyncio.run(
+        executor.execute_parallel(_configs(10), "true", batch_size=2, max_fail=1)
+    )
+    assert len(executor.started) == 10
+    assert list(_statuses(results).values()).count(ExecutionStatus.ERROR) == 1
+
+
+def test_stop_on_error_cancels_in_flight_hosts():
+    executor = FakeExecutor(failing={"10.0.0.0"})
+    results = asyncio.run(
+        executor.execute_parallel(_configs(6), "true", stop_on_error=True, batch_size=3)
+    )
+
+    statuses = _statuses(results)
+    assert len(results) == 6
+    assert statuses["10.0.0.0"] == ExecutionStatus.ERROR
+    assert list(statuses.values()).count(ExecutionStatus.CANCELLED) == 5
+
+
+def test_results_keep_config_order():
+    # 失败的主机最先完成，结果仍按配置顺序返回
+    configs = _configs(8)
+    executor = FakeExecutor(failing={"10.0.0.1"})
+    results = asyncio.run(
+        executor.execute_parallel(configs, "true", batch_size=4, max_fail=0)
+    )
+    assert [r.host for r in results] == [c.host for c in configs]
+    assert results[1].status == ExecutionStatus.ERROR
+    assert {r.status for r in results[4:]} == {ExecutionStatus.CANCELLED}
+
+
+def test_tail_buffer_keeps_last_bytes():
+    buffer = _TailBuffer(limit=10)
+    for chunk in (b"0123456789", b"abcd", b"efghijklmnop"):
+        buffer.append(chunk)
+    assert buffer.text() == "[... 16 bytes omitted ...]\nghijklmnop"
+
+    unbounded = _TailBuffer()
+    unbounded.append(b"x" * 100)
+    assert unbounded.text() == "x" * 100
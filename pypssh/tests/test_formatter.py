@@ -0,0 +1,147 @@
+import json
+
+from pypssh.core.models import ExecutionResult, ExecutionStatus
+from pypssh.ui.formatter import OutputAggregator, OutputDiffer, OutputFormatter
+
+
+def _result(host, stdout="ok\n", exit_code=0, status=ExecutionStatus.SUCCESS, **kw):
+    return ExecutionResult(
+        host=host, status=status, stdout=stdout, exit_code=exit_code, **kw
+    )
+
+
+class TestOutputAggregator:
+    """测试输出聚合"""
+
+    def test_groups_identical_output(self):
+        aggregator = OutputAggregator()
+        results = [_result(f"10.0.0.{i}", "nginx/1.24\n") for i in range(1, 6)]
+        results.append(_result("10.0.0.9", "nginx/1.22\n"))
+        results.append(_result("10.0.0.10", "nginx/1.24\n", exit_code=1))
+        for result in results:
+            aggregator.add(result)
+
+        groups = aggregator.groups()
+        assert len(aggregator) == 3
+        assert groups[0].count == 5
+        assert groups[0].stdout == "nginx/1.24\n"
+        # 组内结果共享同一份输出
+        assert all(r.stdout is groups[0].stdout for r in results[:5])
+
+    def test_error_message_ignores_host(self):
+        aggregator = OutputAggregator()
+        for host in ("10.0.0.1", "10.0.0.2"):
+            aggregator.add(
+                _result(
+                    host,
+                    stdout="",
+                    exit_code=None,
+                    status=ExecutionStatus.ERROR,
+                    error_message=f"Unexpected error: connect to {host} failed",
+                )
+            )
+
+        (group,) = aggregator.groups()
+        assert group.count == 2
+        assert group.error_message == "Unexpected error: connect to <host> failed"
+
+    def test_format(self):
+        aggregator = OutputAggregator()
+        for i in range(1, 4):
+            aggregator.add(_result(f"10.0.0.{i}"))
+
+        text = OutputFormatter().format_aggregated_results(aggregator.groups())
+        assert "10.0.0.[1:3] (3 hosts)" in text
+        assert text.count("ok") == 1
+
+        data = json.loads(
+            OutputFormatter("json").format_aggregated_results(aggregator.groups())
+        )
+        assert data == [
+            {
+                "hosts": "10.0.0.[1:3]",
+                "count": 3,
+                "status": "success",
+                "exit_code": 0,
+                "stdout": "ok\n",
+                "stderr": "",
+                "error_message": "",
+            }
+        ]
+
+        text = OutputFormatter("template", "$hosts: $count").format_aggregated_results(
+            aggregator.groups()
+        )
+        assert text == "10.0.0.[1:3]: 3"
+
+
+class TestOutputDiffer:
+    """测试基线差异比较"""
+
+    def _aggregator(self):
+        aggregator = OutputAggregator()
+        for i in range(1, 6):
+            aggregator.add(_result(f"10.0.0.{i}", "a=1\nb=2\n"))
+        aggregator.add(_result("10.0.0.9", "a=1\nb=3\n"))
+        aggregator.add(
+            _result(
+                "10.0.0.10",
+                stdout="",
+                exit_code=1,
+                status=ExecutionStatus.ERROR,
+                stderr="No such file\n",
+            )
+        )
+        return aggregator
+
+    def test_majority_baseline(self):
+        differ = OutputDiffer(self._aggregator())
+        matching, differing = differ.partition()
+
+        assert [g.count for g in matching] == [5]
+        assert [g.hosts for g in differing] == [["10.0.0.9"], ["10.0.0.10"]]
+        assert "-b=2\n+b=3\n" in differ.diff(differing[0])
+
+        text = OutputFormatter().format_diff_results(differ)
+        assert text.startswith("✅ 5 hosts match majority (5 hosts)")
+        assert "10.0.0.9 (1 hosts)" in text
+        assert "a=1" not in text.split("❌")[0]
+
+    def test_file_baseline(self):
+        differ = OutputDiffer(self._aggregator(), baseline="a=1\nb=3\n")
+        matching, differing = differ.partition()
+
+        assert [g.hosts for g in matching] == [["10.0.0.9"]]
+        assert [g.count for g in differing] == [5, 1]
+
+        data = json.loads(OutputFormatter("json").format_diff_results(differ))
+        assert [item["matches"] for item in data] == [True, False, False]
+        assert data[1]["hosts"] == "10.0.0.[1:5]"
+        assert "+++ 5 hosts" in data[1]["diff"]
+
+    def test_diff_is_cached_per_output(self):
+        differ = OutputDiffer(self._aggregator())
+        group = differ.partition()[1][0]
+        assert differ.diff(group) is differ.diff(group)
+
+    def test_groups_sorted_once(self, monkeypatch):
+        aggregator = self._aggregator()
+        calls = []
+        groups = aggregator.groups
+        monkeypatch.setattr(aggregator, "groups", lambda: calls.append(1) or groups())
+
+        differ = OutputDiffer(aggregator)
+        OutputFormatter().format_diff_results(differ)
+        OutputFormatter("json").format_diff_results(differ)
+        assert len(calls) == 1
+
+
+def test_exec_rejects_stream_with_aggregate():
+    from click.testing import CliRunner
+
+    from pypssh.cli import cli
+
+    for flag in ("--aggregate", "--diff"):
+        result = CliRunner().invoke(cli, ["exec", "--stream", flag, "uptime"])
+        assert result.exit_code == 2
+        assert "--stream cannot be combined" in result.output
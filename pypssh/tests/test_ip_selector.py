@@ -4,7 +4,9 @@ from typing import List, Set, Union, Iterator
 from dataclasses import dataclass
 from unittest.mock import patch, MagicMock
 
-from pypssh.selector.ip_selector import IPRange, IPSelector
+from pypssh.core.models import Host
+from pypssh.selector.ip_selector import IPRange, IPSelector, compress_hosts
+from pypssh.selector.label_selector import compile_selector
 
 
 class TestIPRange:
@@ -449,3 +451,39 @@ class TestIPSelector:
         assert ips[0] == "192.168.1.1"
         assert ips[1] == "192.168.1.2"
         assert ips[2] == "192.168.1.3"
+
+
+class TestCompressHosts:
+    """测试主机列表压缩"""
+
+    def test_compress(self):
+        """测试压缩为字段范围写法"""
+        hosts = [f"192.168.1.{i}" for i in range(1, 11)] + ["192.168.1.12", "10.0.0.1"]
+        assert compress_hosts(hosts) == "10.0.0.1,192.168.1.[1:10,12]"
+
+        assert compress_hosts(["192.168.1.1", "192.168.1.2"]) == "192.168.1.[1,2]"
+        assert compress_hosts(["web1", "192.168.1.1", "web1"]) == "192.168.1.1,web1"
+        assert compress_hosts([]) == ""
+
+    def test_merge_third_field(self):
+        """测试合并最后一段取值相同的网段"""
+        hosts = [f"10.0.{c}.{d}" for c in range(1, 4) for d in range(0, 256)]
+        hosts.append("10.0.5.7")
+        assert compress_hosts(hosts) == "10.0.[1:3].[0:255],10.0.5.7"
+
+    def test_roundtrip(self):
+        """测试压缩结果可被IPSelector解析并还原"""
+        hosts = {"10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.1.1", "10.0.2.9", "10.1.0.1"}
+        assert set(IPSelector(compress_hosts(hosts)).expand()) == hosts
+
+    def test_roundtrip_compile_selector(self):
+        """测试压缩结果可作为分组/筛选的IP表达式"""
+        hosts = {f"10.0.{c}.{d}" for c in range(1, 4) for d in range(0, 256)}
+        hosts |= {"192.168.1.1", "192.168.1.2", "192.168.1.5", "172.16.0.9"}
+        expression = compress_hosts(hosts)
+        assert expression == ("10.0.[1:3].[0:255],172.16.0.9,192.168.1.[1,2,5]")
+
+        matches = compile_selector(expression)
+        assert all(matches(Host(host=host)) for host in hosts)
+        assert not matches(Host(host="192.168.1.3"))
+        assert not matches(Host(host="10.0.4.0"))
@@ -0,0 +1,128 @@
+import threading
+
+from pypssh.core.models import (
+    ConnectivityResult,
+    ConnectivityStatus,
+    ExecutionResult,
+    ExecutionStatus,
+    TransferResult,
+)
+from pypssh.ui.metrics import (
+    Histogram,
+    RunMetrics,
+    read_textfile,
+    write_textfile,
+)
+
+
+def _result(cls, status, connect, elapsed, attempts=1, **kwargs):
+    return cls(
+        host="10.0.0.1",
+        status=status,
+        start_time=100.0,
+        end_time=100.0 + elapsed,
+        connect_time=connect,
+        connect_attempts=attempts,
+        **kwargs,
+    )
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.5, 2):
+        histogram.observe(value)
+
+    samples = dict(histogram.samples("x", '{a="b"}'))
+    assert samples['x_bucket{a="b",le="0.1"}'] == 1
+    assert samples['x_bucket{a="b",le="1"}'] == 2
+    assert samples['x_bucket{a="b",le="+Inf"}'] == 3
+    assert samples['x_count{a="b"}'] == 3
+    assert samples['x_sum{a="b"}'] == 2.55
+
+
+def test_run_metrics_from_results():
+    results = [
+        _result(ExecutionResult, ExecutionStatus.SUCCESS, 0.2, 1.0),
+        _result(ExecutionResult, ExecutionStatus.ERROR, 0.3, 0.5, attempts=3),
+        _result(ExecutionResult, ExecutionStatus.TIMEOUT, 0.0, 10.0),
+        ExecutionResult(host="10.0.0.4", status=ExecutionStatus.CANCELLED),
+    ]
+    metrics = RunMetrics.from_results("exec", results, 12.5, 3)
+
+    assert metrics.stats.total == 4
+    assert (metrics.stats.success, metrics.stats.error) == (1, 1)
+    assert (metrics.stats.timeout, metrics.stats.cancelled) == (1, 1)
+    assert metrics.retries == 2
+    assert metrics.host.count == 3
+    assert metrics.connect.count == 2
+    assert metrics.operation.sum == 0.8 + 0.2
+
+    samples = metrics.samples()
+    assert samples['pypssh_hosts_total{command="exec",status="cancelled"}'] == 1
+    assert samples['pypssh_last_run_concurrency_peak{command="exec"}'] == 3
+
+
+def test_ping_and_transfer_results():
+    metrics = RunMetrics.from_results(
+        "ping",
+        [
+            _result(ConnectivityResult, ConnectivityStatus.REACHABLE, 0.1, 0.1),
+            _result(ConnectivityResult, ConnectivityStatus.AUTH_FAILED, 0.1, 0.1),
+        ],
+    )
+    assert (metrics.stats.success, metrics.stats.error) == (1, 1)
+
+    metrics = RunMetrics.from_results(
+        "upload",
+        [
+            _result(
+                TransferResult,
+                ExecutionStatus.SUCCESS,
+                0.1,
+                1.0,
+                transferred_bytes=1024,
+            )
+        ],
+    )
+    assert metrics.transferred_bytes == 1024
+
+
+def test_write_textfile_accumulates_counters(tmp_path):
+    path = tmp_path / "pypssh.prom"
+    results = [_result(ExecutionResult, ExecutionStatus.SUCCESS, 0.2, 1.0)]
+
+    write_textfile(str(path), RunMetrics.from_results("exec", results, 1.0, 1))
+    write_textfile(str(path), RunMetrics.from_results("exec", results * 2, 2.0, 2))
+    write_textfile(str(path), RunMetrics.from_results("ping", results, 0.5, 1))
+
+    samples = read_textfile(str(path))
+    assert samples['pypssh_runs_total{command="exec"}'] == 2
+    assert samples['pypssh_hosts_total{command="exec",status="success"}'] == 3
+    assert samples['pypssh_last_run_hosts{command="exec",status="success"}'] == 2
+    assert samples['pypssh_last_run_duration_seconds{command="exec"}'] == 2
+    assert samples['pypssh_host_duration_seconds_count{command="exec"}'] == 3
+    assert samples['pypssh_runs_total{command="ping"}'] == 1
+
+    text = path.read_text()
+    assert text.count("# TYPE pypssh_runs_total counter") == 1
+    assert "# TYPE pypssh_host_duration_seconds histogram" in text
+    assert sorted(tmp_path.iterdir()) == [path, tmp_path / "pypssh.prom.lock"]
+
+
+def test_write_textfile_concurrent_writers(tmp_path):
+    path = tmp_path / "pypssh.prom"
+    results = [_result(ExecutionResult, ExecutionStatus.SUCCESS, 0.2, 1.0)]
+    metrics = RunMetrics.from_results("exec", results, 1.0, 1)
+
+    def writer():
+        for _ in range(25):
+            write_textfile(str(path), metrics)
+
+    # 每个线程各自打开锁文件，flock 在它们之间互斥（与两个进程相同）
+    threads = [threading.Thread(target=writer) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert read_textfile(str(path))['pypssh_runs_total{command="exec"}'] == 50
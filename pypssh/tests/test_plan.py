@@ -0,0 +1,232 @@
+import asyncio
+import signal
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from pypssh.core.models import ConnectionConfig, ExecutionStatus
+from pypssh.core.plan import Plan, PlanRunner, load_plan
+from pypssh.core.session import HostSession
+
+
+def test_parse_plan():
+    plan = Plan.from_dict(
+        {
+            "name": "deploy",
+            "steps": [
+                {"name": "stop", "exec": "systemctl stop app"},
+                {"upload": {"local": "app.tar.gz", "remote": "/tmp/app.tar.gz"}},
+                {"exec": "tar xzf /tmp/app.tar.gz", "timeout": "120"},
+                {
+                    "download": {"remote": "/var/log/app.log", "local": "logs"},
+                    "ignore_errors": True,
+                },
+            ],
+        }
+    )
+
+    assert plan.name == "deploy"
+    assert [step.action for step in plan.steps] == [
+        "exec",
+        "upload",
+        "exec",
+        "download",
+    ]
+    assert plan.steps[0].name == "stop"
+    assert plan.steps[1].name == "upload app.tar.gz"
+    assert plan.steps[1].preserve is True
+    assert plan.steps[2].name == "tar xzf /tmp/app.tar.gz"
+    assert plan.steps[2].timeout == 120.0
+    assert plan.steps[3].ignore_errors is True
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        None,
+        {"steps": []},
+        {"steps": ["ls"]},
+        {"steps": [{"exec": "ls", "upload": {"local": "a", "remote": "b"}}]},
+        {"steps": [{"exec": ""}]},
+        {"steps": [{"upload": {"local": "a"}}]},
+        {"steps": [{"exec": "ls", "timeout": "soon"}]},
+    ],
+)
+def test_invalid_plan(data):
+    with pytest.raises(ValueError):
+        Plan.from_dict(data)
+
+
+def test_load_plan(tmp_path):
+    plan_file = tmp_path / "plan.yaml"
+    plan_file.write_text("steps:\n  - exec: uptime\n")
+    assert load_plan(str(plan_file)).steps[0].command == "uptime"
+
+    plan_file.write_text("steps: [\n")
+    with pytest.raises(ValueError):
+        load_plan(str(plan_file))
+
+
+class FakeProcess:
+    """命令 hang 不会结束，其余命令立即返回"""
+
+    def __init__(self, command, exit_status):
+        self.command = command
+        self.exit_status = exit_status
+        self.signals = []
+        self.closed = False
+
+    async def wait(self):
+        if self.command == "hang":
+            await asyncio.sleep(10)
+        return SimpleNamespace(
+            stdout=f"{self.command}\n", stderr="", exit_status=self.exit_status
+        )
+
+    def send_signal(self, signal):
+        self.signals.append(signal)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """按 (主机, 命令) 返回预设退出码的连接"""
+
+    def __init__(self, host, failing):
+        self.host = host
+        self.failing = failing
+        self.commands = []
+        self.processes = []
+
+    async def create_process(self, command):
+        self.commands.append(command)
+        exit_status = 1 if (self.host, command) in self.failing else 0
+        self.processes.append(FakeProcess(command, exit_status))
+        return self.processes[-1]
+
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class FakeRunner(PlanRunner):
+    """不建立真实连接，记录每台主机的连接与执行的命令"""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+        self.connections = {}
+
+    def _session(self, config):
+        runner = self
+
+        class Session(HostSession):
+            async def _connect_with_retry(self):
+                self.attempts += 1
+                conn = FakeConnection(config.host, runner.failing)
+                runner.connections.setdefault(config.host, []).append(conn)
+                return conn
+
+        return Session(config, events=self.events)
+
+
+def _plan(*steps):
+    return Plan.from_dict({"steps": list(steps)})
+
+
+def _configs(count):
+    return [ConnectionConfig(host=f"10.0.0.{i}") for i in range(count)]
+
+
+def test_runner_runs_steps_in_order_on_one_connection():
+    plan = _plan({"exec": "stop"}, {"exec": "deploy"}, {"exec": "start"})
+    runner = FakeRunner()
+
+    results = asyncio.run(runner.run_parallel(_configs(3), plan))
+
+    assert all(r.status == ExecutionStatus.SUCCESS for r in results)
+    assert len(runner.connections) == 3
+    for connections in runner.connections.values():
+        assert len(connections) == 1
+        assert connections[0].commands == ["stop", "deploy", "start"]
+    assert [step.stdout for step in results[0].steps] == [
+        "stop\n",
+        "deploy\n",
+        "start\n",
+    ]
+
+
+def test_runner_stops_failed_host_only():
+    plan = _plan(
+        {"exec": "check", "ignore_errors": True},
+        {"exec": "deploy"},
+        {"exec": "start"},
+    )
+    runner = FakeRunner(
+        failing={("10.0.0.0", "check"), ("10.0.0.1", "deploy")},
+    )
+
+    results = {r.host: r for r in asyncio.run(runner.run_parallel(_configs(3), plan))}
+
+    # 忽略错误的步骤失败后继续；其他步骤失败后该主机不再执行后续步骤
+    assert results["10.0.0.0"].status == ExecutionStatus.SUCCESS
+    assert [s.status for s in results["10.0.0.0"].steps][0] == ExecutionStatus.ERROR
+    failed = results["10.0.0.1"]
+    assert failed.status == ExecutionStatus.ERROR
+    assert failed.error_message.startswith("Step 'deploy' failed")
+    assert runner.connections["10.0.0.1"][0].commands == ["check", "deploy"]
+    assert len(results["10.0.0.2"].steps) == 3
+
+
+def test_step_callback_runs_off_event_loop():
+    plan = _plan({"exec": "a"}, {"exec": "b"})
+    calls = []
+
+    def step_callback(config, step_result):
+        calls.append((config.host, step_result.name, threading.current_thread()))
+
+    runner = FakeRunner(step_callback=step_callback)
+    asyncio.run(runner.run_parallel(_configs(2), plan))
+
+    assert sorted((host, name) for host, name, _ in calls) == [
+        ("10.0.0.0", "a"),
+        ("10.0.0.0", "b"),
+        ("10.0.0.1", "a"),
+        ("10.0.0.1", "b"),
+    ]
+    assert all(thread is not threading.main_thread() for _, _, thread in calls)
+
+
+def test_step_timeout_terminates_remote_command():
+    plan = _plan(
+        {"exec": "hang", "timeout": 0.05, "ignore_errors": True}, {"exec": "next"}
+    )
+    runner = FakeRunner()
+
+    [result] = asyncio.run(runner.run_parallel(_configs(1), plan))
+
+    hung, after = result.steps
+    assert hung.status == ExecutionStatus.TIMEOUT
+    assert hung.error_message == "Step timeout after 0.05s"
+    [conn] = runner.connections["10.0.0.0"]
+    assert conn.processes[0].signals == [signal.SIGTERM]
+    assert conn.processes[0].closed
+    # 后续步骤照常在同一连接上执行
+    assert after.status == ExecutionStatus.SUCCESS
+    assert result.status == ExecutionStatus.SUCCESS
+
+
+def test_runner_collects_output(ssh_fleet):
+    plan = _plan({"exec": "echo out; echo err >&2; exit 3", "ignore_errors": True})
+
+    [result] = asyncio.run(PlanRunner().run_parallel(ssh_fleet(), plan))
+
+    [step] = result.steps
+    assert (step.stdout, step.stderr, step.exit_code) == ("out\n", "err\n", 3)
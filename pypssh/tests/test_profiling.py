@@ -0,0 +1,101 @@
+import importlib.util
+import os
+import pstats
+import subprocess
+import sys
+import tracemalloc
+
+import pytest
+
+from pypssh.core.profiling import Profiler, section
+
+
+def _work():
+    return sum(i * i for i in range(20000))
+
+
+def test_section_without_profiler():
+    with section("noop"):
+        assert _work() > 0
+
+    @section("decorated")
+    def decorated():
+        return 1
+
+    assert decorated() == 1
+
+
+def test_cpu_profile(tmp_path):
+    output = tmp_path / "run.pstats"
+    profiler = Profiler("cpu", str(output), top=5)
+    profiler.start()
+
+    @section("select")
+    def select():
+        return _work()
+
+    select()
+    with section("run"):
+        _work()
+    summary = profiler.stop()
+
+    assert [timing.name for timing in profiler.sections] == ["select", "run"]
+    assert all(timing.memory_delta is None for timing in profiler.sections)
+    assert "Top 5 functions by cumulative time" in summary
+    assert "_work" in summary
+
+    stats = pstats.Stats(str(output))
+    assert any(func[2] == "_work" for func in stats.stats)
+
+    # 停止后 section 不再记录
+    with section("after"):
+        pass
+    assert len(profiler.sections) == 2
+
+
+def test_alloc_profile(tmp_path):
+    output = tmp_path / "run.tracemalloc"
+    profiler = Profiler("alloc", str(output), top=3)
+    profiler.start()
+    with section("format"):
+        data = [str(i) * 10 for i in range(10000)]
+    summary = profiler.stop()
+
+    assert profiler.sections[0].memory_delta > 0
+    assert "Peak traced memory" in summary
+    assert not tracemalloc.is_tracing()
+    assert tracemalloc.Snapshot.load(str(output)).statistics("lineno")
+    assert data
+
+
+def test_invalid_and_missing_backend():
+    with pytest.raises(ValueError):
+        Profiler("wall")
+
+    if importlib.util.find_spec("yappi") is None:
+        with pytest.raises(RuntimeError, match="yappi"):
+            Profiler("async").start()
+
+
+def test_cli_profile_includes_subcommand_import(tmp_path):
+    output = tmp_path / "cli.pstats"
+    runner = (
+        "import sys\n"
+        "sys.argv = ['pypssh'] + sys.argv[1:]\n"
+        "from pypssh.cli import main\n"
+        "main()\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", runner, "--profile", "cpu"]
+        + ["--profile-output", str(output), "version", "--simple"],
+        env=dict(os.environ, HOME=str(tmp_path)),
+        capture_output=True,
+        check=True,
+    )
+
+    # 子命令模块在剖析开始后才导入
+    stats = pstats.Stats(str(output))
+    assert any(
+        filename.endswith(os.path.join("commands", "version.py")) and name == "<module>"
+        for filename, _, name in stats.stats
+    )
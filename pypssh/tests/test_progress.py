@@ -0,0 +1,65 @@
+import io
+
+from rich.console import Console
+
+from pypssh.core.models import ExecutionResult, ExecutionStatus
+from pypssh.ui.progress import LatencyHistogram, ProgressDisplay, percentile
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 90) == 3.0
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+
+    values = [v / 100 for v in range(1, 10001)]
+    for value in reversed(values):
+        histogram.observe(value)
+
+    # 固定桶数，分位数的相对误差在 GROWTH 以内
+    assert len(histogram.counts) == LatencyHistogram.BUCKETS
+    for percent in (50, 90, 99):
+        exact = percentile(values, percent)
+        approx = histogram.percentile(percent)
+        assert exact <= approx <= exact * LatencyHistogram.GROWTH
+    assert histogram.percentile(100) == histogram.max == 100.0
+
+
+def _run_display(show_hosts):
+    display = ProgressDisplay(show_hosts=show_hosts)
+    output = io.StringIO()
+    display.console = Console(file=output, width=120)
+    display.start_execution(3, "uptime")
+
+    results = [
+        ExecutionResult(host="10.0.0.1", status=ExecutionStatus.SUCCESS),
+        ExecutionResult(
+            host="10.0.0.2", status=ExecutionStatus.ERROR, error_message="boom"
+        ),
+        ExecutionResult(host="10.0.0.3", status=ExecutionStatus.TIMEOUT),
+    ]
+    for completed, result in enumerate(results, 1):
+        display.update_progress(completed, len(results), result)
+
+    assert display.stats.success == 1
+    assert display.stats.error == 1
+    assert display.stats.timeout == 1
+    assert [r.host for r in display._recent_failures] == ["10.0.0.2", "10.0.0.3"]
+
+    display.finish_execution()
+    return output.getvalue()
+
+
+def test_host_lines_only_when_requested():
+    assert "✅ 10.0.0.1" not in _run_display(show_hosts=False)
+
+    output = _run_display(show_hosts=True)
+    assert "✅ 10.0.0.1" in output
+    assert "❌ 10.0.0.2 (0.00s) - boom" in output
@@ -0,0 +1,159 @@
+import asyncio
+import shlex
+from dataclasses import replace
+
+import pytest
+
+from pypssh.core.models import (
+    ConnectionConfig,
+    ExecutionStatus,
+    TransferMode,
+    TransferResult,
+)
+from pypssh.core import relay as relay_module
+from pypssh.core.relay import RelayTransfer, relay_command, tree_parent
+
+
+class _FakeRelay(RelayTransfer):
+    """记录调度顺序，不建立真实连接"""
+
+    def __init__(self, *args, failing=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing = set(failing)
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+        self.local = self.local_peak = 0
+
+    def _result(self, host, status, relay_host=None):
+        return TransferResult(
+            host=host,
+            mode=TransferMode.UPLOAD,
+            status=status,
+            relay_host=relay_host,
+        )
+
+    async def _upload_single(self, config, *args):
+        self.calls.append((None, config.host))
+        self.local += 1
+        self.local_peak = max(self.local_peak, self.local)
+        await asyncio.sleep(0.01)
+        self.local -= 1
+        return self._result(config.host, ExecutionStatus.SUCCESS)
+
+    async def _relay_single(self, parent, target, remote_path, source, preserve):
+        assert parent.agent_forwarding == self.agent_forwarding
+        self.calls.append((parent.host, target.host))
+        self.active[parent.host] = self.active.get(parent.host, 0) + 1
+        self.peak[parent.host] = max(
+            self.peak.get(parent.host, 0), self.active[parent.host]
+        )
+        await asyncio.sleep(0.01)
+        self.active[parent.host] -= 1
+        status = (
+            ExecutionStatus.ERROR
+            if parent.host in self.failing
+            else ExecutionStatus.SUCCESS
+        )
+        return self._result(target.host, status, parent.host)
+
+
+def _configs(count):
+    return [ConnectionConfig(host=f"10.0.0.{i}") for i in range(count)]
+
+
+def test_tree_parent():
+    assert [tree_parent(i, 2) for i in range(8)] == [None, None, 0, 0, 1, 1, 2, 2]
+    assert tree_parent(3, 4) is None
+    assert tree_parent(4, 4) == 0
+
+
+def test_tree_distribution(tmp_path):
+    local = tmp_path / "image.bin"
+    local.write_bytes(b"x" * 100)
+    transfer = _FakeRelay("tree", 2, failing={"10.0.0.1"})
+
+    results = asyncio.run(transfer.upload_parallel(_configs(7), str(local), "/tmp"))
+
+    by_host = {result.host: result for result in results}
+    assert all(result.status == ExecutionStatus.SUCCESS for result in results)
+    assert by_host["10.0.0.2"].relay_host == "10.0.0.0"
+    assert by_host["10.0.0.6"].relay_host == "10.0.0.2"
+    # 10.0.0.1 中继失败，其子节点回退为直接上传
+    assert ("10.0.0.1", "10.0.0.4") in transfer.calls
+    assert (None, "10.0.0.4") in transfer.calls
+    assert by_host["10.0.0.4"].relay_host is None
+
+
+def test_p2p_distribution(tmp_path):
+    local = tmp_path / "image.bin"
+    local.write_bytes(b"x" * 100)
+    transfer = _FakeRelay("p2p", 2)
+
+    results = asyncio.run(transfer.upload_parallel(_configs(20), str(local), "/tmp"))
+
+    assert len(results) == 20
+    # 本机也是来源之一：每轮直接上传不超过 fanout 台，其余由已完成的主机中继
+    direct = [host for parent, host in transfer.calls if parent is None]
+    assert 2 <= len(direct) < 10
+    assert max(transfer.peak.values()) <= 2
+    assert all(result.status == ExecutionStatus.SUCCESS for result in results)
+
+
+def test_failed_relays_respect_local_fanout(tmp_path):
+    local = tmp_path / "image.bin"
+    local.write_bytes(b"x" * 100)
+    configs = _configs(12)
+    transfer = _FakeRelay("p2p", 2, True, failing={config.host for config in configs})
+
+    results = asyncio.run(transfer.upload_parallel(configs, str(local), "/tmp"))
+
+    assert all(result.status == ExecutionStatus.SUCCESS for result in results)
+    # 中继全部失败后回退的直接上传同样受 fanout 限制
+    assert any(parent is not None for parent, _ in transfer.calls)
+    assert transfer.local_peak <= 2
+
+
+def test_stalled_relay_times_out(tmp_path, monkeypatch, ssh_fleet):
+    local = tmp_path / "image.bin"
+    local.write_bytes(b"x" * 100)
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    configs = [replace(config, command_timeout=0.3) for config in ssh_fleet(2)]
+    # 来源主机上的 scp 卡住
+    monkeypatch.setattr(relay_module, "relay_command", lambda *args: "sleep 10")
+    transfer = RelayTransfer("tree", 1)
+
+    async def run():
+        return await asyncio.wait_for(
+            transfer.upload_parallel(configs, str(local), str(remote)), 5
+        )
+
+    results = asyncio.run(run())
+
+    assert [result.status for result in results] == [ExecutionStatus.SUCCESS] * 2
+    # 中继超时后回退为直接上传
+    assert [result.relay_host for result in results] == [None, None]
+    assert (remote / "image.bin").read_bytes() == b"x" * 100
+
+
+def test_relay_rejects_directory(tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(
+            RelayTransfer("tree").upload_parallel(_configs(2), str(tmp_path), "/tmp")
+        )
+    with pytest.raises(ValueError):
+        RelayTransfer("broadcast")
+
+
+def test_relay_command():
+    target = ConnectionConfig(host="fe80::1", port=2222, username="deploy")
+    command = relay_command("/srv/my app", "pkg.tar", target)
+
+    assert command.startswith("src='/srv/my app'; ")
+    scp = shlex.split(command.split("exec ", 1)[1])
+    assert scp[:4] == ["scp", "-p", "-q", "-P"]
+    assert "2222" in scp and "BatchMode=yes" in scp
+    assert "StrictHostKeyChecking=yes" in scp
+    assert scp[-1] == "deploy@[fe80::1]:/srv/my app"
+    assert "-p" not in relay_command("/srv", "pkg.tar", target, preserve=False)
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+from pypssh.core.reporter import DropPolicy, ProgressReporter
+
+
+def test_block_delivers_all_events_in_order_off_loop_thread():
+    received = []
+    threads = set()
+
+    def callback(completed, total, result):
+        received.append((completed, total, result))
+        threads.add(threading.get_ident())
+
+    async def run():
+        async with ProgressReporter(callback, max_queue=4) as reporter:
+            for i in range(1, 101):
+                await reporter.publish(i, 100, f"host{i}")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert received == [(i, 100, f"host{i}") for i in range(1, 101)]
+    assert loop_thread not in threads
+
+
+def test_slow_callback_does_not_block_publish():
+    received = []
+
+    def callback(completed, total, result):
+        time.sleep(0.05)
+        received.append(completed)
+
+    async def run(policy):
+        reporter = ProgressReporter(callback, max_queue=5, policy=policy)
+        async with reporter:
+            start = time.monotonic()
+            for i in range(1, 201):
+                await reporter.publish(i, 200, None)
+            elapsed = time.monotonic() - start
+        return reporter, elapsed
+
+    reporter, elapsed = asyncio.run(run(DropPolicy.DROP_OLDEST))
+    assert elapsed < 0.05
+    assert reporter.dropped > 0
+    assert len(received) + reporter.dropped == 200
+    # 保留最新的事件
+    assert received[-1] == 200
+
+    received.clear()
+    reporter, _ = asyncio.run(run(DropPolicy.DROP_NEWEST))
+    assert len(received) + reporter.dropped == 200
+    assert received[-1] < 200
+
+
+def test_callback_errors_are_isolated():
+    received = []
+
+    def callback(completed, total, result):
+        if completed == 1:
+            raise RuntimeError("boom")
+        received.append(completed)
+
+    async def run():
+        async with ProgressReporter(callback) as reporter:
+            await reporter.publish(1, 2, None)
+            await reporter.publish(2, 2, None)
+
+    asyncio.run(run())
+    assert received == [2]
+
+
+def test_wrap_and_no_callback():
+    reporter = ProgressReporter(print)
+    assert ProgressReporter.wrap(reporter) is reporter
+
+    async def run():
+        async with ProgressReporter.wrap(None) as empty:
+            await empty.publish(1, 1, None)
+
+    asyncio.run(run())
@@ -0,0 +1,146 @@
+import asyncio
+import os
+
+import asyncssh
+
+from pypssh.core import session as session_module
+from pypssh.core import transfer as transfer_module
+from pypssh.core.models import ConnectionConfig, ExecutionStatus
+from pypssh.core.session import RetryPolicy
+from pypssh.core.transfer import (
+    CHANNEL_WINDOW,
+    FileTransfer,
+    partial_path,
+    resume_offset,
+)
+
+SIZE = 3 * CHANNEL_WINDOW + 12_345
+
+
+def test_resume_offset():
+    assert partial_path("/srv/app.tar") == "/srv/.app.tar.pypssh-part"
+    assert resume_offset(0, SIZE) == 0
+    assert resume_offset(CHANNEL_WINDOW, SIZE) == 0
+    assert resume_offset(SIZE, SIZE) == SIZE - CHANNEL_WINDOW
+    assert resume_offset(SIZE * 2, SIZE) == SIZE - CHANNEL_WINDOW
+
+
+def test_upload_resumes_after_interruption(tmp_path, monkeypatch, ssh_fleet):
+    local = tmp_path / "image.bin"
+    local.write_bytes(os.urandom(SIZE))
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    resumable = transfer_module.sftp_upload_resumable
+    calls = []
+
+    async def flaky(conn, remote_path, source, *args):
+        # 第一次只写入一部分后断开连接
+        calls.append(remote_path)
+        if len(calls) == 1:
+            partial = remote / ".image.bin.pypssh-part"
+            partial.write_bytes(local.read_bytes()[: SIZE // 2])
+            raise asyncssh.ConnectionLost("link dropped")
+        return await resumable(conn, remote_path, source, *args)
+
+    monkeypatch.setattr(transfer_module, "sftp_upload_resumable", flaky)
+    transfer = FileTransfer(
+        resume=True, resume_retry=RetryPolicy(attempts=3, backoff=0)
+    )
+
+    [result] = asyncio.run(
+        transfer.upload_parallel(ssh_fleet(), str(local), str(remote))
+    )
+
+    assert result.status == ExecutionStatus.SUCCESS, result.error_message
+    assert len(calls) == 2
+    assert result.resumed_from == SIZE // 2 - CHANNEL_WINDOW
+    assert result.transferred_bytes == SIZE - result.resumed_from
+    assert (remote / "image.bin").read_bytes() == local.read_bytes()
+    assert not (remote / ".image.bin.pypssh-part").exists()
+
+
+def test_upload_restarts_on_mismatched_partial(tmp_path, ssh_fleet):
+    local = tmp_path / "image.bin"
+    local.write_bytes(os.urandom(SIZE))
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    (remote / ".out.bin.pypssh-part").write_bytes(os.urandom(SIZE + 100))
+
+    [result] = asyncio.run(
+        FileTransfer(resume=True).upload_parallel(
+            ssh_fleet(), str(local), str(remote / "out.bin")
+        )
+    )
+
+    assert result.status == ExecutionStatus.SUCCESS, result.error_message
+    assert (result.resumed_from, result.transferred_bytes) == (0, SIZE)
+    assert (remote / "out.bin").read_bytes() == local.read_bytes()
+
+
+def test_download_resumes_from_partial(tmp_path, ssh_fleet):
+    remote = tmp_path / "remote" / "dump.sql"
+    remote.parent.mkdir()
+    remote.write_bytes(os.urandom(SIZE))
+    os.chmod(remote, 0o640)
+    downloads = tmp_path / "downloads"
+
+    async def download(config):
+        partial = downloads / config.host / ".dump.sql.pypssh-part"
+        partial.parent.mkdir(parents=True)
+        partial.write_bytes(remote.read_bytes()[: SIZE - 1000])
+        return await FileTransfer(resume=True).download_parallel(
+            [config], str(remote), str(downloads)
+        )
+
+    [result] = asyncio.run(download(*ssh_fleet()))
+
+    assert result.status == ExecutionStatus.SUCCESS, result.error_message
+    assert result.resumed_from == SIZE - 1000 - CHANNEL_WINDOW
+    assert result.transferred_bytes == 1000 + CHANNEL_WINDOW
+    local = downloads / "127.0.0.1" / "dump.sql"
+    assert local.read_bytes() == remote.read_bytes()
+    assert local.stat().st_mode & 0o777 == 0o640
+    assert int(local.stat().st_mtime) == int(remote.stat().st_mtime)
+
+
+def test_resume_retries_reconnect_once_per_pass(tmp_path, monkeypatch):
+    local = tmp_path / "image.bin"
+    local.write_bytes(b"x")
+    calls = []
+
+    async def refused(**kwargs):
+        calls.append(kwargs["host"])
+        raise ConnectionRefusedError("refused")
+
+    monkeypatch.setattr(session_module.asyncssh, "connect", refused)
+    transfer = FileTransfer(
+        resume=True,
+        retry=RetryPolicy(attempts=3, backoff=0),
+        resume_retry=RetryPolicy(attempts=2, backoff=0),
+    )
+    [result] = asyncio.run(
+        transfer.upload_parallel(
+            [ConnectionConfig(host="10.0.0.1")], str(local), "/tmp/x"
+        )
+    )
+
+    assert result.status == ExecutionStatus.ERROR
+    # 续传两轮，每轮只连接一次
+    assert len(calls) == 2
+    assert FileTransfer(resume=True).resume_retry.attempts > 1
+
+
+def test_download_recursive_ignores_resume(tmp_path, ssh_fleet):
+    remote = tmp_path / "remote" / "logs"
+    remote.mkdir(parents=True)
+    (remote / "app.log").write_text("ok\n")
+    downloads = tmp_path / "downloads"
+
+    [result] = asyncio.run(
+        FileTransfer(resume=True).download_parallel(
+            ssh_fleet(), str(remote), str(downloads), recursive=True
+        )
+    )
+
+    assert result.status == ExecutionStatus.SUCCESS, result.error_message
+    assert (downloads / "127.0.0.1" / "logs" / "app.log").read_text() == "ok\n"
@@ -0,0 +1,71 @@
+import asyncio
+
+import asyncssh
+
+from pypssh.core.models import (
+    ConnectionConfig,
+    ConnectivityResult,
+    ConnectivityStatus,
+)
+from pypssh.core.session import (
+    ErrorPolicy,
+    FailureKind,
+    RetryPolicy,
+    build_connect_kwargs,
+    classify_error,
+)
+
+PING_ERRORS = ErrorPolicy(
+    timeout_status=ConnectivityStatus.TIMEOUT,
+    timeout_message="Connection timeout after {config.connect_timeout}s",
+    error_status=ConnectivityStatus.UNREACHABLE,
+    error_prefix="Connection error",
+    auth_status=ConnectivityStatus.AUTH_FAILED,
+)
+
+
+def test_build_connect_kwargs():
+    config = ConnectionConfig(
+        host="10.0.0.1", username="root", password="pw", known_hosts="/kh"
+    )
+    kwargs = build_connect_kwargs(config)
+    assert kwargs["password"] == "pw"
+    assert kwargs["known_hosts"] == "/kh"
+    assert "client_keys" not in kwargs
+
+    config = ConnectionConfig(host="10.0.0.1", private_key_path="/id_rsa")
+    assert build_connect_kwargs(config)["client_keys"] == ["/id_rsa"]
+
+
+def test_classify_error():
+    assert classify_error(asyncio.TimeoutError()) == FailureKind.TIMEOUT
+    assert (
+        classify_error(asyncssh.PermissionDenied("denied"))
+        == FailureKind.AUTH_FAILED
+    )
+    assert classify_error(asyncssh.ConnectionLost("lost")) == FailureKind.SSH_ERROR
+    assert classify_error(OSError("refused")) == FailureKind.ERROR
+
+
+def test_error_policy_apply():
+    config = ConnectionConfig(host="10.0.0.1", connect_timeout=3.0)
+    result = ConnectivityResult(host="10.0.0.1", status=None)
+
+    PING_ERRORS.apply(result, asyncio.TimeoutError(), config)
+    assert result.status == ConnectivityStatus.TIMEOUT
+    assert result.error_message == "Connection timeout after 3.0s"
+
+    PING_ERRORS.apply(result, asyncssh.PermissionDenied("denied"), config)
+    assert result.status == ConnectivityStatus.AUTH_FAILED
+
+    PING_ERRORS.apply(result, OSError("refused"), config)
+    assert result.status == ConnectivityStatus.UNREACHABLE
+    assert result.error_message == "Connection error: refused"
+
+
+def test_retry_policy():
+    retry = RetryPolicy(attempts=3, backoff=0.5, max_backoff=1.0)
+    assert retry.should_retry(1, OSError())
+    assert not retry.should_retry(3, OSError())
+    assert not retry.should_retry(1, asyncssh.PermissionDenied("denied"))
+    assert [retry.delay(n) for n in (1, 2, 3)] == [0.5, 1.0, 1.0]
@@ -0,0 +1,64 @@
+import asyncio
+import io
+
+from pypssh.core.models import ConnectionConfig
+from pypssh.ui.stream import LineFramer, StreamPrinter
+
+
+def test_line_framer():
+    framer = LineFramer()
+    assert framer.feed(b"hel") == []
+    assert framer.feed(b"lo\r\nwor") == ["hello"]
+    assert framer.feed(b"ld\n\n") == ["world", ""]
+    assert framer.flush() is None
+
+    assert framer.feed("中文".encode()[:4]) == []
+    assert framer.feed("中文".encode()[4:] + b"\n") == ["中文"]
+
+    framer.feed(b"tail")
+    assert framer.flush() == "tail"
+
+
+def test_line_framer_flushes_long_partial_lines():
+    framer = LineFramer(max_line=4)
+    assert framer.feed(b"abcdefghij") == ["abcd", "efgh"]
+    assert framer.feed(b"k\nxy") == ["ijk"]
+    assert framer.flush() == "xy"
+
+
+def test_stream_printer_frames_and_prefixes():
+    out, err = io.StringIO(), io.StringIO()
+    web = ConnectionConfig(host="10.0.0.1", name="web")
+    db = ConnectionConfig(host="10.0.0.2")
+
+    async def run():
+        async with StreamPrinter(interval=0, out=out, err=err) as printer:
+            await printer.feed(web, "stdout", b"line one\nline ")
+            await printer.feed(db, "stdout", b"db line\n")
+            await printer.feed(web, "stdout", b"two\n")
+            await printer.feed(web, "stderr", b"oops")
+            await printer.feed(web, "stderr", b"")
+            await printer.feed(db, "stdout", b"partial")
+
+    asyncio.run(run())
+
+    assert out.getvalue().splitlines() == [
+        "[web] line one",
+        "[10.0.0.2] db line",
+        "[web] line two",
+        "[10.0.0.2] partial",
+    ]
+    assert err.getvalue() == "[web] oops\n"
+
+
+def test_stream_printer_backpressure():
+    out = io.StringIO()
+    config = ConnectionConfig(host="10.0.0.1")
+
+    async def run():
+        async with StreamPrinter(interval=0, max_queue=2, out=out) as printer:
+            for i in range(100):
+                await printer.feed(config, "stdout", f"{i}\n".encode())
+
+    asyncio.run(run())
+    assert len(out.getvalue().splitlines()) == 100
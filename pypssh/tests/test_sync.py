@@ -0,0 +1,157 @@
+import asyncio
+import os
+
+from pypssh.core.models import ExecutionStatus
+from pypssh.core.sync import (
+    HashCache,
+    ManifestEntry,
+    SyncTransfer,
+    changed_files,
+    parse_remote_manifest,
+)
+from pypssh.core.transfer import FileTransfer
+
+
+def _sync(configs, local, remote, checksum=False, cache=None):
+    return asyncio.run(
+        SyncTransfer().sync_parallel(configs, str(local), str(remote), checksum, cache)
+    )
+
+
+def _tree(root):
+    (root / "static" / "css").mkdir(parents=True)
+    (root / "empty").mkdir()
+    (root / "index.html").write_text("<html></html>")
+    (root / "static" / "css" / "app.css").write_bytes(os.urandom(5000))
+    (root / "static" / "name with\ttab").write_text("x")
+
+
+def test_sync_transfers_only_changes(tmp_path, ssh_fleet):
+    local = tmp_path / "release"
+    _tree(local)
+    remote = tmp_path / "srv" / "app"
+    configs = ssh_fleet()
+
+    [first] = _sync(configs, local, remote)
+    assert first.status == ExecutionStatus.SUCCESS, first.error_message
+    assert first.transferred_bytes == 5014
+    assert (remote / "empty").is_dir()
+    assert (remote / "static" / "name with\ttab").read_text() == "x"
+
+    (local / "index.html").write_text("<html>v2</html>")
+    [second] = _sync(configs, local, remote)
+    assert second.transferred_bytes == 15
+    assert (second.skipped_files, second.skipped_bytes) == (2, 5001)
+    assert (remote / "index.html").read_text() == "<html>v2</html>"
+
+    # 只改 mtime：按摘要比较时不传输，并写入缓存
+    os.utime(local / "static" / "css" / "app.css", (0, 0))
+    cache = HashCache(tmp_path / "cache.json")
+    [third] = _sync(configs, local, remote, True, cache)
+    assert third.status == ExecutionStatus.SUCCESS, third.error_message
+    assert third.transferred_bytes == 0
+    assert len(HashCache(tmp_path / "cache.json")._entries) == 3
+
+
+def test_sync_non_utf8_names(tmp_path, ssh_fleet):
+    local = tmp_path / "release"
+    local.mkdir()
+    (local / "ok.txt").write_text("ok")
+    name = os.fsdecode(b"caf\xe9.txt")
+    (local / name).write_text("latin-1")
+    remote = tmp_path / "srv"
+    configs = ssh_fleet()
+
+    [first] = _sync(configs, local, remote)
+    assert first.status == ExecutionStatus.SUCCESS, first.error_message
+    assert (remote / name).read_text() == "latin-1"
+
+    [second] = _sync(configs, local, remote)
+    assert second.status == ExecutionStatus.SUCCESS, second.error_message
+    assert (second.transferred_bytes, second.skipped_files) == (0, 2)
+
+
+def test_sync_follows_symlinks(tmp_path, ssh_fleet):
+    local = tmp_path / "release"
+    (local / "v1").mkdir(parents=True)
+    (local / "v1" / "app.js").write_text("v1")
+    (local / "current").symlink_to("v1")
+    (local / "app.js").symlink_to("v1/app.js")
+    remote = tmp_path / "srv"
+    (remote / "v1").mkdir(parents=True)
+    configs = ssh_fleet()
+
+    [first] = _sync(configs, local, remote)
+    assert first.status == ExecutionStatus.SUCCESS, first.error_message
+
+    # 远程同样以符号链接指向已同步的文件时不再上传
+    (remote / "app.js").unlink()
+    (remote / "app.js").symlink_to("v1/app.js")
+    for checksum in (False, True):
+        [again] = _sync(configs, local, remote, checksum)
+        assert again.status == ExecutionStatus.SUCCESS, again.error_message
+        assert again.transferred_bytes == 0
+    assert (remote / "app.js").is_symlink()
+
+
+def test_parse_remote_manifest():
+    output = (
+        "d\0lib\0f\0lib/a.so\0004\0001700000000.5\0f\0b\0002\0003.0\0\0"
+        "aa  ./lib/a.so\0bb  ./b\0"
+    )
+    dirs, files = parse_remote_manifest(output)
+    assert dirs == {"lib"}
+    assert files["lib/a.so"] == ManifestEntry(4, 1700000000, "aa")
+    assert files["b"] == ManifestEntry(2, 3, "bb")
+    assert parse_remote_manifest("") == (set(), {})
+
+
+def test_changed_files():
+    local = {
+        "same": ManifestEntry(1, 10),
+        "touched": ManifestEntry(1, 11),
+        "grown": ManifestEntry(2, 10),
+        "new": ManifestEntry(1, 10),
+    }
+    remote = {name: ManifestEntry(1, 10) for name in ("same", "touched", "grown")}
+    assert changed_files(local, remote) == ["touched", "grown", "new"]
+
+    hashed = {"touched": ManifestEntry(1, 11, "aa")}
+    assert changed_files(hashed, {"touched": ManifestEntry(1, 10, "aa")}) == []
+    assert changed_files(hashed, {"touched": ManifestEntry(1, 11, "bb")}) == ["touched"]
+
+
+def test_upload_skips_identical(tmp_path, ssh_fleet):
+    local = tmp_path / "image.bin"
+    local.write_bytes(os.urandom(10_000))
+    remote = tmp_path / "remote"
+    for index in range(3):
+        (remote / f"u{index}").mkdir(parents=True)
+    # u0 已是最新，u1 内容不同（大小相同），u2 没有该文件
+    (remote / "u0" / "image.bin").write_bytes(local.read_bytes())
+    (remote / "u1" / "image.bin").write_bytes(os.urandom(10_000))
+    cache = HashCache(tmp_path / "cache.json")
+
+    async def upload(configs):
+        transfer = FileTransfer()
+        return await asyncio.gather(
+            *(
+                transfer.upload_parallel(
+                    [config],
+                    str(local),
+                    str(remote / config.username),
+                    skip_identical=True,
+                    hash_cache=cache,
+                )
+                for config in configs
+            )
+        )
+
+    results = [result for [result] in asyncio.run(upload(ssh_fleet(3)))]
+
+    assert [result.up_to_date for result in results] == [True, False, False]
+    assert [result.transferred_bytes for result in results] == [0, 10_000, 10_000]
+    assert results[0].skipped_bytes == 10_000
+    for index in range(3):
+        assert (remote / f"u{index}" / "image.bin").read_bytes() == local.read_bytes()
+    assert len(HashCache(tmp_path / "cache.json")._entries) == 1
@@ -0,0 +1,114 @@
+import asyncio
+import os
+
+import asyncssh
+
+from pypssh.core.transfer import (
+    CHANNEL_WINDOW,
+    MAX_AUTO_BLOCK_SIZE,
+    SharedSource,
+    TransferTuning,
+    sftp_upload,
+    tune_for_link,
+)
+
+
+async def _with_conn(config, func):
+    """连接到本地服务器并运行 func(conn)"""
+    async with asyncssh.connect(
+        config.host, config.port, username=config.username, known_hosts=None
+    ) as conn:
+        return await func(conn)
+
+
+def test_tune_for_link():
+    lan = tune_for_link(TransferTuning(auto=True), rtt=0.0002, max_write_len=4 << 20)
+    assert lan.block_size == MAX_AUTO_BLOCK_SIZE
+    assert lan.max_requests == 16
+    assert lan.parallel == 1
+
+    # 1 Gbit/s、100ms：BDP 12.5MB，超过单个通道窗口
+    wan = tune_for_link(TransferTuning(auto=True), rtt=0.1, max_write_len=255 * 1024)
+    assert wan.block_size == 255 * 1024
+    assert wan.parallel == -(-12_500_000 // CHANNEL_WINDOW)
+
+    # 服务器未声明上限时使用安全块大小；显式参数保持不变
+    legacy = tune_for_link(
+        TransferTuning(max_requests=64, parallel=2, auto=True), rtt=0.1
+    )
+    assert legacy.block_size == 16 * 1024
+    assert (legacy.max_requests, legacy.parallel) == (64, 2)
+
+
+def test_tuning_parts():
+    tuning = TransferTuning(parallel=4, min_part_size=1000)
+    assert tuning.parts(500) == 1
+    assert tuning.parts(2500) == 2
+    assert tuning.parts(10_000) == 4
+    assert TransferTuning().parts(10**12) == 1
+    assert TransferTuning().sftp_kwargs() == {"block_size": -1, "max_requests": -1}
+
+
+def test_parallel_upload(tmp_path, ssh_fleet):
+    local = tmp_path / "image.bin"
+    local.write_bytes(os.urandom(300_001))
+    os.chmod(local, 0o640)
+    root = tmp_path / "remote"
+    (root / "dest").mkdir(parents=True)
+
+    tuning = TransferTuning(block_size=4096, parallel=4, min_part_size=50_000)
+
+    async def upload(conn):
+        return [
+            await sftp_upload(conn, str(local), str(root / "dest"), tuning=tuning),
+            await sftp_upload(conn, str(local), str(root / "copy.bin"), tuning=tuning),
+            await sftp_upload(
+                conn,
+                str(local),
+                str(root / "auto.bin"),
+                tuning=TransferTuning(auto=True),
+            ),
+        ]
+
+    sizes = asyncio.run(_with_conn(*ssh_fleet(), upload))
+
+    assert sizes == [300_001] * 3
+    for remote in ("dest/image.bin", "copy.bin", "auto.bin"):
+        assert (root / remote).read_bytes() == local.read_bytes()
+    assert (root / "copy.bin").stat().st_mode & 0o777 == 0o640
+    assert int((root / "copy.bin").stat().st_mtime) == int(local.stat().st_mtime)
+
+
+def test_shared_source_upload(tmp_path, ssh_fleet):
+    tree = tmp_path / "site"
+    (tree / "static" / "css").mkdir(parents=True)
+    (tree / "index.html").write_text("<html></html>")
+    (tree / "static" / "css" / "app.css").write_bytes(os.urandom(70_000))
+    (tree / "empty").write_bytes(b"")
+    os.chmod(tree / "index.html", 0o600)
+    root = tmp_path / "remote"
+    (root / "www").mkdir(parents=True)
+
+    source = SharedSource(str(tree))
+    assert source.total_bytes == 70_013
+    assert [relative for relative, _ in source.dirs] == ["static", "static/css"]
+
+    async def upload(conn):
+        # 两个目标共用同一个源：目录只遍历一次，写入后释放全部映射
+        return await asyncio.gather(
+            sftp_upload(
+                conn, str(tree), str(root / "www"), recursive=True, source=source
+            ),
+            sftp_upload(
+                conn, str(tree), str(root / "copy"), recursive=True, source=source
+            ),
+        )
+
+    sizes = asyncio.run(_with_conn(*ssh_fleet(), upload))
+
+    assert sizes == [70_013, 70_013]
+    assert source._maps == {}
+    for target in (root / "www" / "site", root / "copy"):
+        for relative, _ in source.files:
+            assert (target / relative).read_bytes() == (tree / relative).read_bytes()
+        assert (target / "index.html").stat().st_mode & 0o777 == 0o600
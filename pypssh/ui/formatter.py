@@ -1,19 +1,163 @@
 """输出格式化模块"""
 
+import difflib
+import hashlib
 import json
-import yaml
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 from string import Template
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
 
 from ..core.models import ConnectivityStatus, ExecutionStatus, TransferResult
 
 from ..core.models import ExecutionResult
 from ..core.models import TransferMode
 from ..core.models import ConnectivityResult
+from ..core.models import PlanResult
+from ..selector.ip_selector import compress_hosts
+
+
+@dataclass
+class OutputGroup:
+    """一组输出完全相同的主机"""
+
+    digest: str
+    status: ExecutionStatus
+    exit_code: Optional[int]
+    stdout: str
+    stderr: str
+    error_message: str = ""
+    hosts: List[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.hosts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hosts": compress_hosts(self.hosts),
+            "count": self.count,
+            "status": self.status.value,
+            "exit_code": self.exit_code,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "error_message": self.error_message,
+        }
+
+
+class OutputAggregator:
+    """按输出内容聚合执行结果（类似 dshbak -c）
+
+    结果到达时增量计算 (状态, 退出码, stdout, stderr, 错误信息) 的摘要并归组。
+    每组只保留一份输出，组内结果的 stdout/stderr 指向同一个字符串对象，
+    内存占用随不同输出的数量而非主机数量增长。
+    """
+
+    def __init__(self):
+        self._groups: Dict[str, OutputGroup] = {}
+
+    @staticmethod
+    def _digest(result: ExecutionResult, error_message: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        for part in (
+            result.status.value,
+            str(result.exit_code),
+            result.stdout or "",
+            result.stderr or "",
+            error_message,
+        ):
+            data = part.encode("utf-8", errors="surrogatepass")
+            h.update(len(data).to_bytes(8, "little"))
+            h.update(data)
+        return h.hexdigest()
+
+    def add(self, result: ExecutionResult) -> OutputGroup:
+        """加入一个结果，返回其所属分组"""
+        # 错误信息中的主机地址不参与比较
+        error_message = (result.error_message or "").replace(result.host, "<host>")
+        digest = self._digest(result, error_message)
+
+        group = self._groups.get(digest)
+        if group is None:
+            group = self._groups[digest] = OutputGroup(
+                digest=digest,
+                status=result.status,
+                exit_code=result.exit_code,
+                stdout=result.stdout or "",
+                stderr=result.stderr or "",
+                error_message=error_message,
+            )
+        else:
+            # 共享同一份输出，释放重复内容
+            result.stdout = group.stdout
+            result.stderr = group.stderr
+
+        group.hosts.append(result.host)
+        return group
+
+    def groups(self) -> List[OutputGroup]:
+        """按主机数从多到少返回分组"""
+        return sorted(self._groups.values(), key=lambda g: -g.count)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+
+class OutputDiffer:
+    """基线差异比较：只显示输出与基线不同的主机
+
+    基线为用户提供的文本，或主机数最多的成功输出。分组、基线与一致分组的摘要
+    在构造时计算一次，之后按摘要判断分组是否一致；统一差异按需计算并按摘要缓存。
+    """
+
+    def __init__(self, aggregator: OutputAggregator, baseline: Optional[str] = None):
+        self.aggregator = aggregator
+        self.baseline = baseline
+        self._groups = aggregator.groups()
+        self._diffs: Dict[str, str] = {}
+
+        successful = [g for g in self._groups if g.status == ExecutionStatus.SUCCESS]
+        candidates = successful or self._groups
+        self.majority_group: Optional[OutputGroup] = (
+            candidates[0] if candidates else None
+        )
+        if baseline is not None:
+            self.baseline_text = baseline
+            self.baseline_label = "baseline"
+        else:
+            group = self.majority_group
+            self.baseline_text = group.stdout if group else ""
+            self.baseline_label = (
+                f"majority ({group.count} hosts)" if group else "majority"
+            )
+        self._baseline_lines = self.baseline_text.splitlines(keepends=True)
+        self._matching = {
+            g.digest for g in successful if g.stdout == self.baseline_text
+        }
+
+    def matches(self, group: OutputGroup) -> bool:
+        """分组输出是否与基线一致"""
+        return group.digest in self._matching
+
+    def partition(self):
+        """返回 (与基线一致的分组, 不一致的分组)"""
+        matching, differing = [], []
+        for group in self._groups:
+            (matching if self.matches(group) else differing).append(group)
+        return matching, differing
+
+    def diff(self, group: OutputGroup) -> str:
+        """分组输出相对基线的统一差异（按摘要缓存）"""
+        cached = self._diffs.get(group.digest)
+        if cached is None:
+            cached = self._diffs[group.digest] = "".join(
+                difflib.unified_diff(
+                    self._baseline_lines,
+                    group.stdout.splitlines(keepends=True),
+                    fromfile=self.baseline_label,
+                    tofile=f"{group.count} hosts",
+                )
+            )
+        return cached
 
 
 class OutputFormatter:
@@ -22,7 +166,16 @@ class OutputFormatter:
     def __init__(self, format_type: str = "default", template: str = None):
         self.format_type = format_type.lower()
         self.template = template
-        self.console = Console()
+        self._console = None
+
+    @property
+    def console(self):
+        """Rich控制台（仅在需要美化输出时创建）"""
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return self._console
 
     def format_execution_results(self, results: List[ExecutionResult]) -> str:
         """格式化执行结果"""
@@ -63,36 +216,82 @@ class OutputFormatter:
         else:
             return self._format_default_connectivity(results)
 
+    def format_aggregated_results(self, groups: List[OutputGroup]) -> str:
+        """格式化聚合后的执行结果"""
+        if self.format_type == "none":
+            return ""
+        elif self.format_type == "json":
+            return self._format_json([g.to_dict() for g in groups])
+        elif self.format_type == "yaml":
+            return self._format_yaml([g.to_dict() for g in groups])
+        elif self.format_type == "template" and self.template:
+            return self._format_template([g.to_dict() for g in groups])
+        else:
+            return self._format_default_aggregated(groups)
+
+    def format_diff_results(self, differ: OutputDiffer) -> str:
+        """格式化基线差异结果"""
+        if self.format_type == "none":
+            return ""
+
+        matching, differing = differ.partition()
+        if self.format_type in ["json", "yaml", "template"]:
+            data = []
+            for matches, groups in ((True, matching), (False, differing)):
+                for group in groups:
+                    item = group.to_dict()
+                    item["matches"] = matches
+                    item["diff"] = "" if matches else differ.diff(group)
+                    data.append(item)
+
+            if self.format_type == "json":
+                return self._format_json(data)
+            elif self.format_type == "yaml":
+                return self._format_yaml(data)
+            elif self.template:
+                return self._format_template(data)
+
+        return self._format_default_diff(differ, matching, differing)
+
+    def format_plan_results(self, results: List[PlanResult]) -> str:
+        """格式化执行计划结果"""
+        if self.format_type == "none":
+            return ""
+        elif self.format_type == "json":
+            return self._format_json(results)
+        elif self.format_type == "yaml":
+            return self._format_yaml(results)
+        elif self.format_type == "template" and self.template:
+            return self._format_template(results)
+        else:
+            return self._format_default_plan(results)
+
+    def _to_dict(self, result: Any) -> Any:
+        """将结果对象转换为可序列化的字典（递归处理嵌套结果）"""
+        if isinstance(result, list):
+            return [self._to_dict(item) for item in result]
+        if not hasattr(result, "__dict__"):
+            return result
+
+        item = result.__dict__.copy()
+        for key, value in item.items():
+            # 转换枚举值
+            if hasattr(value, "value"):
+                item[key] = value.value
+            elif isinstance(value, list):
+                item[key] = self._to_dict(value)
+        return item
+
     def _format_json(self, results: List[Any]) -> str:
         """格式化为JSON"""
-        data = []
-        for result in results:
-            if hasattr(result, "__dict__"):
-                item = result.__dict__.copy()
-                # 转换枚举值
-                for key, value in item.items():
-                    if hasattr(value, "value"):
-                        item[key] = value.value
-                data.append(item)
-            else:
-                data.append(result)
-
+        data = [self._to_dict(result) for result in results]
         return json.dumps(data, indent=2, ensure_ascii=False)
 
     def _format_yaml(self, results: List[Any]) -> str:
         """格式化为YAML"""
-        data = []
-        for result in results:
-            if hasattr(result, "__dict__"):
-                item = result.__dict__.copy()
-                # 转换枚举值
-                for key, value in item.items():
-                    if hasattr(value, "value"):
-                        item[key] = value.value
-                data.append(item)
-            else:
-                data.append(result)
+        import yaml
 
+        data = [self._to_dict(result) for result in results]
         return yaml.dump(data, indent=2, allow_unicode=True)
 
     def _format_template(self, results: List[Any]) -> str:
@@ -101,19 +300,16 @@ class OutputFormatter:
         template = Template(self.template)
 
         for result in results:
-            if hasattr(result, "__dict__"):
-                context = result.__dict__.copy()
-                # 转换枚举值
-                for key, value in context.items():
-                    if hasattr(value, "value"):
-                        context[key] = value.value
+            if hasattr(result, "__dict__") or isinstance(result, dict):
+                context = (
+                    dict(result) if isinstance(result, dict) else self._to_dict(result)
+                )
 
                 try:
                     output_lines.append(template.substitute(context))
                 except KeyError as e:
-                    output_lines.append(
-                        f"Template error for {result.host}: Missing key {e}"
-                    )
+                    host = context.get("host", context.get("hosts"))
+                    output_lines.append(f"Template error for {host}: Missing key {e}")
             else:
                 output_lines.append(str(result))
 
@@ -151,6 +347,65 @@ class OutputFormatter:
 
         return "\n".join(output_lines)
 
+    def _format_default_aggregated(self, groups: List[OutputGroup]) -> str:
+        """默认格式化聚合结果：每种输出只打印一次"""
+        output_lines = []
+
+        for group in groups:
+            status_icon = "✅" if group.status == ExecutionStatus.SUCCESS else "❌"
+            output_lines.append("=" * 50)
+            output_lines.append(
+                f"{status_icon} {compress_hosts(group.hosts)} ({group.count} hosts)"
+            )
+            output_lines.append("-" * 50)
+
+            if group.stdout:
+                output_lines.append(group.stdout.rstrip())
+
+            if group.stderr:
+                output_lines.append("STDERR:")
+                output_lines.append(group.stderr.rstrip())
+
+            if group.error_message:
+                output_lines.append(f"ERROR: {group.error_message}")
+
+            if group.exit_code is not None:
+                output_lines.append(f"EXIT CODE: {group.exit_code}")
+
+        return "\n".join(output_lines)
+
+    def _format_default_diff(
+        self,
+        differ: OutputDiffer,
+        matching: List[OutputGroup],
+        differing: List[OutputGroup],
+    ) -> str:
+        """默认格式化基线差异：只打印与基线不同的主机"""
+        matched_hosts = sum(group.count for group in matching)
+        output_lines = [f"✅ {matched_hosts} hosts match {differ.baseline_label}"]
+
+        for group in differing:
+            output_lines.append("=" * 50)
+            output_lines.append(
+                f"❌ {compress_hosts(group.hosts)} ({group.count} hosts)"
+            )
+            output_lines.append("-" * 50)
+
+            if group.status != ExecutionStatus.SUCCESS:
+                output_lines.append(f"STATUS: {group.status.value}")
+                if group.exit_code is not None:
+                    output_lines.append(f"EXIT CODE: {group.exit_code}")
+                if group.error_message:
+                    output_lines.append(f"ERROR: {group.error_message}")
+                if group.stderr:
+                    output_lines.append(f"STDERR: {group.stderr.rstrip()}")
+
+            # 无输出的失败主机不显示差异
+            if group.stdout or group.status == ExecutionStatus.SUCCESS:
+                output_lines.append(differ.diff(group).rstrip("\n"))
+
+        return "\n".join(output_lines)
+
     def _format_default_transfer(self, results: List[TransferResult]) -> str:
         """默认格式化传输结果"""
         output_lines = []
@@ -163,10 +418,21 @@ class OutputFormatter:
                 f"{status_icon} {mode_icon} {result.host} "
                 f"({result.transfer_time:.2f}s, {result.transferred_bytes} bytes)"
             )
+            if result.up_to_date:
+                header += " up-to-date"
             output_lines.append(header)
 
             output_lines.append(f"  Local:  {result.local_path}")
             output_lines.append(f"  Remote: {result.remote_path}")
+            if result.relay_host:
+                output_lines.append(f"  Relay:  {result.relay_host}")
+            if result.resumed_from:
+                output_lines.append(f"  Resumed: from byte {result.resumed_from}")
+            if result.skipped_files:
+                output_lines.append(
+                    f"  Skipped: {result.skipped_files} unchanged files "
+                    f"({result.skipped_bytes} bytes)"
+                )
 
             if result.error_message:
                 output_lines.append(f"  ERROR: {result.error_message}")
@@ -204,6 +470,37 @@ class OutputFormatter:
 
         return "\n".join(output_lines)
 
+    def _format_default_plan(self, results: List[PlanResult]) -> str:
+        """默认格式化执行计划结果"""
+        output_lines = []
+
+        for result in results:
+            status_icon = "✅" if result.status == ExecutionStatus.SUCCESS else "❌"
+            output_lines.append(
+                f"\n{status_icon} {result.host} "
+                f"({len(result.steps)}/{result.total_steps} steps, "
+                f"{result.execution_time:.2f}s)"
+            )
+
+            for step in result.steps:
+                step_icon = "✅" if step.status == ExecutionStatus.SUCCESS else "❌"
+                output_lines.append(
+                    f"  {step_icon} [{step.action}] {step.name} ({step.elapsed:.2f}s)"
+                )
+                if step.stdout:
+                    output_lines.append(step.stdout.rstrip())
+                if step.stderr:
+                    output_lines.append(f"STDERR: {step.stderr.rstrip()}")
+                if step.error_message:
+                    output_lines.append(f"  ERROR: {step.error_message}")
+
+            if result.error_message:
+                output_lines.append(f"ERROR: {result.error_message}")
+
+            output_lines.append("-" * 50)
+
+        return "\n".join(output_lines)
+
     def print_results(self, results: List[Any], title: str = None):
         """使用Rich打印格式化结果"""
         if self.format_type in ["json", "yaml", "template"]:
@@ -214,7 +511,11 @@ class OutputFormatter:
                 else (
                     self.format_transfer_results(results)
                     if isinstance(results[0], TransferResult)
-                    else self.format_connectivity_results(results)
+                    else (
+                        self.format_plan_results(results)
+                        if isinstance(results[0], PlanResult)
+                        else self.format_connectivity_results(results)
+                    )
                 )
             )
             print(formatted)
@@ -226,11 +527,15 @@ class OutputFormatter:
                 self._print_transfer_results_rich(results, title)
             elif isinstance(results[0], ConnectivityResult):
                 self._print_connectivity_results_rich(results, title)
+            elif isinstance(results[0], PlanResult):
+                self._print_plan_results_rich(results, title)
 
     def _print_execution_results_rich(
         self, results: List[ExecutionResult], title: str = None
     ):
         """使用Rich打印执行结果"""
+        from rich.panel import Panel
+
         for result in results:
             # 确定面板颜色
             if result.status == ExecutionStatus.SUCCESS:
@@ -242,6 +547,9 @@ class OutputFormatter:
             elif result.status == ExecutionStatus.TIMEOUT:
                 border_style = "yellow"
                 status_text = "[yellow]⏰ TIMEOUT[/yellow]"
+            elif result.status == ExecutionStatus.CANCELLED:
+                border_style = "dim"
+                status_text = "[dim]⏹ CANCELLED[/dim]"
             else:
                 border_style = "white"
                 status_text = "[white]❓ UNKNOWN[/white]"
@@ -280,6 +588,8 @@ class OutputFormatter:
         self, results: List[TransferResult], title: str = None
     ):
         """使用Rich打印传输结果"""
+        from rich.table import Table
+
         table = Table(title=title or "Transfer Results")
         table.add_column("Host", style="cyan")
         table.add_column("Mode", style="blue")
@@ -290,10 +600,14 @@ class OutputFormatter:
 
         for result in results:
             status_text = "✅" if result.status == ExecutionStatus.SUCCESS else "❌"
+            if result.up_to_date:
+                status_text += " up-to-date"
             mode_text = (
                 "⬆️ Upload" if result.mode == TransferMode.UPLOAD else "⬇️ Download"
             )
             size_text = f"{result.transferred_bytes:,} bytes"
+            if result.skipped_bytes:
+                size_text += f" ({result.skipped_bytes:,} skipped)"
             time_text = f"{result.transfer_time:.2f}s"
             error_text = (
                 result.error_message[:50] + "..."
@@ -311,6 +625,8 @@ class OutputFormatter:
         self, results: List[ConnectivityResult], title: str = None
     ):
         """使用Rich打印连通性测试结果"""
+        from rich.table import Table
+
         table = Table(title=title or "Connectivity Test Results")
         table.add_column("Host", style="cyan")
         table.add_column("Port", style="blue")
@@ -347,3 +663,40 @@ class OutputFormatter:
             )
 
         self.console.print(table)
+
+    def _print_plan_results_rich(self, results: List[PlanResult], title: str = None):
+        """使用Rich打印执行计划结果"""
+        from rich.table import Table
+
+        table = Table(title=title or "Plan Results")
+        table.add_column("Host", style="cyan")
+        table.add_column("Status", style="white")
+        table.add_column("Steps", style="blue")
+        table.add_column("Connect", style="green")
+        table.add_column("Time", style="yellow")
+        table.add_column("Error", style="red")
+
+        for result in results:
+            if result.status == ExecutionStatus.SUCCESS:
+                status_text = "[green]✅ SUCCESS[/green]"
+            elif result.status == ExecutionStatus.TIMEOUT:
+                status_text = "[yellow]⏰ TIMEOUT[/yellow]"
+            else:
+                status_text = "[red]❌ ERROR[/red]"
+
+            error_text = (
+                result.error_message[:50] + "..."
+                if len(result.error_message) > 50
+                else result.error_message
+            )
+
+            table.add_row(
+                result.host,
+                status_text,
+                f"{len(result.steps)}/{result.total_steps}",
+                f"{result.connect_time:.2f}s",
+                f"{result.execution_time:.2f}s",
+                error_text,
+            )
+
+        self.console.print(table)
@@ -0,0 +1,259 @@
+"""Prometheus 文本格式指标导出
+
+将一次运行的统计写入 node_exporter textfile collector 读取的 ``.prom`` 文件。
+计数器与直方图在多次运行之间累加（读取已有文件中的值后相加），便于用
+``rate()``/``histogram_quantile()`` 观察长期趋势；``pypssh_last_run_*`` 仪表
+只反映最近一次运行。不同命令通过 command 标签区分，可共用同一个文件。
+文件先写入临时文件再原子替换，采集方不会读到写了一半的内容；读取-合并-替换
+期间持有旁路锁文件（``<文件>.lock``）上的排他锁，并发运行（如 cron）不会丢失计数。
+"""
+
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pypssh.core.models import BaseResult
+from pypssh.ui.progress import ProgressStats
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HOST_STATUSES = ("success", "error", "timeout", "cancelled")
+
+# 指标族：名称 -> (类型, 说明)
+FAMILIES: Dict[str, Tuple[str, str]] = {
+    "pypssh_runs_total": ("counter", "Number of pypssh runs."),
+    "pypssh_hosts_total": ("counter", "Hosts processed, by result status."),
+    "pypssh_connect_retries_total": ("counter", "Connection attempts retried."),
+    "pypssh_transferred_bytes_total": ("counter", "Bytes transferred over SFTP."),
+    "pypssh_connect_duration_seconds": (
+        "histogram",
+        "Time to establish a session: TCP connect, SSH handshake and authentication.",
+    ),
+    "pypssh_operation_duration_seconds": (
+        "histogram",
+        "Time spent on the operation (command, probe or transfer) after connecting.",
+    ),
+    "pypssh_host_duration_seconds": (
+        "histogram",
+        "End-to-end time per host, including connection setup.",
+    ),
+    "pypssh_last_run_hosts": ("gauge", "Hosts in the last run, by result status."),
+    "pypssh_last_run_duration_seconds": ("gauge", "Wall time of the last run."),
+    "pypssh_last_run_concurrency_peak": (
+        "gauge",
+        "Highest number of hosts in flight during the last run.",
+    ),
+    "pypssh_last_run_timestamp_seconds": (
+        "gauge",
+        "Unix time at which the last run finished.",
+    ),
+}
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)")
+
+
+@dataclass
+class Histogram:
+    """累计直方图"""
+
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    counts: List[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def samples(self, name: str, labels: str) -> Iterable[Tuple[str, float]]:
+        prefix = labels[:-1] + "," if labels else "{"
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{prefix}le="{_format_value(bound)}"}}', count
+        yield f'{name}_bucket{prefix}le="+Inf"}}', self.count
+        yield f"{name}_sum{labels}", self.sum
+        yield f"{name}_count{labels}", self.count
+
+
+class RunMetrics:
+    """一次运行（exec/ping/file）的统计
+
+    主机状态计数沿用 ProgressStats 的分类，耗时取自结果模型：
+    connect_time 为建立会话耗时，start_time 到 end_time 为主机总耗时。
+    """
+
+    def __init__(self, command: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.command = command
+        self.stats = ProgressStats()
+        self.connect = Histogram(buckets)
+        self.operation = Histogram(buckets)
+        self.host = Histogram(buckets)
+        self.retries = 0
+        self.transferred_bytes = 0
+        self.duration = 0.0
+        self.peak_concurrency = 0
+
+    @classmethod
+    def from_results(
+        cls,
+        command: str,
+        results: Iterable[BaseResult],
+        duration: float = 0.0,
+        peak_concurrency: int = 0,
+    ) -> "RunMetrics":
+        metrics = cls(command)
+        for result in results:
+            metrics.add(result)
+        metrics.duration = duration
+        metrics.peak_concurrency = peak_concurrency
+        return metrics
+
+    def add(self, result: BaseResult):
+        self.stats.total += 1
+        self.stats.completed += 1
+        self.stats.record(result.status)
+
+        self.retries += max(result.connect_attempts - 1, 0)
+        self.transferred_bytes += getattr(result, "transferred_bytes", 0)
+
+        # 未连接的主机（如未启动即取消）不计入耗时
+        if result.connect_attempts == 0 or result.end_time is None:
+            return
+        elapsed = result.end_time - result.start_time
+        self.host.observe(elapsed)
+        if result.connect_time:
+            self.connect.observe(result.connect_time)
+            self.operation.observe(max(elapsed - result.connect_time, 0.0))
+
+    def samples(self) -> Dict[str, float]:
+        """全部样本：序列（名称+标签）-> 值"""
+        labels = f'{{command="{self.command}"}}'
+        samples: Dict[str, float] = {
+            f"pypssh_runs_total{labels}": 1,
+            f"pypssh_connect_retries_total{labels}": self.retries,
+            f"pypssh_transferred_bytes_total{labels}": self.transferred_bytes,
+        }
+        for status in HOST_STATUSES:
+            status_labels = f'{{command="{self.command}",status="{status}"}}'
+            count = getattr(self.stats, status)
+            samples[f"pypssh_hosts_total{status_labels}"] = count
+            samples[f"pypssh_last_run_hosts{status_labels}"] = count
+
+        for name, histogram in (
+            ("pypssh_connect_duration_seconds", self.connect),
+            ("pypssh_operation_duration_seconds", self.operation),
+            ("pypssh_host_duration_seconds", self.host),
+        ):
+            samples.update(histogram.samples(name, labels))
+
+        samples[f"pypssh_last_run_duration_seconds{labels}"] = self.duration
+        samples[f"pypssh_last_run_concurrency_peak{labels}"] = self.peak_concurrency
+        samples[f"pypssh_last_run_timestamp_seconds{labels}"] = round(time.time(), 3)
+        return samples
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _family(series: str) -> Optional[str]:
+    """序列所属的指标族"""
+    name = series.split("{", 1)[0]
+    if name in FAMILIES:
+        return name
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in FAMILIES:
+            return name[: -len(suffix)]
+    return None
+
+
+def read_textfile(path: str) -> Dict[str, float]:
+    """读取已有的指标文件（不存在时返回空）"""
+    samples: Dict[str, float] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                match = _SAMPLE_RE.match(line)
+                if line.startswith("#") or not match:
+                    continue
+                series = match.group(1) + (match.group(2) or "")
+                try:
+                    samples[series] = float(match.group(3))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return samples
+
+
+def merge_samples(
+    previous: Dict[str, float], current: Dict[str, float]
+) -> Dict[str, float]:
+    """计数器与直方图累加，仪表取最新值"""
+    merged = {series: value for series, value in previous.items() if _family(series)}
+    for series, value in current.items():
+        kind = FAMILIES[_family(series)][0]
+        if kind == "gauge":
+            merged[series] = value
+        else:
+            merged[series] = merged.get(series, 0) + value
+    return merged
+
+
+def render_textfile(samples: Dict[str, float]) -> str:
+    """按指标族输出 Prometheus 文本格式"""
+    grouped: Dict[str, List[Tuple[str, float]]] = {}
+    for series, value in samples.items():
+        grouped.setdefault(_family(series), []).append((series, value))
+
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        if family not in grouped:
+            continue
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        for series, value in grouped[family]:
+            lines.append(f"{series} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def _file_lock(path: str):
+    """持有旁路锁文件上的排他锁（无 fcntl 的平台不加锁）"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def write_textfile(path: str, metrics: RunMetrics):
+    """将运行统计合并写入指标文件（加锁，原子替换）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with _file_lock(path):
+        samples = merge_samples(read_textfile(path), metrics.samples())
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pypssh-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(render_textfile(samples))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
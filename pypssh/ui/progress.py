@@ -1,15 +1,10 @@
-import sys
+import math
+import threading
 import time
-from typing import List, Optional
-from rich.console import Console
-from rich.progress import (
-    Progress,
-    TaskID,
-    SpinnerColumn,
-    BarColumn,
-    TextColumn,
-    TimeElapsedColumn,
-)
+from collections import deque
+from enum import Enum
+from typing import Deque, List, Optional
+from rich.console import Console, Group
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
@@ -28,23 +23,110 @@ class ProgressStats:
     success: int = 0
     error: int = 0
     timeout: int = 0
+    cancelled: int = 0
     running: int = 0
 
+    def record(self, status: Enum):
+        """按结果状态计数（连通性结果的 reachable 视为成功）"""
+        value = status.value
+        if value in ("success", "reachable"):
+            self.success += 1
+        elif value == "timeout":
+            self.timeout += 1
+        elif value == "cancelled":
+            self.cancelled += 1
+        elif value not in ("pending", "running"):
+            self.error += 1
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """有序列表的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class LatencyHistogram:
+    """对数分桶的耗时直方图
+
+    桶数固定，记录与计算分位数的开销与样本数无关；分位数取所在桶的上界
+    （不超过最大值），相对误差不超过 GROWTH - 1。
+    """
+
+    GROWTH = 1.04
+    MIN = 0.001
+    BUCKETS = 512
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.max = max(self.max, value)
+        index = 0
+        if value > self.MIN:
+            index = math.ceil(math.log(value / self.MIN, self.GROWTH))
+        self.counts[min(index, self.BUCKETS - 1)] += 1
+
+    def percentile(self, percent: float) -> float:
+        """近似百分位数（最近秩法）"""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(percent / 100 * self.count), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.MIN * self.GROWTH**index, self.max)
+        return self.max
 
-class ProgressDisplay:
-    """友好的进度显示界面"""
 
-    def __init__(self, show_details: bool = True):
+class ProgressDisplay:
+    """友好的进度显示界面
+
+    使用 rich Live 以固定频率刷新汇总面板（计数、吞吐、ETA、耗时分位数、
+    最近失败），单个结果只更新内存中的统计（耗时记入固定桶数的直方图），
+    界面开销与主机数量无关；结束时的汇总按完整结果计算精确分位数。
+    逐台主机结果行仅在 show_hosts 时输出，并按刷新间隔批量写出。
+    """
+
+    RECENT_FAILURES = 5
+    MAX_FAILED_DETAILS = 20
+
+    def __init__(
+        self,
+        show_details: bool = True,
+        show_hosts: bool = False,
+        refresh_per_second: float = 10,
+    ):
         self.console = Console()
         self.show_details = show_details
+        self.show_hosts = show_hosts
+        self.refresh_interval = 1.0 / refresh_per_second
+        self.refresh_per_second = refresh_per_second
         self.stats = ProgressStats()
         self.results: List[ExecutionResult] = []
         self.start_time = time.time()
+        self.command = ""
+
+        self._latencies = LatencyHistogram()
+        self._recent_failures: Deque[ExecutionResult] = deque(
+            maxlen=self.RECENT_FAILURES
+        )
+        self._pending_lines: List[str] = []
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        self._live: Optional[Live] = None
 
     def start_execution(self, total_hosts: int, command: str):
         """开始执行显示"""
         self.stats.total = total_hosts
+        self.stats.running = total_hosts
         self.start_time = time.time()
+        self.command = command
 
         self.console.print(
             Panel(
@@ -55,69 +137,114 @@ class ProgressDisplay:
             )
         )
 
-    def update_progress(self, completed: int, total: int, result: ExecutionResult):
-        """更新进度"""
-        self.stats.completed = completed
-        self.results.append(result)
+        # 刷新线程按固定频率调用 _render
+        self._live = Live(
+            get_renderable=self._render,
+            console=self.console,
+            refresh_per_second=self.refresh_per_second,
+            transient=True,
+        )
+        self._live.start()
 
-        # 更新统计
-        if result.status == ExecutionStatus.SUCCESS:
-            self.stats.success += 1
-        elif result.status == ExecutionStatus.ERROR:
-            self.stats.error += 1
-        elif result.status == ExecutionStatus.TIMEOUT:
-            self.stats.timeout += 1
+    def update_progress(self, completed: int, total: int, result: ExecutionResult):
+        """更新进度（只更新统计，不直接写终端）"""
+        with self._lock:
+            self.stats.completed = completed
+            self.stats.running = total - completed
+            self.results.append(result)
+            self._latencies.observe(getattr(result, "execution_time", 0.0))
 
-        self.stats.running = total - completed
+            self.stats.record(result.status)
 
-        # 显示当前结果
-        self._display_result(result)
+            if result.status != ExecutionStatus.SUCCESS:
+                self._recent_failures.append(result)
 
-        # 显示进度条
-        progress_percent = (completed / total) * 100
-        elapsed = time.time() - self.start_time
+            if self.show_hosts:
+                self._pending_lines.append(self._format_result_line(result))
 
-        self.console.print(
-            f"Progress: [{progress_percent:5.1f}%] "
-            f"({completed}/{total}) "
-            f"✓{self.stats.success} "
-            f"✗{self.stats.error} "
-            f"⏱{self.stats.timeout} "
-            f"⚡{elapsed:.1f}s"
-        )
+        if self.show_hosts:
+            now = time.monotonic()
+            if now - self._last_flush >= self.refresh_interval:
+                self._flush_lines()
+                self._last_flush = now
 
-    def _display_result(self, result: ExecutionResult):
-        """显示单个执行结果"""
+    def _format_result_line(self, result: ExecutionResult) -> str:
+        """单个执行结果行"""
         status_icons = {
             ExecutionStatus.SUCCESS: "✅",
             ExecutionStatus.ERROR: "❌",
             ExecutionStatus.TIMEOUT: "⏰",
         }
-
         icon = status_icons.get(result.status, "❓")
+        line = f"{icon} {result.host} ({getattr(result, 'execution_time', 0.0):.2f}s)"
 
-        if result.status == ExecutionStatus.SUCCESS:
-            color = "green"
-        elif result.status == ExecutionStatus.ERROR:
-            color = "red"
-        elif result.status == ExecutionStatus.TIMEOUT:
-            color = "yellow"
-        else:
-            color = "white"
+        if self.show_details and result.status != ExecutionStatus.SUCCESS:
+            if result.error_message:
+                line += f" - {result.error_message}"
+        return line
+
+    def _flush_lines(self):
+        """批量写出积压的主机结果行"""
+        with self._lock:
+            lines, self._pending_lines = self._pending_lines, []
+        if lines:
+            # 作为纯文本写出，避免逐行解析markup
+            self.console.print(Text("\n".join(lines)), highlight=False)
+
+    def _render(self):
+        """汇总面板"""
+        with self._lock:
+            stats = ProgressStats(**self.stats.__dict__)
+            p50, p90, p99 = (self._latencies.percentile(p) for p in (50, 90, 99))
+            slowest = self._latencies.max
+            failures = list(self._recent_failures)
 
-        self.console.print(
-            f"{icon} [{color}]{result.host}[/{color}] "
-            f"({result.execution_time:.2f}s)"
+        elapsed = time.time() - self.start_time
+        throughput = stats.completed / elapsed if elapsed > 0 else 0.0
+        remaining = stats.total - stats.completed
+        eta = f"{remaining / throughput:.1f}s" if throughput > 0 else "-"
+        progress_percent = (stats.completed / stats.total * 100) if stats.total else 0
+
+        summary = Text.assemble(
+            (f"[{progress_percent:5.1f}%] ", "bold"),
+            f"{stats.completed}/{stats.total}  ",
+            (f"✓{stats.success} ", "green"),
+            (f"✗{stats.error} ", "red"),
+            (f"⏱{stats.timeout} ", "yellow"),
+            f"running {stats.running}  ",
+            f"{throughput:.1f} hosts/s  ",
+            f"elapsed {elapsed:.1f}s  ETA {eta}",
+        )
+        latency = Text(
+            f"latency p50 {p50:.2f}s  p90 {p90:.2f}s  p99 {p99:.2f}s  "
+            f"max {slowest:.2f}s",
+            style="cyan",
         )
 
-        if self.show_details and result.status != ExecutionStatus.SUCCESS:
-            if result.stderr:
-                self.console.print(f"   [red]Error: {result.stderr.strip()}[/red]")
-            if result.error_message:
-                self.console.print(f"   [red]Message: {result.error_message}[/red]")
+        renderables = [summary, latency]
+        if failures:
+            renderables.append(Text("Recent failures:", style="bold red"))
+            for result in failures:
+                message = result.error_message or result.status.value
+                renderables.append(
+                    Text(f"  {result.host}: {message[:80]}", style="red")
+                )
+
+        return Panel(Group(*renderables), title="Progress", border_style="blue")
+
+    def finish_execution(self, results: Optional[List[ExecutionResult]] = None):
+        """完成执行显示
+
+        传入完整结果时按其重新统计，进度事件被丢弃时汇总仍然准确。
+        """
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+        self._flush_lines()
+
+        if results is not None:
+            self._recount(results)
 
-    def finish_execution(self):
-        """完成执行显示"""
         elapsed = time.time() - self.start_time
 
         # 创建汇总表格
@@ -126,8 +253,8 @@ class ProgressDisplay:
         table.add_column("Count", style="white")
         table.add_column("Percentage", style="white")
 
-        total = self.stats.total
-        table.add_row("Total Hosts", str(total), "100.0%")
+        total = self.stats.total or 1
+        table.add_row("Total Hosts", str(self.stats.total), "100.0%")
         table.add_row(
             "✅ Success",
             str(self.stats.success),
@@ -141,6 +268,13 @@ class ProgressDisplay:
             str(self.stats.timeout),
             f"{(self.stats.timeout/total)*100:.1f}%",
         )
+        latencies = sorted(getattr(r, "execution_time", 0.0) for r in self.results)
+        table.add_row(
+            "⏳ Latency p50/p90/p99",
+            f"{percentile(latencies, 50):.2f}s / {percentile(latencies, 90):.2f}s"
+            f" / {percentile(latencies, 99):.2f}s",
+            "-",
+        )
         table.add_row("⚡ Total Time", f"{elapsed:.2f}s", "-")
 
         self.console.print(table)
@@ -149,8 +283,19 @@ class ProgressDisplay:
         if self.stats.error > 0 or self.stats.timeout > 0:
             self._show_failed_hosts()
 
+    def _recount(self, results: List[ExecutionResult]):
+        """按完整结果重新计算统计"""
+        with self._lock:
+            self.results = list(results)
+            self.stats.completed = len(results)
+            self.stats.running = 0
+            self.stats.success = self.stats.error = 0
+            self.stats.timeout = self.stats.cancelled = 0
+            for result in results:
+                self.stats.record(result.status)
+
     def _show_failed_hosts(self):
-        """显示失败主机的详细信息"""
+        """显示失败主机的详细信息（最多 MAX_FAILED_DETAILS 台）"""
         failed_results = [
             r
             for r in self.results
@@ -162,7 +307,7 @@ class ProgressDisplay:
 
         self.console.print("\n[bold red]Failed Hosts Details:[/bold red]")
 
-        for result in failed_results:
+        for result in failed_results[: self.MAX_FAILED_DETAILS]:
             self.console.print(
                 Panel(
                     f"[red]Host: {result.host}[/red]\n"
@@ -173,6 +318,10 @@ class ProgressDisplay:
                 )
             )
 
+        hidden = len(failed_results) - self.MAX_FAILED_DETAILS
+        if hidden > 0:
+            self.console.print(f"[red]... and {hidden} more failed hosts[/red]")
+
 
 def create_progress_callback(display: ProgressDisplay):
     """创建进度回调函数"""
@@ -0,0 +1,151 @@
+"""流式输出模块
+
+多主机实时输出汇聚：按主机/流切分完整行并加前缀，经有界队列交给单个写出任务，
+写出任务按固定间隔批量写入终端。队列满时读取方等待（反压传递到SSH流控），
+避免大量主机（如对500台主机 `tail -f`）时逐块写终端占满CPU或行被截断交错。
+"""
+
+import asyncio
+import sys
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from pypssh.core.models import ConnectionConfig
+
+
+class LineFramer:
+    """将字节流切分为完整的行，保留末尾不完整的部分
+
+    不完整的部分达到 max_line 字节时按段输出，无换行的输出不会无限累积。
+    """
+
+    def __init__(self, encoding: str = "utf-8", max_line: int = 65536):
+        self.encoding = encoding
+        self.max_line = max_line
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> List[str]:
+        """输入数据，返回其中的完整行（不含换行符）"""
+        self._buffer += data
+        lines = []
+        if b"\n" in data:
+            *complete, self._buffer = self._buffer.split(b"\n")
+            lines = [self._decode(line) for line in complete]
+
+        while len(self._buffer) >= self.max_line:
+            lines.append(self._decode(self._buffer[: self.max_line]))
+            self._buffer = self._buffer[self.max_line :]
+        return lines
+
+    def flush(self) -> Optional[str]:
+        """返回剩余的不完整行"""
+        if not self._buffer:
+            return None
+        line, self._buffer = self._buffer, b""
+        return self._decode(line)
+
+    def _decode(self, line: bytes) -> str:
+        # PTY输出使用 \r\n 换行
+        return line.rstrip(b"\r").decode(self.encoding, errors="replace")
+
+
+class StreamPrinter:
+    """带行切分、前缀与限速批量写出的多主机输出汇聚器
+
+    用作 SSHExecutor 的 output_callback：``await printer.feed(config, stream, data)``，
+    data 为空表示该流结束。
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        max_queue: int = 10000,
+        max_batch: int = 5000,
+        out: Optional[TextIO] = None,
+        err: Optional[TextIO] = None,
+    ):
+        self.interval = interval
+        self.max_batch = max_batch
+        # 未指定时在写出时取 sys.stdout/sys.stderr（可能被 rich Live 重定向）
+        self.out = out
+        self.err = err
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._framers: Dict[Tuple[str, str], LineFramer] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动写出任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def feed(self, config: ConnectionConfig, stream: str, data: bytes):
+        """输入某主机某个流（stdout/stderr）的数据"""
+        prefix = config.name or config.host
+        key = (prefix, stream)
+        framer = self._framers.get(key)
+        if framer is None:
+            framer = self._framers[key] = LineFramer()
+
+        if data:
+            lines = framer.feed(data)
+        else:
+            # 流结束，输出剩余的不完整行
+            self._framers.pop(key, None)
+            line = framer.flush()
+            lines = [line] if line is not None else []
+
+        for line in lines:
+            await self._queue.put((stream, f"[{prefix}] {line}\n"))
+
+    async def close(self):
+        """输出剩余内容并停止写出任务"""
+        for (prefix, stream), framer in list(self._framers.items()):
+            line = framer.flush()
+            if line is not None:
+                await self._queue.put((stream, f"[{prefix}] {line}\n"))
+        self._framers.clear()
+
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+
+    async def __aenter__(self) -> "StreamPrinter":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _run(self):
+        """写出任务：每个间隔最多写一次，每次写出队列中积累的全部行"""
+        while True:
+            item = await self._queue.get()
+            done = item is None
+            batch = [] if done else [item]
+
+            while not done and len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    done = True
+                else:
+                    batch.append(item)
+
+            self._write(batch)
+            if done:
+                return
+            await asyncio.sleep(self.interval)
+
+    def _write(self, batch: List[Tuple[str, str]]):
+        stdout = "".join(text for stream, text in batch if stream != "stderr")
+        stderr = "".join(text for stream, text in batch if stream == "stderr")
+        if stdout:
+            out = self.out or sys.stdout
+            out.write(stdout)
+            out.flush()
+        if stderr:
+            err = self.err or sys.stderr
+            err.write(stderr)
+            err.flush()
@@ -0,0 +1,28 @@
+#!/bin/sh
+#
+# pypssh self-extracting launcher. The onedir build is appended to this
+# script as a tar.gz payload and extracted once into a persistent cache
+# directory keyed by the payload hash; later launches exec it directly.
+
+set -e
+
+BUILD_ID="__PYPSSH_BUILD_ID__"
+CACHE_ROOT="${PYPSSH_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/pypssh}"
+TARGET="${CACHE_ROOT}/${BUILD_ID}"
+
+if [ ! -x "${TARGET}/pypssh/pypssh" ]; then
+    mkdir -p "${CACHE_ROOT}"
+    TMP_DIR="$(mktemp -d "${CACHE_ROOT}/.extract.XXXXXX")"
+    PAYLOAD_LINE=$(awk '/^__PYPSSH_PAYLOAD_BELOW__$/ { print NR + 1; exit 0 }' "$0")
+    tail -n +"${PAYLOAD_LINE}" "$0" | tar -xzf - -C "${TMP_DIR}"
+    # 解压到临时目录后再改名，避免并发启动时执行未解压完成的文件。目标已存在
+    # 或改名失败说明另一个进程已完成安装，丢弃本次解压结果；若另一个进程恰好在
+    # 检查与改名之间完成安装，mv 会把临时目录移入目标目录内，同样删除
+    if [ -d "${TARGET}" ] || ! mv "${TMP_DIR}" "${TARGET}" 2>/dev/null; then
+        rm -rf "${TMP_DIR}"
+    fi
+    rm -rf "${TARGET}/${TMP_DIR##*/}"
+fi
+
+exec "${TARGET}/pypssh/pypssh" "$@"
+__PYPSSH_PAYLOAD_BELOW__
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""CLI启动导入耗时基准（基于 python -X importtime）
+
+示例:
+    python tests/benchmarks/import_time.py --runs 5 --max-ms 150
+    python tests/benchmarks/import_time.py --save import_baseline.json
+    python tests/benchmarks/import_time.py --baseline import_baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+# 每个场景: (名称, CLI参数, 不允许导入的重量级模块)
+SCENARIOS = [
+    ("version-simple", ["version", "--simple"], ["asyncssh", "rich", "yaml"]),
+    ("list-namespaces", ["config", "list-namespaces"], ["asyncssh", "yaml"]),
+    ("exec-help", ["exec", "--help"], ["asyncssh", "rich", "yaml"]),
+]
+
+RUNNER = (
+    "import sys\n"
+    "sys.argv = ['pypssh'] + sys.argv[1:]\n"
+    "from pypssh.cli import main\n"
+    "try:\n"
+    "    main()\n"
+    "except SystemExit:\n"
+    "    pass\n"
+)
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, int]]:
+    """解析 -X importtime 输出，返回(顶层累计耗时ms, {模块: 累计us})"""
+    total_us = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        stripped = name.rstrip()
+        module = stripped.strip()
+        modules[module] = int(cumulative_us)
+        # 顶层模块前只有一个空格
+        if len(stripped) - len(module) == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1000.0, modules
+
+
+def run_scenario(args: List[str], home: str) -> Tuple[float, Dict[str, int]]:
+    """运行一次CLI并采集导入耗时"""
+    env = dict(os.environ, HOME=home)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER, *args],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pypssh CLI import-time benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景运行次数")
+    parser.add_argument("--max-ms", type=float, default=None, help="导入耗时上限(ms)")
+    parser.add_argument("--baseline", help="基线结果文件")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="相对基线允许的退化比例"
+    )
+    parser.add_argument("--save", help="保存结果到文件")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+
+    with tempfile.TemporaryDirectory() as home:
+        for name, cli_args, forbidden in SCENARIOS:
+            timings = []
+            modules = {}
+            for _ in range(args.runs):
+                total_ms, modules = run_scenario(cli_args, home)
+                timings.append(total_ms)
+
+            median_ms = statistics.median(timings)
+            loaded = [m for m in forbidden if m in modules]
+            results[name] = {"median_ms": median_ms, "min_ms": min(timings)}
+
+            print(
+                f"{name:<18} median {median_ms:8.1f}ms  min {min(timings):8.1f}ms"
+                + (f"  HEAVY: {', '.join(loaded)}" if loaded else "")
+            )
+
+            if loaded:
+                failures.append(f"{name}: imports {', '.join(loaded)}")
+            if args.max_ms is not None and median_ms > args.max_ms:
+                failures.append(f"{name}: {median_ms:.1f}ms > {args.max_ms:.1f}ms")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name, stats in results.items():
+            base = baseline.get(name)
+            if not base:
+                continue
+            limit = base["median_ms"] * (1 + args.threshold)
+            if stats["median_ms"] > limit:
+                failures.append(
+                    f"{name}: {stats['median_ms']:.1f}ms regressed from "
+                    f"{base['median_ms']:.1f}ms (limit {limit:.1f}ms)"
+                )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
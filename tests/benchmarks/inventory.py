@@ -0,0 +1,100 @@
+"""合成主机清单生成器（基准测试用）
+
+按接近真实环境的分布生成主机：地址集中在少数 /16 网段内，
+环境/区域/角色等标签取值呈长尾分布，部分标签只出现在少数主机上。
+同一 seed 生成的清单完全相同，便于与基线比较。
+"""
+
+import ipaddress
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from pypssh.core.models import Host
+
+# 标签名 -> (取值, 权重)
+LABEL_VALUES: Dict[str, Tuple[Sequence[str], Sequence[float]]] = {
+    "env": (("prod", "staging", "test", "dev"), (0.6, 0.15, 0.15, 0.1)),
+    "region": (
+        ("cn-north", "cn-east", "cn-south", "us-west", "eu-central"),
+        (0.35, 0.3, 0.2, 0.1, 0.05),
+    ),
+    "zone": (("a", "b", "c"), (0.4, 0.35, 0.25)),
+    "role": (
+        ("web", "api", "db", "cache", "queue", "worker", "batch", "monitor"),
+        (0.3, 0.2, 0.1, 0.1, 0.05, 0.15, 0.07, 0.03),
+    ),
+    "os": (
+        ("ubuntu-22.04", "ubuntu-20.04", "centos-7", "debian-12"),
+        (0.5, 0.2, 0.2, 0.1),
+    ),
+}
+
+# 只出现在部分主机上的标签：标签名 -> 出现概率
+SPARSE_LABELS = {"canary": 0.02, "gpu": 0.05, "owner": 0.3}
+
+TEAMS = tuple(f"team-{i:02d}" for i in range(40))
+
+NETWORKS = tuple(ipaddress.IPv4Network(f"10.{i}.0.0/16") for i in range(16))
+
+# 命名规模
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_size(value: str) -> int:
+    """解析规模：10k / 100k / 1m 或整数"""
+    return SIZES.get(value.lower()) or int(value)
+
+
+def generate_hosts(count: int, seed: int = 0) -> List[Host]:
+    """生成 count 台主机"""
+    rng = random.Random(seed)
+    # 主机依次分布在各网段中，网段内地址顺序递增（与按机房批量上架类似）
+    per_network = -(-count // len(NETWORKS))
+    hosts = []
+    for index in range(count):
+        network = NETWORKS[index // per_network]
+        address = str(network.network_address + index % per_network + 1)
+
+        labels = {
+            name: rng.choices(values, weights)[0]
+            for name, (values, weights) in LABEL_VALUES.items()
+        }
+        labels["team"] = TEAMS[min(int(rng.paretovariate(1.2)) - 1, len(TEAMS) - 1)]
+        labels["cpu"] = str(rng.choice((2, 4, 8, 8, 16, 16, 32, 64)))
+        labels["tags"] = ",".join(rng.sample(("ssd", "hdd", "ipv6", "bare", "vm"), 2))
+        for name, probability in SPARSE_LABELS.items():
+            if rng.random() < probability:
+                labels[name] = "true" if name != "owner" else rng.choice(TEAMS)
+
+        hosts.append(
+            Host(
+                host=address,
+                port=22,
+                username="root",
+                labels=labels,
+                name=f"{labels['role']}-{index:07d}",
+            )
+        )
+    return hosts
+
+
+def write_inventory(path: Path, hosts: List[Host], namespace: str = "bench"):
+    """写出 ``config import`` 可读取的单命名空间 JSON"""
+    data = {
+        "namespace": {"name": namespace, "description": "synthetic inventory"},
+        "servers": [
+            {
+                "name": host.name,
+                "host": host.host,
+                "port": host.port,
+                "username": host.username,
+                "labels": host.labels,
+            }
+            for host in hosts
+        ],
+        "groups": [],
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
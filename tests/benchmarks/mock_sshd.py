@@ -1,285 +1,414 @@
+#!/usr/bin/env python3
+"""基准测试用的模拟SSH服务器集群（asyncssh，进程内）
+
+一个事件循环承载成千上万台虚拟主机，全部共用一个预先生成的主机密钥，
+服务端开销远低于被测的客户端：
+- aliases: 每台主机一个回环地址（127.1.x.y，Linux 默认可直接绑定），端口相同
+- ports:   全部监听 127.0.0.1，每台主机一个端口
+
+可注入延迟（认证前、命令执行前，附带抖动）与故障（按比例选出的主机）：
+- exit:   命令以非零状态退出
+- auth:   拒绝认证
+- refuse: 不监听（连接被拒绝）
+- hang:   命令不返回（触发客户端超时）
+
+``--max-startups start:rate:full`` 与 sshd 的 MaxStartups 相同：每台主机未完成认证的
+连接数达到 start 后按 rate% 的概率直接断开新连接，达到 full 时全部断开。
+延迟、带宽、连接重置等网络效果由 netem.py 的代理在集群前模拟。
+
+命令: ``echo TEXT``、``sleep SECONDS``、``exit CODE``、``bytes N``（输出N字节），
+其他命令输出 ``ok``。SFTP 以每台主机独立的目录为根，``/srv/blob.bin`` 为预置的
+下载文件（硬链接到同一个文件，不占用额外空间）。
+
+单独运行时启动集群并输出主机列表:
+    python tests/benchmarks/mock_sshd.py --hosts 1000 --exec-latency 0.01
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import multiprocessing
 import os
+import random
+import resource
+import shutil
 import socket
-import threading
-import paramiko
-from paramiko import ServerInterface, SFTPServer, SFTPServerInterface, Transport
-from paramiko.sftp_si import SFTPServerInterface
-from paramiko.sftp_si import SFTPServerInterface
-from io import BytesIO
-import traceback
-
-
-# 模拟文件系统
-class MockFileSystem:
-    def __init__(self):
-        self.files = {
-            "/": {"type": "dir", "content": {}},
-            "/tmp": {"type": "dir", "content": {}},
-            "/home": {"type": "dir", "content": {}},
-        }
-
-    def exists(self, path):
-        return path in self.files
-
-    def isdir(self, path):
-        return self.files.get(path, {}).get("type") == "dir"
-
-    def isfile(self, path):
-        return self.files.get(path, {}).get("type") == "file"
-
-    def mkdir(self, path):
-        parent = os.path.dirname(path)
-        if parent not in self.files:
-            self.mkdir(parent)
-        self.files[path] = {"type": "dir", "content": {}}
-
-    def listdir(self, path):
-        if not self.isdir(path):
-            return []
-        return [name for name in self.files[path]["content"]]
-
-    def open(self, path, mode="r"):
-        if "w" in mode or "a" in mode:
-            if not self.exists(path):
-                parent = os.path.dirname(path)
-                if parent and not self.exists(parent):
-                    self.mkdir(parent)
-                self.files[path] = {"type": "file", "content": BytesIO()}
-            return self.files[path]["content"]
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import asyncssh
+
+from netem import NetemOptions, NetworkEmulator, add_arguments, netem_from_args
+
+FAILURE_MODES = ("exit", "auth", "refuse", "hang")
+
+ALIAS_NETWORK = ipaddress.IPv4Address("127.1.0.0")
+
+BLOB_PATH = "/srv/blob.bin"
+
+
+@dataclass
+class FleetOptions:
+    """模拟集群参数"""
+
+    hosts: int = 100
+    addressing: str = "aliases"
+    port: int = 2222  # aliases 模式下所有主机共用的端口
+    username: str = "bench"
+    password: str = "bench"
+    connect_latency: float = 0.0
+    exec_latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    failure_mode: str = "exit"
+    blob_size: int = 0  # 预置下载文件大小（字节），0 表示不预置
+    seed: int = 0
+    host_key: Optional[str] = None  # 主机密钥文件，为空时生成一次
+    max_startups: str = ""  # sshd MaxStartups 格式 start:rate:full，为空表示不限
+
+
+def parse_max_startups(value: str) -> Optional[Tuple[int, int, int]]:
+    """解析 start:rate:full（或单个数字，等价于 N:100:N）"""
+    if not value:
+        return None
+    parts = [int(part) for part in value.split(":")]
+    if len(parts) == 1:
+        return parts[0], 100, parts[0]
+    if len(parts) != 3 or not parts[0] <= parts[2]:
+        raise ValueError(f"Invalid MaxStartups '{value}': expected start:rate:full")
+    return parts[0], parts[1], parts[2]
+
+
+class _MockServer(asyncssh.SSHServer):
+    def __init__(self, fleet: "MockFleet", index: int):
+        self.fleet = fleet
+        self.index = index
+        self._starting = False
+
+    def connection_made(self, conn: asyncssh.SSHServerConnection):
+        if self.fleet.drop_startup(self.index):
+            conn.abort()
+            return
+        self._starting = True
+        self.fleet.startups[self.index] += 1
+
+    def auth_completed(self):
+        self._finish_startup()
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._finish_startup()
+
+    def _finish_startup(self):
+        if self._starting:
+            self._starting = False
+            self.fleet.startups[self.index] -= 1
+
+    def begin_auth(self, username: str) -> bool:
+        return True
+
+    def password_auth_supported(self) -> bool:
+        return True
+
+    async def validate_password(self, username: str, password: str) -> bool:
+        options = self.fleet.options
+        await self.fleet.delay(options.connect_latency)
+        if self.fleet.failure(self.index) == "auth":
+            return False
+        return username == options.username and password == options.password
+
+
+class MockFleet:
+    """模拟SSH服务器集群"""
+
+    def __init__(self, options: FleetOptions, netem: Optional[NetemOptions] = None):
+        if options.failure_mode not in FAILURE_MODES:
+            raise ValueError(f"Unknown failure mode '{options.failure_mode}'")
+        if options.addressing not in ("aliases", "ports"):
+            raise ValueError(f"Unknown addressing '{options.addressing}'")
+
+        self.options = options
+        self.netem = netem
+        self.emulator: Optional[NetworkEmulator] = None
+        self.endpoints: List[Tuple[str, int]] = []
+        self.startups = [0] * options.hosts
+        self.dropped_startups = 0
+        self._max_startups = parse_max_startups(options.max_startups)
+        self.root = Path(tempfile.mkdtemp(prefix="pypssh-mock-"))
+        self._servers: List[asyncssh.SSHAcceptor] = []
+        self._random = random.Random(options.seed)
+
+        failing = round(options.hosts * options.failure_rate)
+        self._failing = set(self._random.sample(range(options.hosts), failing))
+
+    def failure(self, index: int) -> Optional[str]:
+        """主机的注入故障（无故障返回 None）"""
+        return self.options.failure_mode if index in self._failing else None
+
+    def drop_startup(self, index: int) -> bool:
+        """按 MaxStartups 规则决定是否断开新连接"""
+        if self._max_startups is None:
+            return False
+        start, rate, full = self._max_startups
+        pending = self.startups[index]
+        if pending < start:
+            return False
+        if pending >= full:
+            drop = True
+        else:
+            probability = rate + (100 - rate) * (pending - start) / (full - start)
+            drop = self._random.random() * 100 < probability
+        self.dropped_startups += drop
+        return drop
+
+    async def delay(self, seconds: float):
+        if seconds <= 0:
+            return
+        jitter = self.options.jitter
+        await asyncio.sleep(max(seconds + self._random.uniform(-jitter, jitter), 0))
+
+    def host_dir(self, index: int) -> Path:
+        return self.root / f"host-{index}"
+
+    async def start(self) -> List[Tuple[str, int]]:
+        """启动全部虚拟主机，返回 (地址, 端口) 列表"""
+        _raise_nofile_limit()
+        options = self.options
+        if options.host_key:
+            host_key = asyncssh.read_private_key(options.host_key)
         else:
-            if not self.exists(path):
-                raise FileNotFoundError(path)
-            return self.files[path]["content"]
-
-
-# 模拟SFTP服务器（保持不变）
-class MockSFTP(SFTPServerInterface):
-    def __init__(self, server, *args, **kwargs):
-        self.server = server
-        self.fs = server.fs
-        super().__init__(*args, **kwargs)
-
-    def list_folder(self, path):
-        path = self._canonicalize(path)
-        if not self.fs.isdir(path):
-            return paramiko.SFTP_NO_SUCH_FILE
-        return [
-            paramiko.SFTPAttributes.from_stat(
-                fstat=os.stat_result((0, 0, 0, 0, 0, 0, 0, 0, 0, 0)), filename=name
+            host_key = asyncssh.generate_private_key("ssh-ed25519")
+
+        blob = None
+        if options.blob_size:
+            blob = self.root / "blob.bin"
+            with open(blob, "wb") as f:
+                f.write(os.urandom(options.blob_size))
+
+        for index in range(options.hosts):
+            host_dir = self.host_dir(index)
+            (host_dir / "tmp").mkdir(parents=True)
+            if blob is not None:
+                (host_dir / "srv").mkdir()
+                os.link(blob, host_dir / BLOB_PATH.lstrip("/"))
+
+            if options.addressing == "aliases":
+                address = str(ALIAS_NETWORK + index + 1)
+                port = options.port
+            else:
+                address, port = "127.0.0.1", 0
+
+            if self.failure(index) == "refuse":
+                self.endpoints.append((address, port or _unused_port()))
+                continue
+
+            server = await asyncssh.create_server(
+                lambda index=index: _MockServer(self, index),
+                address,
+                port,
+                server_host_keys=[host_key],
+                process_factory=lambda process, index=index: self._handle(
+                    index, process
+                ),
+                sftp_factory=lambda chan, index=index: asyncssh.SFTPServer(
+                    chan, chroot=str(self.host_dir(index))
+                ),
+                backlog=1024,
             )
-            for name in self.fs.listdir(path)
-        ]
-
-    def stat(self, path):
-        path = self._canonicalize(path)
-        if not self.fs.exists(path):
-            return paramiko.SFTP_NO_SUCH_FILE
-        return paramiko.SFTPAttributes.from_stat(
-            fstat=os.stat_result((0, 0, 0, 0, 0, 0, 0, 0, 0, 0))
-        )
+            self._servers.append(server)
+            self.endpoints.append((address, server.sockets[0].getsockname()[1]))
 
-    def open(self, path, flags, attr):
-        path = self._canonicalize(path)
-        if flags & os.O_WRONLY:
-            return MockHandle(self.fs.open(path, "wb"), path)
+        if self.netem is not None and self.netem.enabled:
+            self.emulator = NetworkEmulator(self.netem)
+            self.endpoints = await self.emulator.start(
+                self.endpoints, options.addressing
+            )
+        return self.endpoints
+
+    async def _handle(self, index: int, process: asyncssh.SSHServerProcess):
+        await self.delay(self.options.exec_latency)
+        failure = self.failure(index)
+        if failure == "hang":
+            await asyncio.sleep(3600)
+        if failure == "exit":
+            process.stderr.write("injected failure\n")
+            process.exit(1)
+            return
+
+        name, _, argument = (process.command or "").partition(" ")
+        if name == "echo":
+            process.stdout.write(argument + "\n")
+        elif name == "sleep":
+            await asyncio.sleep(float(argument or 0))
+        elif name == "exit":
+            process.exit(int(argument or 0))
+            return
+        elif name == "bytes":
+            process.stdout.write("x" * int(argument or 0))
         else:
-            return MockHandle(self.fs.open(path, "rb"), path)
+            process.stdout.write("ok\n")
+        process.exit(0)
+
+    def stats(self) -> Dict[str, int]:
+        """服务端注入效果的计数"""
+        stats = {"dropped_startups": self.dropped_startups}
+        if self.emulator is not None:
+            stats.update(self.emulator.stats())
+        return stats
+
+    async def stop(self):
+        if self.emulator is not None:
+            await self.emulator.stop()
+        for server in self._servers:
+            server.close()
+        await asyncio.gather(
+            *(server.wait_closed() for server in self._servers),
+            return_exceptions=True,
+        )
+        self._servers.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    async def __aenter__(self) -> "MockFleet":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+
+def _raise_nofile_limit():
+    """每台主机占用一个监听套接字，尽量提高文件描述符上限"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        target = hard if hard != resource.RLIM_INFINITY else 1 << 20
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def _unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def connection_configs(
+    endpoints: List[Tuple[str, int]],
+    options: FleetOptions,
+    connect_timeout: float = 10.0,
+    command_timeout: float = 30.0,
+):
+    """生成连接到模拟集群的 ConnectionConfig 列表"""
+    from pypssh.core.models import ConnectionConfig
+
+    return [
+        ConnectionConfig(
+            host=address,
+            port=port,
+            username=options.username,
+            password=options.password,
+            connect_timeout=connect_timeout,
+            command_timeout=command_timeout,
+            labels={"index": str(index)},
+        )
+        for index, (address, port) in enumerate(endpoints)
+    ]
 
 
-class MockHandle:
-    def __init__(self, file, path):
-        self.file = file
-        self.path = path
+def _serve(options: FleetOptions, netem: Optional[NetemOptions], conn):
+    """子进程入口：启动集群，发送地址列表，收到任意消息后发送统计并退出"""
 
-    def read(self, size):
-        return self.file.read(size)
+    async def run():
+        async with MockFleet(options, netem) as fleet:
+            conn.send(fleet.endpoints)
+            await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+            conn.send(fleet.stats())
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        conn.send(e)
 
-    def write(self, data):
-        return self.file.write(data)
 
-    def close(self):
-        return self.file.close()
+class FleetProcess:
+    """在独立进程中运行模拟集群，服务端不占用被测客户端的事件循环"""
 
-    def stat(self):
-        return paramiko.SFTPAttributes.from_stat(
-            fstat=os.stat_result((0, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+    def __init__(self, options: FleetOptions, netem: Optional[NetemOptions] = None):
+        self.options = options
+        self.endpoints: List[Tuple[str, int]] = []
+        self.stats: Dict[str, int] = {}
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(options, netem, child_conn), daemon=True
         )
 
+    def __enter__(self) -> "FleetProcess":
+        self._process.start()
+        message = self._conn.recv()
+        if isinstance(message, Exception):
+            self._process.join()
+            raise message
+        self.endpoints = message
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.send("stop")
+        if self._conn.poll(30):
+            self.stats = self._conn.recv()
+        self._process.join(timeout=30)
+        if self._process.is_alive():
+            self._process.kill()
+
+
+def build_parser(parser: Optional[argparse.ArgumentParser] = None):
+    """集群参数（基准脚本复用）"""
+    parser = parser or argparse.ArgumentParser(description="pypssh mock SSH fleet")
+    defaults = FleetOptions()
+    parser.add_argument("--hosts", type=int, default=defaults.hosts, help="虚拟主机数")
+    parser.add_argument(
+        "--addressing", choices=("aliases", "ports"), default=defaults.addressing
+    )
+    parser.add_argument("--port", type=int, default=defaults.port, help="aliases 端口")
+    parser.add_argument(
+        "--connect-latency", type=float, default=0.0, help="认证延迟(s)"
+    )
+    parser.add_argument("--exec-latency", type=float, default=0.0, help="命令延迟(s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟抖动(s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="故障主机比例")
+    parser.add_argument("--failure-mode", choices=FAILURE_MODES, default="exit")
+    parser.add_argument("--blob-size", type=int, default=0, help="预置下载文件大小")
+    parser.add_argument("--seed", type=int, default=0, help="故障选择的随机种子")
+    parser.add_argument("--host-key", help="主机密钥文件")
+    parser.add_argument(
+        "--max-startups", default="", help="未认证连接上限 start:rate:full"
+    )
+    return add_arguments(parser)
 
-# 扩展的Mock SSH服务器（添加PTY和shell支持）
-class MockSSHServer(ServerInterface):
-    def __init__(self, credentials, commands, fs):
-        self.credentials = credentials  # {username: password}
-        self.commands = commands  # 预定义的命令和响应
-        self.fs = fs  # 文件系统
-        self.shell_active = False  # shell会话状态
-
-    def check_auth_password(self, username, password):
-        if username in self.credentials and self.credentials[username] == password:
-            return paramiko.AUTH_SUCCESSFUL
-        return paramiko.AUTH_FAILED
-
-    def check_channel_request(self, kind, chanid):
-        if kind == "session":
-            return paramiko.OPEN_SUCCEEDED
-        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
-
-    # 新增：处理PTY请求
-    def check_channel_pty_request(
-        self, channel, term, width, height, pixelwidth, pixelheight, modes
-    ):
-        print(f"PTY request: term={term}, width={width}, height={height}")
-        return True
 
-    # 新增：处理shell请求
-    def check_channel_shell_request(self, channel):
-        print("Shell request received")
-        self.shell_active = True
-        # 启动一个线程来处理shell会话
-        threading.Thread(target=self.handle_shell, args=(channel,), daemon=True).start()
-        return True
+def options_from_args(args: argparse.Namespace) -> FleetOptions:
+    names = FleetOptions.__dataclass_fields__
+    return FleetOptions(**{k: v for k, v in vars(args).items() if k in names})
 
-    # 新增：处理shell会话
-    def handle_shell(self, channel):
-        try:
-            # 发送欢迎信息
-            channel.send("Welcome to Mock SSH Server!\n")
-            channel.send("This is a simulated shell environment.\n")
-            channel.send("Available commands: ls, whoami, pwd, date, exit\n")
-            channel.send("$ ")
-
-            while self.shell_active and not channel.closed:
-                # 读取用户输入
-                command = ""
-                while not command.endswith("\r") and not command.endswith("\n"):
-                    chunk = channel.recv(1024)
-                    if not chunk:
-                        break
-                    command += chunk.decode("utf-8")
-
-                # 处理命令
-                command = command.strip()
-                if command == "exit":
-                    channel.send("Goodbye!\n")
-                    channel.send_exit_status(0)
-                    self.shell_active = False
-                    break
-
-                # 执行命令并返回结果
-                if command in self.commands:
-                    response = self.commands[command]
-                elif command.startswith("echo "):
-                    response = command[5:] + "\n"
-                elif not command:
-                    response = ""
-                else:
-                    response = f"Command not found: {command}\n"
-
-                if response:
-                    channel.send(response)
-
-                # 发送新的提示符
-                if self.shell_active:
-                    channel.send("$ ")
-
-        except Exception as e:
-            print(f"Shell error: {e}")
-            traceback.print_exc()
-        finally:
-            channel.close()
-
-    def check_channel_subsystem_request(self, channel, name):
-        if name == "sftp":
-            transport = channel.get_transport()
-            transport.set_subsystem_handler("sftp", SFTPServer, sftp_si=MockSFTP(self))
-            return True
-        return False
-
-    def check_channel_exec_request(self, channel, command):
-        # 处理命令执行
-        command_str = command.decode("utf-8")
-        print(f"Exec request: {command_str}")
-
-        if command_str in self.commands:
-            response = self.commands[command_str]
-        elif command_str.startswith("echo "):
-            response = command_str[5:] + "\n"
-        else:
-            response = f"Command executed: {command_str}\n"
 
-        channel.send(response)
-        channel.send_exit_status(0)
-        return True
+async def _main():
+    args = build_parser().parse_args()
+    options = options_from_args(args)
+    async with MockFleet(options, netem_from_args(args)) as fleet:
+        json.dump(
+            {
+                "options": asdict(options),
+                "hosts": [f"{address}:{port}" for address, port in fleet.endpoints],
+            },
+            sys.stdout,
+        )
+        print(file=sys.stdout, flush=True)
+        print(f"Serving {len(fleet.endpoints)} hosts, Ctrl-C to stop", file=sys.stderr)
+        await asyncio.Event().wait()
 
 
-def start_mock_server(port, credentials, commands):
+if __name__ == "__main__":
     try:
-        fs = MockFileSystem()
-        server = MockSSHServer(credentials, commands, fs)
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(("0.0.0.0", port))
-        sock.listen(100)
-
-        print(f"Mock SSH server started on port {port}")
-
-        while True:
-            try:
-                client, addr = sock.accept()
-                print(f"Connection from {addr}")
-                transport = Transport(client)
-                transport.add_server_key(paramiko.RSAKey.generate(2048))
-                transport.start_server(server=server)
-            except Exception as e:
-                print(f"Error handling connection: {e}")
-                traceback.print_exc()
-    except Exception as e:
-        print(f"Failed to start server on port {port}: {e}")
-        traceback.print_exc()
-
-
-# 定义不同服务器的认证信息和命令响应
-server_configs = [
-    {
-        "port": 3000,
-        "credentials": {"admin": "admin123", "user": "user123"},
-        "commands": {
-            "ls": "file1.txt\nfile2.txt\ndir1\ndir2\n",
-            "whoami": "admin\n",
-            "pwd": "/home/admin\n",
-            "date": "Mon Jan 1 12:00:00 UTC 2023\n",
-            "exit": "",  # 特殊命令，用于退出shell
-        },
-    },
-    {
-        "port": 3001,
-        "credentials": {"root": "rootpass", "guest": "guestpass"},
-        "commands": {
-            "ls": "document.txt\nimage.jpg\n",
-            "whoami": "root\n",
-            "pwd": "/root\n",
-            "uname": "Linux\n",
-            "exit": "",
-        },
-    },
-    # 可以添加更多服务器配置...
-]
-
-# 启动所有Mock SSH服务器
-threads = []
-for config in server_configs:
-    thread = threading.Thread(
-        target=start_mock_server,
-        args=(config["port"], config["credentials"], config["commands"]),
-    )
-    thread.daemon = True  # 设置为守护线程，主线程退出时自动结束
-    thread.start()
-    threads.append(thread)
-    print(f"Started thread for port {config['port']}")
-
-# 保持主线程运行
-try:
-    for thread in threads:
-        thread.join()
-except KeyboardInterrupt:
-    print("Shutting down servers...")
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,301 @@
+"""基准测试用的网络故障与延迟模拟层（回环TCP代理）
+
+在模拟SSH集群前为每台主机启动一个TCP代理，模拟生产网络中本机测试看不到的效果：
+- 延迟: 每个方向的单向延迟与抖动（保持字节顺序，RTT 约为两倍单向延迟）
+- 带宽: 每个连接每个方向的速率上限
+- 重置: 按比例选出的连接在建立后的随机时刻被 RST 断开
+- 接受队列: 每台主机同时转发的连接数上限，超出的连接排队，队列满时直接重置
+
+慢主机（--slow-rate）使用单独的延迟与带宽，用于复现“少数主机拖慢整体”的长尾场景。
+代理地址与集群使用相同的寻址方式：aliases 模式下为 127.2.x.y，ports 模式下为
+127.0.0.1 上的随机端口。
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+PROXY_NETWORK = ipaddress.IPv4Address("127.2.0.0")
+
+_CHUNK = 64 * 1024
+
+
+@dataclass
+class LinkProfile:
+    """单台主机的链路参数"""
+
+    latency: float = 0.0  # 单向延迟（秒）
+    jitter: float = 0.0
+    bandwidth: int = 0  # 每个方向的速率上限（字节/秒），0 表示不限
+
+
+@dataclass
+class NetemOptions:
+    """网络模拟参数"""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: int = 0
+    slow_rate: float = 0.0  # 慢主机比例
+    slow_latency: float = 0.5
+    slow_bandwidth: int = 0
+    reset_rate: float = 0.0  # 被重置的连接比例
+    reset_window: float = 1.0  # 重置发生在连接建立后的 [0, reset_window) 秒内
+    max_connections: int = 0  # 每台主机同时转发的连接数，0 表示不限
+    accept_queue: int = 128  # 超出 max_connections 后排队的连接数
+    seed: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            (
+                self.latency,
+                self.jitter,
+                self.bandwidth,
+                self.slow_rate,
+                self.reset_rate,
+                self.max_connections,
+            )
+        )
+
+
+class _Pipe:
+    """单方向转发：按到达时间加延迟投递，并按带宽限速"""
+
+    def __init__(self, reader, writer, profile: LinkProfile, rng: random.Random):
+        self.reader = reader
+        self.writer = writer
+        self.profile = profile
+        self.rng = rng
+
+    async def run(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.create_task(self._send(queue))
+        loop = asyncio.get_running_loop()
+        last_due = 0.0
+        try:
+            while True:
+                data = await self.reader.read(_CHUNK)
+                if not data:
+                    break
+                delay = self.profile.latency
+                if self.profile.jitter:
+                    delay += self.rng.uniform(-self.profile.jitter, self.profile.jitter)
+                # 抖动不能使数据乱序
+                last_due = max(loop.time() + max(delay, 0.0), last_due)
+                queue.put_nowait((last_due, data))
+        finally:
+            queue.put_nowait((0.0, b""))
+            await sender
+
+    async def _send(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        next_free = 0.0
+        try:
+            while True:
+                due, data = await queue.get()
+                if not data:
+                    break
+                if self.profile.bandwidth:
+                    start = max(due, next_free)
+                    next_free = start + len(data) / self.profile.bandwidth
+                    due = next_free
+                wait = due - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self.writer.write(data)
+                await self.writer.drain()
+            if self.writer.can_write_eof():
+                self.writer.write_eof()
+        except (ConnectionError, OSError):
+            pass
+
+
+class HostProxy:
+    """单台主机的代理"""
+
+    def __init__(
+        self,
+        emulator: "NetworkEmulator",
+        upstream: Tuple[str, int],
+        profile: LinkProfile,
+        slow: bool = False,
+    ):
+        self.emulator = emulator
+        self.upstream = upstream
+        self.profile = profile
+        self.slow = slow
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.resets = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        if emulator.options.max_connections:
+            self._slots = asyncio.Semaphore(emulator.options.max_connections)
+
+    async def handle(self, reader, writer):
+        options = self.emulator.options
+        if self._slots is not None and self._slots.locked():
+            if self.queued >= options.accept_queue:
+                self.rejected += 1
+                _reset(writer)
+                return
+            self.queued += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.queued -= 1
+        elif self._slots is not None:
+            await self._slots.acquire()
+
+        self.active += 1
+        try:
+            await self._forward(reader, writer)
+        finally:
+            self.active -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    async def _forward(self, reader, writer):
+        rng = self.emulator.rng
+        try:
+            up_reader, up_writer = await asyncio.open_connection(*self.upstream)
+        except OSError:
+            _reset(writer)
+            return
+
+        pipes = asyncio.gather(
+            _Pipe(reader, up_writer, self.profile, rng).run(),
+            _Pipe(up_reader, writer, self.profile, rng).run(),
+        )
+        timeout = None
+        if rng.random() < self.emulator.options.reset_rate:
+            timeout = rng.uniform(0, self.emulator.options.reset_window)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(pipes), timeout)
+        except asyncio.TimeoutError:
+            self.resets += 1
+            _reset(writer)
+            _reset(up_writer)
+            pipes.cancel()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            for stream in (writer, up_writer):
+                stream.close()
+            await asyncio.gather(pipes, return_exceptions=True)
+
+
+def _reset(writer):
+    """以 RST 断开连接（SO_LINGER 为 0 时关闭不经过 FIN）"""
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        try:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+        except OSError:
+            pass
+    writer.transport.abort()
+
+
+class NetworkEmulator:
+    """为一组上游地址启动代理"""
+
+    def __init__(self, options: NetemOptions):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        self.proxies: List[HostProxy] = []
+        self._servers: List[asyncio.base_events.Server] = []
+
+    def profiles(self, count: int) -> List[Tuple[LinkProfile, bool]]:
+        """按比例选出慢主机，生成每台主机的 (链路参数, 是否慢主机)"""
+        options = self.options
+        slow = set(self.rng.sample(range(count), round(count * options.slow_rate)))
+        normal = LinkProfile(options.latency, options.jitter, options.bandwidth)
+        degraded = LinkProfile(
+            options.slow_latency, options.jitter, options.slow_bandwidth
+        )
+        return [
+            (degraded, True) if index in slow else (normal, False)
+            for index in range(count)
+        ]
+
+    async def start(
+        self, endpoints: List[Tuple[str, int]], addressing: str = "aliases"
+    ) -> List[Tuple[str, int]]:
+        """启动代理，返回与 endpoints 一一对应的代理地址"""
+        proxied = []
+        for index, (upstream, (profile, slow)) in enumerate(
+            zip(endpoints, self.profiles(len(endpoints)))
+        ):
+            proxy = HostProxy(self, upstream, profile, slow)
+            if addressing == "aliases":
+                address, port = str(PROXY_NETWORK + index + 1), upstream[1]
+            else:
+                address, port = "127.0.0.1", 0
+            server = await asyncio.start_server(
+                proxy.handle, address, port, backlog=1024
+            )
+            self.proxies.append(proxy)
+            self._servers.append(server)
+            proxied.append((address, server.sockets[0].getsockname()[1]))
+        return proxied
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "slow_hosts": sum(1 for p in self.proxies if p.slow),
+            "resets": sum(p.resets for p in self.proxies),
+            "rejected": sum(p.rejected for p in self.proxies),
+        }
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+        await asyncio.gather(
+            *(server.wait_closed() for server in self._servers),
+            return_exceptions=True,
+        )
+        self._servers.clear()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """网络模拟参数（基准脚本复用）"""
+    group = parser.add_argument_group("network emulation")
+    group.add_argument("--latency", type=float, default=0.0, help="单向延迟(s)")
+    group.add_argument("--net-jitter", type=float, default=0.0, help="网络抖动(s)")
+    group.add_argument("--bandwidth", type=int, default=0, help="带宽上限(字节/秒)")
+    group.add_argument("--slow-rate", type=float, default=0.0, help="慢主机比例")
+    group.add_argument("--slow-latency", type=float, default=0.5, help="慢主机延迟(s)")
+    group.add_argument("--slow-bandwidth", type=int, default=0, help="慢主机带宽")
+    group.add_argument("--reset-rate", type=float, default=0.0, help="连接重置比例")
+    group.add_argument(
+        "--reset-window", type=float, default=1.0, help="重置时间窗口(s)"
+    )
+    group.add_argument(
+        "--max-connections", type=int, default=0, help="每台主机同时转发的连接数"
+    )
+    group.add_argument("--accept-queue", type=int, default=128, help="接受队列长度")
+    return parser
+
+
+def netem_from_args(args: argparse.Namespace) -> NetemOptions:
+    return NetemOptions(
+        latency=args.latency,
+        jitter=args.net_jitter,
+        bandwidth=args.bandwidth,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        slow_bandwidth=args.slow_bandwidth,
+        reset_rate=args.reset_rate,
+        reset_window=args.reset_window,
+        max_connections=args.max_connections,
+        accept_queue=args.accept_queue,
+        seed=args.seed,
+    )
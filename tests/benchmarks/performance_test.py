@@ -1,186 +1,294 @@
 #!/usr/bin/env python3
-"""SSH并行执行性能测试"""
+"""并行执行/传输/选择性能基准
 
+在模拟SSH集群（mock_sshd.py，默认运行在独立进程中）上依次运行各个基准，
+每个基准重复 --runs 次取中位数，结果可保存为JSON并与基线比较。
+
+示例:
+    python tests/benchmarks/performance_test.py --hosts 1000 --concurrency 100
+    python tests/benchmarks/performance_test.py --suites exec,ping --save bench.json
+    python tests/benchmarks/performance_test.py --baseline bench.json --threshold 0.2
+    python tests/benchmarks/performance_test.py --exec-latency 0.05 --jitter 0.02 \\
+        --failure-rate 0.01 --failure-mode hang --command-timeout 2
+    python tests/benchmarks/performance_test.py --suites exec --latency 0.02 \\
+        --slow-rate 0.01 --slow-latency 0.5 --max-startups 10:30:100
+"""
+
+import argparse
 import asyncio
-import time
+import json
+import platform
 import statistics
+import sys
+import tempfile
+import time
 from pathlib import Path
-import json
-import argparse
-from typing import List
-
-# 假设pypssh已安装
-from pypssh.core.executor import SSHExecutor
-from pypssh.core.models import ConnectionConfig
-from pypssh.selector.ip_selector import IPSelector
-from pypssh.selector.label_selector import LabelSelector, models.Host
-from pypssh.ui.progress import ProgressDisplay, create_progress_callback
-
-class PerformanceTest:
-    """性能测试类"""
-    
-    def __init__(self, base_port: int = 2001, max_servers: int = 1000):
-        self.base_port = base_port
-        self.max_servers = max_servers
-        self.results = {}
-    
-    def generate_configs(self, count: int) -> List[ConnectionConfig]:
-        """生成测试连接配置"""
-        configs = []
-        
-        for i in range(count):
-            config = ConnectionConfig(
-                host='localhost',
-                port=self.base_port + i,
-                username='testuser',
-                password='testpassword',
-                connect_timeout=5.0,
-                command_timeout=10.0,
-                labels={
-                    'id': f"{i+1:06d}",
-                    'env': 'prod' if (i+1) % 3 == 0 else 'test',
-                    'tier': 'web' if (i+1) % 4 == 0 else 'db' if (i+1) % 4 == 1 else 'cache',
-                    'region': 'asia' if (i+1) % 2 == 0 else 'us',
-                    'zone': f'zone-{(i+1) % 5 + 1}',
-                }
-            )
-            configs.append(config)
-        
-        return configs
-    
-    async def test_concurrent_execution(
-        self, 
-        configs: List[ConnectionConfig], 
-        command: str,
-        max_concurrent: int = 50
-    ):
-        """测试并发执行性能"""
-        
-        display = ProgressDisplay()
-        progress_callback = create_progress_callback(display)
-        
-        executor = SSHExecutor(
-            max_concurrent=max_concurrent,
-            progress_callback=progress_callback
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from mock_sshd import (  # noqa: E402
+    BLOB_PATH,
+    FleetProcess,
+    MockFleet,
+    build_parser,
+    connection_configs,
+    options_from_args,
+)
+from netem import netem_from_args  # noqa: E402
+from pypssh.core.connectivity import ConnectivityTester  # noqa: E402
+from pypssh.core.executor import SSHExecutor  # noqa: E402
+from pypssh.core.models import Host  # noqa: E402
+from pypssh.core.transfer import FileTransfer, TransferTuning  # noqa: E402
+from pypssh.selector.label_selector import (
+    compile_selector,
+    select_servers,
+)  # noqa: E402
+
+SUITES = ("exec", "ping", "upload", "download", "selection")
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+def _run_stats(results, elapsed: float, duration: Callable) -> Dict[str, float]:
+    """单次运行统计"""
+    latencies = [duration(r) for r in results]
+    return {
+        "seconds": elapsed,
+        "hosts_per_second": len(results) / elapsed if elapsed else 0.0,
+        "success": sum(
+            1 for r in results if r.status.value in ("success", "reachable")
+        ),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def bench_exec(configs, args, workdir):
+    executor = SSHExecutor(max_concurrent=args.concurrency)
+    start = time.perf_counter()
+    results = await executor.execute_parallel(configs, args.command)
+    return _run_stats(results, time.perf_counter() - start, lambda r: r.execution_time)
+
+
+async def bench_ping(configs, args, workdir):
+    tester = ConnectivityTester(max_concurrent=args.concurrency)
+    start = time.perf_counter()
+    results = await tester.test_parallel(configs)
+    return _run_stats(results, time.perf_counter() - start, lambda r: r.response_time)
+
+
+def _tuning(args) -> TransferTuning:
+    return TransferTuning(
+        block_size=args.block_size,
+        max_requests=args.max_requests,
+        parallel=args.parallel_parts,
+        min_part_size=args.min_part_size,
+        auto=args.auto_tune,
+    )
+
+
+async def bench_upload(configs, args, workdir):
+    source = Path(workdir) / "upload.bin"
+    if not source.exists():
+        source.write_bytes(b"\0" * args.file_size)
+    transfer = FileTransfer(max_concurrent=args.concurrency)
+    start = time.perf_counter()
+    results = await transfer.upload_parallel(
+        configs, str(source), "/tmp/upload.bin", tuning=_tuning(args)
+    )
+    return _run_stats(results, time.perf_counter() - start, lambda r: r.transfer_time)
+
+
+async def bench_download(configs, args, workdir):
+    transfer = FileTransfer(max_concurrent=args.concurrency)
+    start = time.perf_counter()
+    results = await transfer.download_parallel(
+        configs, BLOB_PATH, str(Path(workdir) / "download"), tuning=_tuning(args)
+    )
+    return _run_stats(results, time.perf_counter() - start, lambda r: r.transfer_time)
+
+
+async def bench_selection(configs, args, workdir):
+    """IP 与标签表达式在整个主机列表上的筛选耗时（不连接主机）"""
+    hosts = [
+        Host(
+            host=config.host,
+            port=config.port,
+            labels={
+                "env": "prod" if index % 3 == 0 else "test",
+                "tier": ("web", "db", "cache")[index % 3],
+                "zone": f"zone-{index % 5 + 1}",
+            },
         )
-        
-        display.start_execution(len(configs), command)
-        
-        start_time = time.time()
-        results = await executor.execute_parallel(configs, command)
-        end_time = time.time()
-        
-        display.finish_execution()
-        
-        # 统计结果
-        execution_times = [r.execution_time for r in results if r.execution_time > 0]
-        
-        stats = {
-            'total_hosts': len(configs),
-            'max_concurrent': max_concurrent,
-            'total_time': end_time - start_time,
-            'success_count': len([r for r in results if r.exit_code == 0]),
-            'error_count': len([r for r in results if r.exit_code != 0]),
-            'avg_execution_time': statistics.mean(execution_times) if execution_times else 0,
-            'median_execution_time': statistics.median(execution_times) if execution_times else 0,
-            'min_execution_time': min(execution_times) if execution_times else 0,
-            'max_execution_time': max(execution_times) if execution_times else 0,
-            'throughput': len(configs) / (end_time - start_time),
-        }
-        
-        return stats, results
-    
-    async def run_scale_test(self, command: str = "echo 'Hello World'"):
-        """运行规模测试"""
-        test_scales = [10, 50, 100, 500, 1000]
-        concurrent_limits = [10, 25, 50, 100]
-        
-        print("Starting scale performance tests...")
-        
-        for scale in test_scales:
-            if scale > self.max_servers:
-                continue
-                
-            configs = self.generate_configs(scale)
-            
-            for concurrent in concurrent_limits:
-                if concurrent > scale:
-                    continue
-                    
-                print(f"\nTesting {scale} hosts with {concurrent} concurrent connections...")
-                
-                try:
-                    stats, _ = await self.test_concurrent_execution(
-                        configs, command, concurrent
-                    )
-                    
-                    test_key = f"{scale}_{concurrent}"
-                    self.results[test_key] = stats
-                    
-                    print(f"Completed in {stats['total_time']:.2f}s, "
-                          f"throughput: {stats['throughput']:.1f} hosts/s")
-                    
-                except Exception as e:
-                    print(f"Test failed: {e}")
-                
-                # 等待一段时间再进行下一个测试
-                await asyncio.sleep(2)
-    
-    async def test_selectors(self):
-        """测试选择器性能"""
-        print("\nTesting selectors performance...")
-        
-        configs = self.generate_configs(1000)
-        servers = [
-            models.Host(
-                host=config.host,
-                port=config.port,
-                username=config.username,
-                labels=config.labels
+        for index, config in enumerate(configs)
+    ]
+    ip_expr = "127.1.0.1-127.1.15.255"
+    label_expr = "env=prod,tier in (web,db),zone!=zone-2"
+
+    compile_selector.cache_clear()
+    start = time.perf_counter()
+    selected = select_servers(hosts, ip_expr, label_expr)
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "hosts_per_second": len(hosts) / elapsed if elapsed else 0.0,
+        "selected": len(selected),
+    }
+
+
+BENCHMARKS = {
+    "exec": bench_exec,
+    "ping": bench_ping,
+    "upload": bench_upload,
+    "download": bench_download,
+    "selection": bench_selection,
+}
+
+
+def _summarize(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """多次运行取中位数"""
+    summary = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    summary["runs"] = len(runs)
+    summary["min_seconds"] = min(run["seconds"] for run in runs)
+    return summary
+
+
+async def run_suites(endpoints, options, args) -> Dict[str, Dict[str, float]]:
+    configs = connection_configs(
+        endpoints, options, args.connect_timeout, args.command_timeout
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.suites:
+            runs = [
+                await BENCHMARKS[name](configs, args, workdir) for _ in range(args.runs)
+            ]
+            results[name] = stats = _summarize(runs)
+            line = (
+                f"{name:<10} median {stats['seconds']:8.3f}s  "
+                f"{stats['hosts_per_second']:10.1f} hosts/s"
+            )
+            if "p50_ms" in stats:
+                line += (
+                    f"  ok {int(stats['success'])}/{len(configs)}"
+                    f"  p50 {stats['p50_ms']:.1f}ms  p99 {stats['p99_ms']:.1f}ms"
+                )
+            print(line, flush=True)
+    return results
+
+
+def compare(results, baseline, threshold: float) -> List[str]:
+    """与基线比较中位耗时，返回退化项"""
+    failures = []
+    for name, stats in results.items():
+        base = baseline.get("results", baseline).get(name)
+        if not base:
+            continue
+        limit = base["seconds"] * (1 + threshold)
+        if stats["seconds"] > limit:
+            failures.append(
+                f"{name}: {stats['seconds']:.3f}s regressed from "
+                f"{base['seconds']:.3f}s (limit {limit:.3f}s)"
             )
-            for config in configs
-        ]
-        
-        # IP选择器测试
-        ip_selector = IPSelector("127.0.0.1")
-        start_time = time.time()
-        selected = [s for s in servers if ip_selector.matches(s.host)]
-        ip_time = time.time() - start_time
-        
-        print(f"IP selector: selected {len(selected)} from {len(servers)} in {ip_time*1000:.2f}ms")
-        
-        # 标签选择器测试
-        label_selector = LabelSelector("env=prod,tier=web")
-        start_time = time.time()
-        selected = [s for s in servers if label_selector.matches(s)]
-        label_time = time.time() - start_time
-        
-        print(f"Label selector: selected {len(selected)} from {len(servers)} in {label_time*1000:.2f}ms")
-    
-    def save_results(self, filename: str = "performance_results.json"):
-        """保存测试结果"""
-        with open(filename, 'w') as f:
-            json.dump(self.results, f, indent=2)
-        print(f"Results saved to {filename}")
-
-async def main():
-    parser = argparse.ArgumentParser(description="SSH Performance Testing")
-    parser.add_argument('--max-servers', type=int, default=1000, help='Maximum number of servers to test')
-    parser.add_argument('--base-port', type=int, default=2001, help='Base port for SSH connections')
-    parser.add_argument('--command', type=str, default="echo 'Hello World'", help='Command to execute')
-    
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pypssh performance benchmarks")
+    build_parser(parser)
+    parser.add_argument(
+        "--suites",
+        type=lambda value: [s for s in value.split(",") if s],
+        default=list(SUITES),
+        help=f"逗号分隔的基准列表: {','.join(SUITES)}",
+    )
+    parser.add_argument("--concurrency", type=int, default=100, help="客户端并发数")
+    parser.add_argument("--runs", type=int, default=3, help="每个基准运行次数")
+    parser.add_argument("--command", default="echo hello", help="exec 基准的命令")
+    parser.add_argument("--file-size", type=int, default=65536, help="传输文件大小")
+    parser.add_argument("--block-size", type=int, help="SFTP 块大小")
+    parser.add_argument("--max-requests", type=int, help="在途SFTP请求数")
+    parser.add_argument("--parallel-parts", type=int, help="上传拆分的区间数")
+    parser.add_argument(
+        "--min-part-size", type=int, default=64 * 1024 * 1024, help="最小区间大小"
+    )
+    parser.add_argument("--auto-tune", action="store_true", help="按RTT自动调优")
+    parser.add_argument("--connect-timeout", type=float, default=10.0)
+    parser.add_argument("--command-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="模拟集群与客户端共用事件循环（默认运行在独立进程中）",
+    )
+    parser.add_argument("--baseline", help="基线结果文件")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="相对基线允许的退化比例"
+    )
+    parser.add_argument("--save", help="保存结果到文件")
     args = parser.parse_args()
-    
-    test = PerformanceTest(args.base_port, args.max_servers)
-    
-    # 运行规模测试
-    await test.run_scale_test(args.command)
-    
-    # 测试选择器性能
-    await test.test_selectors()
-    
-    # 保存结果
-    test.save_results()
+
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    if "download" in args.suites and not args.blob_size:
+        args.blob_size = args.file_size
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    options = options_from_args(args)
+    netem = netem_from_args(args)
+    print(
+        f"Fleet: {options.hosts} hosts ({options.addressing}), "
+        f"concurrency {args.concurrency}, {args.runs} runs",
+        flush=True,
+    )
+
+    if args.in_process:
+
+        async def run_in_process():
+            async with MockFleet(options, netem) as fleet:
+                results = await run_suites(fleet.endpoints, options, args)
+                return results, fleet.stats()
+
+        results, fleet_stats = asyncio.run(run_in_process())
+    else:
+        with FleetProcess(options, netem) as fleet:
+            results = asyncio.run(run_suites(fleet.endpoints, options, args))
+        fleet_stats = fleet.stats
+    if any(fleet_stats.values()):
+        print("Fleet: " + ", ".join(f"{k} {v}" for k, v in fleet_stats.items()))
+
+    failures = compare(results, baseline, args.threshold) if baseline else []
+
+    if args.save:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": vars(options),
+            "netem": vars(netem),
+            "fleet": fleet_stats,
+            "concurrency": args.concurrency,
+            "results": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
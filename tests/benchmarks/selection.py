@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""主机选择与配置存储微基准
+
+在合成清单（inventory.py）上测量每次调用都会经过的路径：
+IPSelector.matches/expand、LabelSelector.matches、select_servers，
+以及 ConfigStorage.import_config/list_servers。每项取多次运行的中位数，
+可保存为JSON并与基线比较，超过阈值时返回非零。
+
+存储基准逐行写入 SQLite，耗时远高于选择基准，默认只在不超过
+--storage-max 台主机的规模上运行。
+
+示例:
+    python -m tests.benchmarks.selection --sizes 10k,100k
+    python -m tests.benchmarks.selection --sizes 1m --benchmarks ip_matches,label_matches
+    python -m tests.benchmarks.selection --save selection_baseline.json
+    python -m tests.benchmarks.selection --baseline selection_baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from pypssh.config.storage import ConfigStorage
+from pypssh.core.models import Host
+from pypssh.selector.ip_selector import IPSelector
+from pypssh.selector.label_selector import (
+    LabelSelector,
+    compile_selector,
+    select_servers,
+)
+from tests.benchmarks.inventory import generate_hosts, parse_size, write_inventory
+
+IP_EXPRESSION = (
+    "10.0.0.0/14,10.4.0.1-10.5.255.254,10.[6:7].[0:127].[1:254] !10.1.0.0/16"
+)
+EXPAND_EXPRESSION = "10.0.0.0/16,10.[1:2].[0:255].[1:254] !10.0.128.0/17"
+LABEL_EXPRESSION = (
+    "env=prod,role in (web,api,worker),region!=eu-central,cpu>=8,!has(canary)"
+)
+# select_servers 支持的 IP 表达式为单个范围
+SELECT_IP_EXPRESSION = "10.0.0.1-10.3.255.254"
+SELECT_LABEL_EXPRESSION = "env=prod,role in (web,api)"
+
+SELECTION_BENCHMARKS = ("ip_matches", "ip_expand", "label_matches", "select_servers")
+STORAGE_BENCHMARKS = ("storage_import", "storage_list")
+BENCHMARKS = SELECTION_BENCHMARKS + STORAGE_BENCHMARKS
+
+
+def bench_ip_matches(hosts: List[Host], workdir: Path) -> int:
+    selector = IPSelector(IP_EXPRESSION)
+    return sum(1 for host in hosts if selector.matches(host.host))
+
+
+def bench_ip_expand(hosts: List[Host], workdir: Path) -> int:
+    return len(IPSelector(EXPAND_EXPRESSION).expand(limit=len(hosts)))
+
+
+def bench_label_matches(hosts: List[Host], workdir: Path) -> int:
+    selector = LabelSelector(LABEL_EXPRESSION)
+    return sum(1 for host in hosts if selector.matches(host.labels))
+
+
+def bench_select_servers(hosts: List[Host], workdir: Path) -> int:
+    # 清除编译缓存，计入表达式编译耗时（每次CLI调用都会发生）
+    compile_selector.cache_clear()
+    return len(select_servers(hosts, SELECT_IP_EXPRESSION, SELECT_LABEL_EXPRESSION))
+
+
+def bench_storage_import(hosts: List[Host], workdir: Path) -> int:
+    with tempfile.TemporaryDirectory(dir=workdir) as config_dir:
+        storage = ConfigStorage(Path(config_dir))
+        storage.import_config(workdir / "inventory.json")
+        return len(hosts)
+
+
+def bench_storage_list(hosts: List[Host], workdir: Path) -> int:
+    storage = ConfigStorage(workdir / "listing")
+    return len(storage.list_servers("bench"))
+
+
+def _prepare_storage(hosts: List[Host], workdir: Path):
+    """写出导入文件并准备 list_servers 使用的数据库"""
+    write_inventory(workdir / "inventory.json", hosts)
+    (workdir / "listing").mkdir(exist_ok=True)
+    ConfigStorage(workdir / "listing").import_config(workdir / "inventory.json")
+
+
+RUNNERS: Dict[str, Callable[[List[Host], Path], int]] = {
+    "ip_matches": bench_ip_matches,
+    "ip_expand": bench_ip_expand,
+    "label_matches": bench_label_matches,
+    "select_servers": bench_select_servers,
+    "storage_import": bench_storage_import,
+    "storage_list": bench_storage_list,
+}
+
+
+def run_benchmark(name: str, hosts: List[Host], workdir: Path, runs: int) -> Dict:
+    timings = []
+    matched = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        matched = RUNNERS[name](hosts, workdir)
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {
+        "median_ms": median * 1000,
+        "min_ms": min(timings) * 1000,
+        "ns_per_host": median * 1e9 / len(hosts),
+        "matched": matched,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """与基线比较中位耗时，返回退化项"""
+    failures = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        limit = base["median_ms"] * (1 + threshold)
+        if stats["median_ms"] > limit:
+            failures.append(
+                f"{key}: {stats['median_ms']:.1f}ms regressed from "
+                f"{base['median_ms']:.1f}ms (limit {limit:.1f}ms)"
+            )
+    return failures
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pypssh selector/storage benchmark")
+    parser.add_argument(
+        "--sizes", type=_split, default=["10k", "100k"], help="清单规模: 10k,100k,1m"
+    )
+    parser.add_argument(
+        "--benchmarks",
+        type=_split,
+        default=list(BENCHMARKS),
+        help=f"逗号分隔的基准列表: {','.join(BENCHMARKS)}",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="每个基准运行次数")
+    parser.add_argument(
+        "--storage-max", type=int, default=10_000, help="存储基准的最大规模"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="清单随机种子")
+    parser.add_argument("--baseline", help="基线结果文件")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="相对基线允许的退化比例"
+    )
+    parser.add_argument("--save", help="保存结果到文件")
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    try:
+        sizes = [(label, parse_size(label)) for label in args.sizes]
+    except ValueError as e:
+        parser.error(f"invalid size: {e}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for label, count in sizes:
+        start = time.perf_counter()
+        hosts = generate_hosts(count, args.seed)
+        print(f"Inventory {label}: {count} hosts ({time.perf_counter() - start:.1f}s)")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            workdir = Path(tmp)
+            names = [
+                name
+                for name in args.benchmarks
+                if name in SELECTION_BENCHMARKS or count <= args.storage_max
+            ]
+            if any(name in STORAGE_BENCHMARKS for name in names):
+                _prepare_storage(hosts, workdir)
+
+            for name in names:
+                stats = run_benchmark(name, hosts, workdir, args.runs)
+                results[f"{name}@{label}"] = stats
+                print(
+                    f"  {name:<16} median {stats['median_ms']:10.1f}ms  "
+                    f"min {stats['min_ms']:10.1f}ms  "
+                    f"{stats['ns_per_host']:9.0f}ns/host  matched {stats['matched']}",
+                    flush=True,
+                )
+
+    failures = compare(results, baseline, args.threshold) if baseline else []
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""打包产物启动耗时基准（冷启动/热启动）
+
+冷启动: 每次使用全新的临时目录与解压缓存目录（onefile 解压、cached 首次解压）；
+        以 root 运行并指定 --drop-caches 时同时清空系统页缓存。
+热启动: 复用同一缓存目录连续运行。
+
+示例:
+    script/build/package_exec cached
+    python tests/benchmarks/startup.py dist/pypssh --runs 10
+    python tests/benchmarks/startup.py dist/pypssh/pypssh --save startup_onedir.json
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+
+def _drop_page_cache():
+    """清空系统页缓存（需要root）"""
+    subprocess.run(["sync"], check=False)
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def _launch(binary: str, args: List[str], env: Dict[str, str]) -> float:
+    """运行一次产物并返回耗时（秒）"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [binary, *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"{binary} exited with {proc.returncode}: {proc.stderr.decode(errors='replace')}"
+        )
+    return elapsed
+
+
+def _summary(timings: List[float]) -> Dict[str, float]:
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+    }
+
+
+def measure(binary: str, args: List[str], runs: int, drop_caches: bool):
+    """测量冷启动与热启动耗时"""
+    cold = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(
+                os.environ,
+                HOME=workdir,
+                TMPDIR=workdir,
+                PYPSSH_CACHE_DIR=os.path.join(workdir, "cache"),
+            )
+            if drop_caches:
+                _drop_page_cache()
+            cold.append(_launch(binary, args, env))
+
+    warm = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            HOME=workdir,
+            TMPDIR=workdir,
+            PYPSSH_CACHE_DIR=os.path.join(workdir, "cache"),
+        )
+        _launch(binary, args, env)  # 预热
+        for _ in range(runs):
+            warm.append(_launch(binary, args, env))
+
+    return {"cold": _summary(cold), "warm": _summary(warm)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pypssh packaged startup benchmark")
+    parser.add_argument("binary", help="打包产物路径，如 dist/pypssh")
+    parser.add_argument("--args", default="version --simple", help="运行参数")
+    parser.add_argument("--runs", type=int, default=10, help="运行次数")
+    parser.add_argument(
+        "--drop-caches", action="store_true", help="冷启动前清空页缓存（需要root）"
+    )
+    parser.add_argument("--save", help="保存结果到JSON文件")
+    args = parser.parse_args()
+
+    if args.drop_caches and os.geteuid() != 0:
+        parser.error("--drop-caches requires root")
+
+    results = measure(
+        os.path.abspath(args.binary), shlex.split(args.args), args.runs, args.drop_caches
+    )
+
+    for kind in ("cold", "warm"):
+        stats = results[kind]
+        print(
+            f"{kind:<5} median {stats['median_ms']:8.1f}ms  "
+            f"min {stats['min_ms']:8.1f}ms  max {stats['max_ms']:8.1f}ms"
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"binary": args.binary, "args": args.args, **results}, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())